@@ -1,5 +1,7 @@
 import sqlite3
 import os
+import threading
+from pathlib import Path
 
 # ============================================================
 #   RUTA ABSOLUTA FIJA A LA BASE DE DATOS
@@ -12,16 +14,112 @@ DB_PATH = r"C:\Users\Santiago\Desktop\flet_finanzas_app\finanzas.db"
 #   CONEXIÓN A LA BASE DE DATOS
 # ============================================================
 
+# Los procesos que solo generan reportes abren la base en modo lectura
+SOLO_LECTURA = False
+
+
 def get_conn():
-    conn = sqlite3.connect(DB_PATH)
+    if SOLO_LECTURA:
+        # as_uri() escapa ?, #, % y las barras de Windows
+        conn = sqlite3.connect(Path(DB_PATH).resolve().as_uri() + "?mode=ro", uri=True)
+    else:
+        conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+# ============================================================
+#   VERSIÓN DE LOS DATOS
+# ============================================================
+
+# Tablas cuyo contador de cambios mantienen los triggers de init_db()
+TABLAS_VERSIONADAS = ("categorias", "transacciones", "presupuestos", "alertas")
+
+
+def version_datos(tabla: str = None) -> int:
+    """
+    Contador de cambios de `tabla` (o la suma de todas si no se indica).
+    Si no cambió desde la última lectura, los datos mostrados siguen vigentes.
+    """
+    conn = get_conn()
+    cur = conn.cursor()
+
+    if tabla is None:
+        cur.execute("SELECT COALESCE(SUM(version), 0) FROM control_cambios")
+    else:
+        cur.execute("SELECT version FROM control_cambios WHERE tabla = ?", (tabla,))
+
+    row = cur.fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+
+# ============================================================
+#   CONSULTAS CANCELABLES (búsqueda en vivo)
+# ============================================================
+
+class ConsultaCancelable:
+    """
+    Permite abortar desde otro hilo una consulta que ya está corriendo.
+    La conexión se abre en el hilo que ejecuta la consulta; cancelar()
+    llama a interrupt() y el progress handler corta cualquier sentencia
+    posterior, con lo que SQLite lanza OperationalError("interrupted").
+    """
+
+    def __init__(self):
+        self._cancelada = threading.Event()
+        self._conn = None
+
+    def conectar(self):
+        conn = get_conn()
+        conn.set_progress_handler(self._progreso, 1000)
+        self._conn = conn
+        return conn
+
+    def _progreso(self):
+        return 1 if self._cancelada.is_set() else 0
+
+    def cancelar(self):
+        self._cancelada.set()
+        conn = self._conn
+        if conn is not None:
+            try:
+                conn.interrupt()
+            except sqlite3.ProgrammingError:
+                # La conexión ya se cerró: la consulta había terminado
+                pass
+
+    @property
+    def cancelada(self) -> bool:
+        return self._cancelada.is_set()
+
+
 # ============================================================
 #   CREACIÓN DE TABLAS
 # ============================================================
 
+# Mantiene el índice FTS al insertar. Las importaciones masivas lo quitan
+# dentro de su transacción e indexan todo junto al final (mucho más rápido).
+SQL_TRIGGER_FTS_INSERT = """
+    CREATE TRIGGER IF NOT EXISTS transacciones_fts_ai
+    AFTER INSERT ON transacciones BEGIN
+        INSERT INTO transacciones_fts (rowid, descripcion)
+        VALUES (new.id, new.descripcion);
+    END
+"""
+
+# Descarta del registro de cambios lo que ya exportaron todas las
+# exportaciones incrementales; si no hay ninguna, todo (la primera
+# exportación parte de una copia completa). sqlite_sequence conserva el
+# último seq aunque el registro quede vacío.
+SQL_PODAR_CAMBIOS = """
+    DELETE FROM transacciones_cambios
+    WHERE seq <= COALESCE(
+        (SELECT MIN(ultimo_seq) FROM marcas_exportacion),
+        (SELECT seq FROM sqlite_sequence WHERE name = 'transacciones_cambios')
+    )
+"""
+
 def init_db():
     print(">>> Inicializando base de datos en:", DB_PATH)
 
@@ -45,10 +143,16 @@ def init_db():
             fecha TEXT NOT NULL,
             descripcion TEXT,
             categoria_id INTEGER,
+            import_hash TEXT,
             FOREIGN KEY (categoria_id) REFERENCES categorias(id)
         )
     """)
 
+    # Bases anteriores a la importación masiva: agregar la columna
+    cur.execute("PRAGMA table_info(transacciones)")
+    if "import_hash" not in {row["name"] for row in cur.fetchall()}:
+        cur.execute("ALTER TABLE transacciones ADD COLUMN import_hash TEXT")
+
     # ------------------ PRESUPUESTOS ------------------
     cur.execute("""
         CREATE TABLE IF NOT EXISTS presupuestos (
@@ -71,11 +175,213 @@ def init_db():
         )
     """)
 
+    # ------------------ CONTROL DE CAMBIOS ------------------
+    # Un contador por tabla que suben los triggers en cada INSERT/UPDATE/DELETE.
+    # Las pantallas lo comparan para saber si lo que muestran sigue vigente.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS control_cambios (
+            tabla TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    for tabla in TABLAS_VERSIONADAS:
+        cur.execute(
+            "INSERT OR IGNORE INTO control_cambios (tabla, version) VALUES (?, 0)",
+            (tabla,),
+        )
+        for evento in ("INSERT", "UPDATE", "DELETE"):
+            cur.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {tabla}_version_{evento.lower()}
+                AFTER {evento} ON {tabla} BEGIN
+                    UPDATE control_cambios SET version = version + 1
+                    WHERE tabla = '{tabla}';
+                END
+            """)
+
+    # ------------------ REGISTRO DE CAMBIOS (exportación incremental) ------------------
+    # Cada alta, modificación o baja de una transacción deja una entrada con
+    # un número de secuencia creciente. Si la transacción ya no existe, el
+    # cambio fue una baja. Se guarda en otra tabla para no volver a disparar
+    # los triggers de transacciones.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS transacciones_cambios (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            trans_id INTEGER NOT NULL
+        )
+    """)
+    for evento, fila in (("INSERT", "new"), ("UPDATE", "new"), ("DELETE", "old")):
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS transacciones_cambios_{evento.lower()}
+            AFTER {evento} ON transacciones BEGIN
+                INSERT INTO transacciones_cambios (trans_id) VALUES ({fila}.id);
+            END
+        """)
+
+    # Hasta dónde llegó cada exportación incremental
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS marcas_exportacion (
+            nombre TEXT PRIMARY KEY,
+            ultimo_seq INTEGER NOT NULL,
+            ultimo_id INTEGER NOT NULL,
+            fecha TEXT NOT NULL
+        )
+    """)
+
+    # ------------------ SINCRONIZACIÓN CON data/gastos.xlsx ------------------
+    # Filas presentes en el libro y en la base tras la última sincronización:
+    # clave = "xlsx:" + Id de la fila; huella = contenido que se sincronizó
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS sync_excel (
+            clave TEXT PRIMARY KEY,
+            trans_id INTEGER NOT NULL,
+            huella TEXT
+        )
+    """)
+    cur.execute("PRAGMA table_info(sync_excel)")
+    if "huella" not in {row["name"] for row in cur.fetchall()}:
+        cur.execute("ALTER TABLE sync_excel ADD COLUMN huella TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sync_excel_trans ON sync_excel (trans_id)")
+
+    # Estado del libro y su diario en la última sincronización
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS sync_excel_archivo (
+            ruta TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            tamano INTEGER NOT NULL,
+            tamano_diario INTEGER NOT NULL
+        )
+    """)
+
+    # ------------------ ÍNDICES ------------------
+    # Índice cubriente por fecha: las series por periodo (saldo acumulado,
+    # totales mensuales) se resuelven recorriendo solo el índice.
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transacciones_fecha
+        ON transacciones (fecha, tipo, monto)
+    """)
+
+    # Orden del historial (fecha, id) sin ordenar en memoria
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transacciones_fecha_id
+        ON transacciones (fecha, id)
+    """)
+
+    # Filtros del historial por tipo o categoría, ya ordenados por fecha
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transacciones_tipo_fecha
+        ON transacciones (tipo, fecha)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transacciones_categoria_fecha
+        ON transacciones (categoria_id, fecha)
+    """)
+
+    # Huella de las filas importadas: reimportar un archivo no duplica nada.
+    # Parcial: las transacciones creadas a mano (sin huella) no ocupan índice.
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_transacciones_import_hash
+        ON transacciones (import_hash) WHERE import_hash IS NOT NULL
+    """)
+
+    # ------------------ BÚSQUEDA DE TEXTO (FTS5) ------------------
+    # Índice de texto completo sobre la descripción, sin acentos y con
+    # prefijos de 2 y 3 letras para búsquedas mientras se escribe.
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'transacciones_fts'")
+    fts_nueva = cur.fetchone() is None
+
+    cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS transacciones_fts USING fts5(
+            descripcion,
+            content = 'transacciones',
+            content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+
+    # Triggers que mantienen el índice sincronizado con la tabla
+    cur.execute(SQL_TRIGGER_FTS_INSERT)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS transacciones_fts_ad
+        AFTER DELETE ON transacciones BEGIN
+            INSERT INTO transacciones_fts (transacciones_fts, rowid, descripcion)
+            VALUES ('delete', old.id, old.descripcion);
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS transacciones_fts_au
+        AFTER UPDATE OF descripcion ON transacciones BEGIN
+            INSERT INTO transacciones_fts (transacciones_fts, rowid, descripcion)
+            VALUES ('delete', old.id, old.descripcion);
+            INSERT INTO transacciones_fts (rowid, descripcion)
+            VALUES (new.id, new.descripcion);
+        END
+    """)
+
+    # Bases existentes: indexar el historial que ya había
+    if fts_nueva:
+        cur.execute("INSERT INTO transacciones_fts (transacciones_fts) VALUES ('rebuild')")
+
     conn.commit()
     conn.close()
     print(">>> Tablas listas.")
 
 
+# ============================================================
+#   MANTENIMIENTO
+# ============================================================
+
+def reconstruir_indices():
+    """
+    Regenera lo que se deriva de las transacciones: el índice de búsqueda
+    FTS5 (desde cero y compactado) y las estadísticas del planificador.
+    """
+    conn = get_conn()
+    with conn:
+        conn.execute("INSERT INTO transacciones_fts (transacciones_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO transacciones_fts (transacciones_fts) VALUES ('optimize')")
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def mantenimiento(vacuum: bool = False) -> list:
+    """
+    Comprueba la integridad de la base y refresca las estadísticas; con
+    vacuum=True además la compacta. Devuelve los problemas encontrados
+    (lista vacía si todo está bien).
+    """
+    conn = get_conn()
+    cur = conn.cursor()
+
+    cur.execute("PRAGMA integrity_check")
+    problemas = [row[0] for row in cur.fetchall() if row[0] != "ok"]
+
+    cur.execute("PRAGMA foreign_key_check")
+    problemas += [
+        f"{row[0]} (fila {row[1]}) referencia un registro inexistente de {row[2]}"
+        for row in cur.fetchall()
+    ]
+
+    try:
+        cur.execute("INSERT INTO transacciones_fts (transacciones_fts) VALUES ('integrity-check')")
+    except sqlite3.DatabaseError:
+        problemas.append("El índice de búsqueda no coincide con las transacciones (ejecute reconstruir).")
+
+    # El registro de cambios solo se poda al exportar: sin exportaciones crecería siempre
+    cur.execute(SQL_PODAR_CAMBIOS)
+
+    # Lo anterior abre una transacción implícita; VACUUM no admite ninguna
+    conn.commit()
+
+    cur.execute("PRAGMA optimize")
+    if vacuum:
+        conn.execute("VACUUM")
+
+    conn.close()
+    return problemas
+
+
 # ============================================================
 #   RESETEAR BASE DE DATOS
 # ============================================================
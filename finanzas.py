@@ -0,0 +1,290 @@
+# finanzas.py
+"""
+Línea de comandos sin interfaz gráfica (para tareas programadas):
+
+    python -m finanzas exportar csv --desde 2024-01-01 --salida reportes/2024.csv
+    python -m finanzas exportar periodos 2023 2024 --formatos xlsx pdf
+    python -m finanzas importar movimientos.csv
+    python -m finanzas importar data/gastos.xlsx
+    python -m finanzas extracto banco.csv --saltar 1 --formato-fecha %d/%m/%Y
+    python -m finanzas sincronizar
+    python -m finanzas alertas
+    python -m finanzas reconstruir
+    python -m finanzas mantenimiento --vacuum
+
+No importa Flet ni nada de ui/: arranca en milisegundos y funciona en
+servidores sin pantalla. Los módulos de reportes se cargan solo al exportar.
+"""
+import argparse
+import contextlib
+import sys
+import time
+
+import database
+
+
+# ============================================================
+#   EXPORTAR
+# ============================================================
+
+# reporte -> extensión del archivo por defecto
+REPORTES = {
+    "xlsx": "xlsx",
+    "pdf": "pdf",
+    "csv": "csv",
+    "parquet": "parquet",
+    "estado-xlsx": "xlsx",
+    "estado-pdf": "pdf",
+    "analisis": "xlsx",
+    "incremental": None,
+    "periodos": None,
+}
+
+
+def _exportar(args):
+    import reports
+
+    ruta = args.salida or f"reportes/{args.reporte}.{REPORTES[args.reporte]}"
+    filtros = dict(fecha_desde=args.desde, fecha_hasta=args.hasta, tipo=args.tipo)
+
+    if args.reporte == "xlsx":
+        reports.exportar_por_rango_excel(args.desde, args.hasta, ruta, tipo=args.tipo)
+    elif args.reporte == "pdf":
+        reports.exportar_historial_pdf(ruta, **filtros)
+    elif args.reporte == "csv":
+        reports.exportar_transacciones_csv(ruta, **filtros)
+    elif args.reporte == "parquet":
+        reports.exportar_transacciones_parquet(ruta, **filtros)
+    elif args.reporte == "estado-xlsx":
+        reports.exportar_estado_cuenta_excel(ruta)
+    elif args.reporte == "estado-pdf":
+        reports.exportar_estado_cuenta_pdf(ruta)
+    elif args.reporte == "analisis":
+        reports.exportar_analisis_excel(ruta, args.desde, args.hasta, top_n=args.top)
+    elif args.reporte == "incremental":
+        ruta = reports.exportar_incremental(args.formato, args.nombre)
+        if ruta is None:
+            print("Sin cambios desde la última exportación.")
+            return 0
+    elif args.reporte == "periodos":
+        if not args.periodos:
+            print("Indique al menos un periodo (p. ej. 2024 o 2024-03).", file=sys.stderr)
+            return 2
+        manifiesto = reports.generar_reportes(args.periodos, args.formatos)
+        errores = [r for r in manifiesto["reportes"] if r["error"]]
+        for r in manifiesto["reportes"]:
+            print(f"{r['ruta']}  {r['error'] or 'ok'}")
+        return 1 if errores else 0
+
+    print(ruta)
+    return 0
+
+
+# ============================================================
+#   IMPORTAR
+# ============================================================
+
+def _importar(args):
+    import importers
+
+    crear = not args.sin_crear_categorias
+    if args.archivo.lower().endswith((".xlsx", ".xlsm")):
+        resultado = importers.importar_excel(
+            args.archivo,
+            hoja=args.hoja,
+            tipo_por_defecto=args.tipo,
+            categoria_por_defecto=args.categoria,
+            crear_categorias=crear,
+        )
+    else:
+        resultado = importers.importar_csv_transacciones(args.archivo, crear_categorias=crear)
+
+    return _informar_importacion(resultado, args)
+
+
+def _informar_importacion(resultado, args):
+    for linea, mensaje in resultado.errores[:args.max_errores]:
+        print(f"línea {linea}: {mensaje}", file=sys.stderr)
+    if len(resultado.errores) > args.max_errores:
+        print(f"... y {len(resultado.errores) - args.max_errores} errores más", file=sys.stderr)
+
+    print(
+        f"Insertadas: {resultado.insertadas}  Ya importadas: {resultado.duplicadas}"
+        f"  Omitidas: {resultado.omitidas}"
+    )
+    return 1 if resultado.errores else 0
+
+
+def _extracto(args):
+    import importers
+
+    formato = importers.FormatoExtracto(
+        delimitador=args.delimitador,
+        encoding=args.encoding,
+        coma_decimal=not args.punto_decimal,
+        lineas_a_saltar=args.saltar,
+        columna_fecha=args.col_fecha,
+        columna_descripcion=args.col_descripcion,
+        columna_importe=None if args.col_debito else args.col_importe,
+        columna_debito=args.col_debito,
+        columna_credito=args.col_credito,
+        categoria=args.categoria,
+    )
+    if args.formato_fecha:
+        formato.formatos_fecha = tuple(args.formato_fecha)
+
+    resultado = importers.importar_extracto_csv(args.archivo, formato, max_procesos=args.procesos)
+    return _informar_importacion(resultado, args)
+
+
+def _sincronizar(args):
+    from services.excel_service import ExcelService
+    from services.sync_service import SyncService
+
+    resultado = SyncService(ExcelService(args.archivo)).sincronizar(permitir_vaciar=args.permitir_vaciar)
+    for posicion, mensaje in resultado.errores[:args.max_errores]:
+        print(f"fila {posicion}: {mensaje}", file=sys.stderr)
+
+    print(
+        f"Libro -> base: {resultado.excel_a_db} nuevas, {resultado.actualizadas_en_db} editadas,"
+        f" {resultado.borradas_en_db} borradas."
+        f"  Base -> libro: {resultado.db_a_excel} nuevas, {resultado.borradas_en_excel} borradas."
+        f"  ({resultado.modo})"
+    )
+    return 1 if resultado.errores else 0
+
+
+# ============================================================
+#   ALERTAS / RECONSTRUIR / MANTENIMIENTO
+# ============================================================
+
+def _alertas(args):
+    from models import recalcular_alertas
+
+    meses = recalcular_alertas(args.desde, args.hasta)
+    print(f"Alertas revisadas en {meses} meses.")
+    return 0
+
+
+def _reconstruir(args):
+    database.reconstruir_indices()
+    print("Índice de búsqueda y estadísticas reconstruidos.")
+    return 0
+
+
+def _mantenimiento(args):
+    problemas = database.mantenimiento(vacuum=args.vacuum)
+    for problema in problemas:
+        print(problema, file=sys.stderr)
+
+    if args.limpiar_cache:
+        import reports
+        reports._podar_cache(0)
+
+    print("Base de datos correcta." if not problemas else f"{len(problemas)} problemas encontrados.")
+    return 1 if problemas else 0
+
+
+# ============================================================
+#   ARGUMENTOS
+# ============================================================
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m finanzas",
+        description="Tareas de finanzas sin interfaz gráfica.",
+    )
+    parser.add_argument("--db", help="Ruta de la base de datos (por defecto la de database.py).")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    # exportar
+    p = sub.add_parser("exportar", help="Genera reportes (xlsx, pdf, csv, parquet...).")
+    p.add_argument("reporte", choices=list(REPORTES))
+    p.add_argument("periodos", nargs="*", help="Solo para 'periodos': 2024, 2024-03...")
+    p.add_argument("--salida", help="Ruta del archivo a generar.")
+    p.add_argument("--desde", help="Fecha inicial (YYYY-MM-DD).")
+    p.add_argument("--hasta", help="Fecha final (YYYY-MM-DD).")
+    p.add_argument("--tipo", choices=["ingreso", "gasto"])
+    p.add_argument("--top", type=int, default=10, help="Categorías del análisis.")
+    p.add_argument("--formato", choices=["csv", "xlsx"], default="csv", help="Para 'incremental'.")
+    p.add_argument("--nombre", default="nocturna", help="Nombre de la exportación incremental.")
+    p.add_argument("--formatos", nargs="+", default=["xlsx", "pdf"], help="Para 'periodos'.")
+    p.set_defaults(funcion=_exportar)
+
+    # importar
+    p = sub.add_parser("importar", help="Importa transacciones desde un CSV o una planilla .xlsx.")
+    p.add_argument("archivo")
+    p.add_argument("--hoja", help="Hoja de la planilla (por defecto la activa).")
+    p.add_argument("--tipo", choices=["ingreso", "gasto"], default="gasto",
+                   help="Tipo si la planilla no tiene columna de tipo.")
+    p.add_argument("--categoria", default="Importado",
+                   help="Categoría si la planilla no tiene columna de categoría.")
+    p.add_argument("--sin-crear-categorias", action="store_true",
+                   help="No crear las categorías que no existan.")
+    p.add_argument("--max-errores", type=int, default=20, help="Errores a mostrar.")
+    p.set_defaults(funcion=_importar)
+
+    # extracto bancario
+    p = sub.add_parser("extracto", help="Importa un extracto bancario en CSV (en paralelo).")
+    p.add_argument("archivo")
+    p.add_argument("--delimitador", default=";")
+    p.add_argument("--encoding", default="utf-8-sig")
+    p.add_argument("--punto-decimal", action="store_true",
+                   help="Importes como 1,234.56 (por defecto 1.234,56).")
+    p.add_argument("--formato-fecha", action="append",
+                   help="Formato strftime de la fecha; se puede repetir (por defecto %%d/%%m/%%Y).")
+    p.add_argument("--saltar", type=int, default=0, help="Líneas antes del encabezado.")
+    p.add_argument("--col-fecha", default="Fecha")
+    p.add_argument("--col-descripcion", default="Concepto")
+    p.add_argument("--col-importe", default="Importe", help="Importe con signo.")
+    p.add_argument("--col-debito", help="Usar columnas separadas de débito y crédito.")
+    p.add_argument("--col-credito")
+    p.add_argument("--categoria", default="Banco")
+    p.add_argument("--procesos", type=int, help="Procesos para el parseo (por defecto, todos los núcleos).")
+    p.add_argument("--max-errores", type=int, default=20, help="Errores a mostrar.")
+    p.set_defaults(funcion=_extracto)
+
+    # sincronizar
+    p = sub.add_parser("sincronizar", help="Sincroniza data/gastos.xlsx con la base en los dos sentidos.")
+    p.add_argument("archivo", nargs="?", default="data/gastos.xlsx")
+    p.add_argument("--permitir-vaciar", action="store_true",
+                   help="Aceptar un libro vacío aunque haya gastos enlazados (los borra de la base).")
+    p.add_argument("--max-errores", type=int, default=20, help="Errores a mostrar.")
+    p.set_defaults(funcion=_sincronizar)
+
+    # alertas
+    p = sub.add_parser("alertas", help="Vuelve a evaluar las alertas de cada mes.")
+    p.add_argument("--desde")
+    p.add_argument("--hasta")
+    p.set_defaults(funcion=_alertas)
+
+    # reconstruir
+    p = sub.add_parser("reconstruir", help="Reconstruye el índice de búsqueda y las estadísticas.")
+    p.set_defaults(funcion=_reconstruir)
+
+    # mantenimiento
+    p = sub.add_parser("mantenimiento", help="Comprueba la integridad y optimiza la base.")
+    p.add_argument("--vacuum", action="store_true", help="Compactar el archivo.")
+    p.add_argument("--limpiar-cache", action="store_true", help="Vaciar la caché de reportes.")
+    p.set_defaults(funcion=_mantenimiento)
+
+    return parser
+
+
+def main(argv=None):
+    args = _parser().parse_args(argv)
+
+    if args.db:
+        database.DB_PATH = args.db
+    # Los avisos de init_db van a stderr: stdout queda solo para los datos
+    with contextlib.redirect_stdout(sys.stderr):
+        database.init_db()
+
+    inicio = time.perf_counter()
+    codigo = args.funcion(args)
+    print(f"({time.perf_counter() - inicio:.2f} s)", file=sys.stderr)
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
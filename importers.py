@@ -0,0 +1,406 @@
+# importers.py
+import csv
+import hashlib
+import io
+import os
+import re
+import unicodedata
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from itertools import islice
+from typing import List, Optional, Tuple
+
+import openpyxl
+
+from models import importar_transacciones, obtener_categorias
+from validators import MENSAJES, parsear_monto, validar_lote
+
+# Filas que se validan e insertan juntas
+TAMANO_LOTE_IMPORTACION = 5000
+
+
+@dataclass
+class ResultadoImportacion:
+    insertadas: int = 0
+    duplicadas: int = 0
+    omitidas: int = 0
+    # (número de línea o fila, mensaje)
+    errores: List[Tuple[int, str]] = field(default_factory=list)
+
+
+# ============================================================
+#   PIPELINE COMÚN: validar -> huella -> insertar por lotes
+# ============================================================
+
+def _errores_bloque(bloque, categorias_existentes, crear_categorias):
+    """Valida un bloque de registros de una vez: {índice en el bloque: mensaje}."""
+    filas = [
+        (fecha, descripcion, monto, tipo, categoria)
+        for _, fecha, tipo, monto, categoria, descripcion in bloque
+    ]
+    errores = {}
+    for i, campo, codigo in validar_lote(filas):
+        if i not in errores:
+            # Aquí el monto llega ya convertido: None es un texto no numérico
+            errores[i] = "El monto debe ser un número mayor que 0." if campo == "monto" else MENSAJES[codigo]
+
+    if not crear_categorias:
+        for i, (_, _, _, _, categoria, _) in enumerate(bloque):
+            if i not in errores and categoria and categoria not in categorias_existentes:
+                errores[i] = f"La categoría '{categoria}' no existe."
+    return errores
+
+
+def _importar(registros, crear_categorias=True, progreso=None) -> ResultadoImportacion:
+    """
+    `registros`: iterable de (linea, fecha, tipo, monto, categoria, descripcion)
+    ya convertidos. Se validan, se les calcula la huella y se insertan en
+    lotes dentro de una única transacción, sin tener el archivo en memoria.
+
+    La huella es el contenido de la fila más cuántas veces apareció antes en
+    el mismo archivo: reimportarlo no duplica nada, pero dos gastos iguales
+    del mismo día siguen siendo dos.
+    """
+    resultado = ResultadoImportacion()
+    existentes = {c.nombre for c in obtener_categorias()}
+    apariciones = {}
+
+    def lotes():
+        pendientes = iter(registros)
+        while True:
+            bloque = list(islice(pendientes, TAMANO_LOTE_IMPORTACION))
+            if not bloque:
+                return
+            errores = _errores_bloque(bloque, existentes, crear_categorias)
+
+            lote = []
+            for i, (linea, fecha, tipo, monto, categoria, descripcion) in enumerate(bloque):
+                if i in errores:
+                    resultado.errores.append((linea, errores[i]))
+                    resultado.omitidas += 1
+                    continue
+
+                contenido = f"{fecha}|{tipo}|{monto!r}|{categoria}|{descripcion}".encode("utf-8")
+                huella = hashlib.blake2b(contenido, digest_size=16).digest()
+                n = apariciones.get(huella, 0)
+                apariciones[huella] = n + 1
+                import_hash = f"{huella.hex()}-{n}"
+
+                lote.append((tipo, monto, fecha, descripcion, categoria or None, import_hash))
+
+            if lote:
+                yield lote
+            if progreso:
+                progreso(bloque[-1][0], None)
+
+    resultado.insertadas, resultado.duplicadas = importar_transacciones(lotes())
+    return resultado
+
+
+# ============================================================
+#   IMPORTAR CSV (mismo formato que exportar_transacciones_csv)
+# ============================================================
+
+def _monto_csv(valor):
+    """Montos del CSV exportado: número con punto decimal y sin miles."""
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def importar_csv_transacciones(ruta, crear_categorias=True, progreso=None) -> ResultadoImportacion:
+    """
+    Importa un CSV con columnas fecha, tipo, monto, categoria, descripcion
+    (las demás se ignoran). Las filas inválidas se informan y se omiten.
+    """
+    def registros():
+        with open(ruta, newline="", encoding="utf-8-sig") as f:
+            # La línea 1 es el encabezado
+            for linea, fila in enumerate(csv.DictReader(f), start=2):
+                yield (
+                    linea,
+                    (fila.get("fecha") or "").strip(),
+                    (fila.get("tipo") or "").strip().lower(),
+                    _monto_csv(fila.get("monto")),
+                    (fila.get("categoria") or "").strip(),
+                    (fila.get("descripcion") or "").strip(),
+                )
+
+    return _importar(registros(), crear_categorias, progreso)
+
+
+# ============================================================
+#   IMPORTAR EXCEL (data/gastos.xlsx u otras planillas)
+# ============================================================
+
+# Nombres de encabezado aceptados para cada campo (sin acentos, en minúsculas)
+ALIAS_COLUMNAS = {
+    "fecha": ("fecha", "date", "dia"),
+    "descripcion": ("descripcion", "concepto", "detalle", "description"),
+    "monto": ("monto", "importe", "valor", "amount"),
+    "tipo": ("tipo", "type"),
+    "categoria": ("categoria", "category", "rubro"),
+}
+
+
+def _normalizar_encabezado(texto):
+    texto = unicodedata.normalize("NFKD", str(texto or "")).encode("ascii", "ignore").decode()
+    return texto.strip().lower()
+
+
+def _mapear_columnas(encabezado, columnas=None):
+    """
+    Devuelve {campo: índice de columna}. `columnas` permite forzar el
+    encabezado de cada campo, p. ej. {"monto": "Total $"}.
+    """
+    normalizados = [_normalizar_encabezado(h) for h in encabezado]
+    mapa = {}
+    for campo, alias in ALIAS_COLUMNAS.items():
+        if columnas and campo in columnas:
+            alias = (_normalizar_encabezado(columnas[campo]),)
+        for i, nombre in enumerate(normalizados):
+            if nombre in alias:
+                mapa[campo] = i
+                break
+    return mapa
+
+
+def _fecha_celda(valor):
+    if isinstance(valor, datetime):
+        return valor.date().isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return str(valor).strip() if valor is not None else ""
+
+
+def _monto_celda(valor):
+    """Números tal cual; textos con las reglas de parsear_monto ("1.200.000", "800,50")."""
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    centavos, _ = parsear_monto(str(valor) if valor is not None else None)
+    return centavos / 100 if centavos is not None else None
+
+
+def importar_excel(ruta="data/gastos.xlsx", hoja=None, columnas=None, tipo_por_defecto="gasto",
+                   categoria_por_defecto="Importado", crear_categorias=True,
+                   progreso=None) -> ResultadoImportacion:
+    """
+    Importa una planilla leyéndola en modo read_only (fila a fila, sin
+    cargar el libro). La primera fila es el encabezado; las columnas se
+    reconocen por nombre (ver ALIAS_COLUMNAS). Si no hay columna de tipo
+    o de categoría se usan los valores por defecto.
+    """
+    wb = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        ws = wb[hoja] if hoja else wb.active
+        filas = ws.iter_rows(values_only=True)
+
+        encabezado = next(filas, None) or ()
+        mapa = _mapear_columnas(encabezado, columnas)
+        faltan = [c for c in ("fecha", "descripcion", "monto") if c not in mapa]
+        if faltan:
+            raise ValueError(f"La planilla no tiene las columnas: {', '.join(faltan)}")
+
+        def celda(fila, campo):
+            i = mapa.get(campo)
+            return fila[i] if i is not None and i < len(fila) else None
+
+        def registros():
+            for n, fila in enumerate(filas, start=2):
+                if not any(v is not None for v in fila):
+                    continue
+                tipo = str(celda(fila, "tipo") or tipo_por_defecto).strip().lower()
+                categoria = str(celda(fila, "categoria") or categoria_por_defecto or "").strip()
+                yield (
+                    n,
+                    _fecha_celda(celda(fila, "fecha")),
+                    tipo,
+                    _monto_celda(celda(fila, "monto")),
+                    categoria,
+                    str(celda(fila, "descripcion") or "").strip(),
+                )
+
+        return _importar(registros(), crear_categorias, progreso)
+    finally:
+        wb.close()
+
+
+# ============================================================
+#   IMPORTAR EXTRACTOS BANCARIOS (CSV) EN PARALELO
+# ============================================================
+
+@dataclass
+class FormatoExtracto:
+    """
+    Cómo leer el CSV de un banco. El importe puede venir en una columna con
+    signo (negativo = gasto) o en dos columnas de débito y crédito.
+    """
+    delimitador: str = ";"
+    comilla: str = '"'
+    encoding: str = "utf-8-sig"
+    coma_decimal: bool = True
+    formatos_fecha: Tuple[str, ...] = ("%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d")
+    lineas_a_saltar: int = 0
+    columna_fecha: str = "Fecha"
+    columna_descripcion: str = "Concepto"
+    columna_importe: Optional[str] = "Importe"
+    columna_debito: Optional[str] = None
+    columna_credito: Optional[str] = None
+    categoria: str = "Banco"
+
+
+# Líneas que procesa cada tarea del pool
+LINEAS_POR_BLOQUE = 20_000
+
+_NO_NUMERICO = re.compile(r"[^0-9,.\-+()]")
+
+
+def _importe_extracto(texto, coma_decimal):
+    """
+    "1.234,56" / "-1,234.56" / "(45,00)" / "12,50 €" -> float con signo.
+    Devuelve None si no es un número.
+    """
+    if texto is None:
+        return None
+    texto = _NO_NUMERICO.sub("", texto)
+    if not texto:
+        return None
+
+    negativo = texto.startswith("(") and texto.endswith(")")
+    texto = texto.strip("()")
+    if coma_decimal:
+        texto = texto.replace(".", "").replace(",", ".")
+    else:
+        texto = texto.replace(",", "")
+
+    try:
+        valor = float(texto)
+    except ValueError:
+        return None
+    return -valor if negativo else valor
+
+
+def _parsear_bloque(lineas, primera_linea, indices, formato):
+    """
+    Se ejecuta en un proceso del pool: convierte un bloque de líneas del
+    extracto en registros (linea, fecha, tipo, monto, categoria, descripcion).
+    Los errores de formato se devuelven como registros con fecha vacía
+    para que la validación común los informe con su número de línea.
+    """
+    i_fecha, i_desc, i_importe, i_debito, i_credito = indices
+    fechas = {}
+    registros = []
+
+    lector = csv.reader(io.StringIO("".join(lineas)),
+                        delimiter=formato.delimitador, quotechar=formato.comilla)
+    for linea, campos in enumerate(lector, start=primera_linea):
+        if not campos or not any(c.strip() for c in campos):
+            continue
+
+        def campo(i):
+            return campos[i].strip() if i is not None and i < len(campos) else ""
+
+        # Las fechas se repiten mucho: se convierte cada texto una sola vez
+        texto_fecha = campo(i_fecha)
+        fecha = fechas.get(texto_fecha)
+        if fecha is None:
+            fecha = ""
+            for patron in formato.formatos_fecha:
+                try:
+                    fecha = datetime.strptime(texto_fecha, patron).date().isoformat()
+                    break
+                except ValueError:
+                    continue
+            fechas[texto_fecha] = fecha
+
+        if i_importe is not None:
+            importe = _importe_extracto(campo(i_importe), formato.coma_decimal)
+        else:
+            debito = _importe_extracto(campo(i_debito), formato.coma_decimal) or 0
+            credito = _importe_extracto(campo(i_credito), formato.coma_decimal) or 0
+            importe = credito - abs(debito)
+
+        if importe is None or importe == 0:
+            # La validación común lo informa como monto inválido
+            tipo, monto = "gasto", None
+        else:
+            tipo = "ingreso" if importe > 0 else "gasto"
+            monto = round(abs(importe), 2)
+
+        registros.append((linea, fecha, tipo, monto, formato.categoria, campo(i_desc)))
+
+    return registros
+
+
+def _en_orden(pool, bloques, funcion, ventana):
+    """
+    Como pool.map pero con como mucho `ventana` bloques en vuelo: el archivo
+    se lee a medida que los procesos terminan, no entero de antemano.
+    """
+    pendientes = deque()
+    for bloque in bloques:
+        pendientes.append(pool.submit(funcion, *bloque))
+        if len(pendientes) >= ventana:
+            yield pendientes.popleft().result()
+    while pendientes:
+        yield pendientes.popleft().result()
+
+
+def importar_extracto_csv(ruta, formato: FormatoExtracto = None, max_procesos=None,
+                          progreso=None) -> ResultadoImportacion:
+    """
+    Importa un extracto bancario: parseo en paralelo por bloques de líneas,
+    y validación, huella e inserción en una sola transacción, todo en flujo.
+    Cada fila lleva su huella (import_hash): importar otra vez el mismo
+    extracto, o uno que se solape, no duplica movimientos.
+    Nota: no admite saltos de línea dentro de un campo entre comillas.
+    """
+    formato = formato or FormatoExtracto()
+
+    with open(ruta, newline="", encoding=formato.encoding) as f:
+        for _ in range(formato.lineas_a_saltar):
+            f.readline()
+
+        encabezado = next(csv.reader([f.readline()], delimiter=formato.delimitador,
+                                     quotechar=formato.comilla), [])
+        normalizados = [_normalizar_encabezado(h) for h in encabezado]
+
+        def indice(nombre):
+            if nombre is None:
+                return None
+            try:
+                return normalizados.index(_normalizar_encabezado(nombre))
+            except ValueError:
+                raise ValueError(f"El extracto no tiene la columna '{nombre}'.")
+
+        indices = (
+            indice(formato.columna_fecha),
+            indice(formato.columna_descripcion),
+            indice(formato.columna_importe),
+            indice(formato.columna_debito),
+            indice(formato.columna_credito),
+        )
+        primera = formato.lineas_a_saltar + 2
+
+        def bloques():
+            linea = primera
+            while True:
+                lineas = list(islice(f, LINEAS_POR_BLOQUE))
+                if not lineas:
+                    return
+                yield lineas, linea, indices, formato
+                linea += len(lineas)
+
+        procesos = max_procesos or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            # Dos bloques por proceso: siempre hay trabajo listo sin leer de más
+            ventana = 2 * procesos
+            registros = (
+                registro
+                for bloque in _en_orden(pool, bloques(), _parsear_bloque, ventana)
+                for registro in bloque
+            )
+            return _importar(registros, crear_categorias=True, progreso=progreso)
@@ -1,11 +1,13 @@
 import flet as ft
 from database import init_db
+from services.export_service import ExportService
 
 from ui.screens.dashboard_screen import DashboardScreen
 from ui.screens.ingresos_screen import IngresosScreen
 from ui.screens.gastos_screen import GastosScreen
 from ui.screens.categorias_screen import CategoriasScreen
 from ui.screens.transacciones_screen import TransaccionesScreen
+from ui.screens.cache import CachePantallas
 
 
 def main(page: ft.Page):
@@ -18,6 +20,9 @@ def main(page: ft.Page):
     # Inicializar BD UNA SOLA VEZ
     init_db()
 
+    # Descargas de exportaciones anteriores que ya nadie va a pedir
+    ExportService.limpiar_descargas()
+
     # CONTENEDOR PRINCIPAL QUE SE ACTUALIZA
     contenido = ft.Column(expand=True)
 
@@ -42,20 +47,19 @@ def main(page: ft.Page):
     # ---------------------------------------------------------
     # Navegación entre pantallas
     # ---------------------------------------------------------
+    # Las pantallas visitadas se conservan (LRU): volver a una no la
+    # reconstruye ni consulta la base si los datos no cambiaron
+    pantallas = CachePantallas({
+        "dashboard": lambda: DashboardScreen(page),
+        "ingresos": lambda: IngresosScreen(page),
+        "gastos": lambda: GastosScreen(page),
+        "categorias": lambda: CategoriasScreen(page),
+        "transacciones": lambda: TransaccionesScreen(page),
+    })
+
     def navegar(index: int):
         rutas = ["dashboard", "ingresos", "gastos", "categorias", "transacciones"]
-        ruta = rutas[index]
-
-        if ruta == "dashboard":
-            pantalla = DashboardScreen(page)
-        elif ruta == "ingresos":
-            pantalla = IngresosScreen(page)
-        elif ruta == "gastos":
-            pantalla = GastosScreen(page)
-        elif ruta == "categorias":
-            pantalla = CategoriasScreen(page)
-        elif ruta == "transacciones":
-            pantalla = TransaccionesScreen(page)
+        pantalla = pantallas.obtener(rutas[index])
 
         contenido.controls = [
             ft.Container(
@@ -138,4 +142,5 @@ def main(page: ft.Page):
     navegar(0)
 
 
-ft.app(target=main, view=ft.AppView.WEB_BROWSER)
+# assets_dir: sirve assets/descargas para bajar los reportes exportados
+ft.app(target=main, view=ft.AppView.WEB_BROWSER, assets_dir="assets")
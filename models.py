@@ -1,7 +1,10 @@
+import json
+import re
 import sqlite3
 from dataclasses import dataclass
+from datetime import date
 from typing import Optional, List
-from database import get_conn
+from database import get_conn, SQL_PODAR_CAMBIOS, SQL_TRIGGER_FTS_INSERT
 
 
 # ============================================================
@@ -84,10 +87,43 @@ def _mes_desde_fecha(fecha: str) -> str:
     return fecha[:7]
 
 
-def _existe_alerta_en_mes(tipo: str, mes: str, categoria_id: Optional[int] = None) -> bool:
+_PALABRA = re.compile(r"\w+", re.UNICODE)
+
+
+def _consulta_fts(texto: str) -> Optional[str]:
     """
-    Verifica si ya existe una alerta de un tipo dado en un mes concreto.
-    Para evitar spam de alertas, solo se genera UNA por mes y tipo.
+    Convierte lo escrito por el usuario en una consulta FTS5 segura:
+    cada palabra se busca como prefijo y todas deben aparecer.
+    "cafe centr" -> '"cafe"* "centr"*'
+    """
+    palabras = _PALABRA.findall(texto or "")
+    if not palabras:
+        return None
+    return " ".join(f'"{p}"*' for p in palabras)
+
+
+# Severidad con la que se guarda cada regla de alerta: la tabla `alertas`
+# solo admite 'warning' y 'critical'; la regla se identifica por su mensaje.
+_SEVERIDAD_ALERTA = {
+    "presupuesto_superado": "critical",
+    "presupuesto_cercano": "warning",
+    "categoria_sin_presupuesto": "warning",
+    "gastos_mayores_ingresos": "critical",
+    "saldo_negativo": "critical",
+    "gasto_repetitivo": "warning",
+}
+
+
+def _registrar_alerta(regla: str, mensaje: str, mes: str, categoria_id: Optional[int], fecha: str):
+    """Crea la alerta de `regla` salvo que ya exista en ese mes."""
+    if not _existe_alerta_en_mes(mensaje, mes, categoria_id):
+        crear_alerta(categoria_id, _SEVERIDAD_ALERTA[regla], mensaje, fecha)
+
+
+def _existe_alerta_en_mes(mensaje: str, mes: str, categoria_id: Optional[int] = None) -> bool:
+    """
+    Verifica si ya existe una alerta con ese mensaje en un mes concreto.
+    Para evitar spam de alertas, solo se genera UNA por mes y regla.
     """
     conn = get_conn()
     cur = conn.cursor()
@@ -97,22 +133,22 @@ def _existe_alerta_en_mes(tipo: str, mes: str, categoria_id: Optional[int] = Non
             """
             SELECT COUNT(*) AS total
             FROM alertas
-            WHERE tipo = ?
+            WHERE mensaje = ?
               AND substr(fecha, 1, 7) = ?
               AND categoria_id IS NULL
             """,
-            (tipo, mes,),
+            (mensaje, mes,),
         )
     else:
         cur.execute(
             """
             SELECT COUNT(*) AS total
             FROM alertas
-            WHERE tipo = ?
+            WHERE mensaje = ?
               AND substr(fecha, 1, 7) = ?
               AND categoria_id = ?
             """,
-            (tipo, mes, categoria_id),
+            (mensaje, mes, categoria_id),
         )
 
     total = cur.fetchone()[0]
@@ -141,6 +177,27 @@ def crear_categoria(nombre: str):
     conn.close()
 
 
+def ids_categorias(nombres, crear: bool = False) -> dict:
+    """
+    Devuelve {nombre: id} para los nombres dados (usado por los importadores).
+    Con crear=True da de alta las categorías que falten.
+    """
+    nombres = {n.strip() for n in nombres if n and n.strip()}
+
+    conn = get_conn()
+    cur = conn.cursor()
+    with conn:
+        if crear and nombres:
+            cur.executemany(
+                "INSERT OR IGNORE INTO categorias (nombre) VALUES (?)",
+                [(n,) for n in nombres],
+            )
+        cur.execute("SELECT id, nombre FROM categorias")
+        ids = {row["nombre"]: row["id"] for row in cur.fetchall() if row["nombre"] in nombres}
+    conn.close()
+    return ids
+
+
 def editar_categoria(cat_id: int, nombre: str):
     conn = get_conn()
     cur = conn.cursor()
@@ -227,7 +284,331 @@ def obtener_transacciones() -> List[Transaccion]:
     return [Transaccion.from_row(row) for row in rows]
 
 
-def crear_transaccion(tipo: str, monto: float, fecha: str, descripcion: str, categoria_id=None):
+# Columnas por las que se permite ordenar (nombre lógico -> expresión SQL)
+_ORDEN_TRANSACCIONES = {
+    "fecha": "t.fecha",
+    "tipo": "t.tipo",
+    "monto": "t.monto",
+    "categoria": "c.nombre",
+    "descripcion": "t.descripcion",
+}
+
+
+def _filtros_transacciones(descripcion=None, tipo=None, categoria_id=None,
+                           fecha_desde=None, fecha_hasta=None):
+    """
+    Traduce los filtros del historial a una cláusula WHERE parametrizada.
+    Devuelve (where, params); los filtros vacíos se ignoran.
+    """
+    condiciones = []
+    params = []
+
+    consulta = _consulta_fts(descripcion) if descripcion else None
+    if consulta:
+        # Resuelto por el índice FTS5, no con LIKE '%x%' sobre cada fila
+        condiciones.append(
+            "t.id IN (SELECT rowid FROM transacciones_fts WHERE transacciones_fts MATCH ?)"
+        )
+        params.append(consulta)
+    if tipo:
+        condiciones.append("t.tipo = ?")
+        params.append(tipo)
+    if categoria_id:
+        condiciones.append("t.categoria_id = ?")
+        params.append(int(categoria_id))
+    if fecha_desde:
+        condiciones.append("t.fecha >= ?")
+        params.append(fecha_desde)
+    if fecha_hasta:
+        condiciones.append("t.fecha <= ?")
+        params.append(fecha_hasta)
+
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    return where, params
+
+
+def buscar_transacciones(descripcion=None, tipo=None, categoria_id=None,
+                         fecha_desde=None, fecha_hasta=None,
+                         orden: str = "fecha", ascendente: bool = False,
+                         limite: int = 50, offset: int = 0, conn=None):
+    """
+    Filtra, ordena y pagina el historial en SQLite.
+    Devuelve (transacciones_de_la_pagina, total_de_resultados).
+    Si se pasa `conn` (p. ej. de una ConsultaCancelable) no se cierra aquí.
+    """
+    if orden not in _ORDEN_TRANSACCIONES:
+        raise ValueError(f"Columna de orden no soportada: {orden}")
+
+    where, params = _filtros_transacciones(
+        descripcion, tipo, categoria_id, fecha_desde, fecha_hasta
+    )
+    direccion = "ASC" if ascendente else "DESC"
+
+    propia = conn is None
+    if propia:
+        conn = get_conn()
+    cur = conn.cursor()
+
+    cur.execute(f"SELECT COUNT(*) FROM transacciones t {where}", params)
+    total = cur.fetchone()[0]
+
+    cur.execute(
+        f"""
+        SELECT
+            t.id,
+            t.tipo,
+            t.monto,
+            t.fecha,
+            t.descripcion,
+            t.categoria_id,
+            c.nombre AS categoria
+        FROM transacciones t
+        LEFT JOIN categorias c ON t.categoria_id = c.id
+        {where}
+        ORDER BY {_ORDEN_TRANSACCIONES[orden]} {direccion}, t.id {direccion}
+        LIMIT ? OFFSET ?
+        """,
+        params + [limite, offset],
+    )
+
+    rows = cur.fetchall()
+    if propia:
+        conn.close()
+    return [Transaccion.from_row(row) for row in rows], total
+
+
+def contar_transacciones(descripcion=None, tipo=None, categoria_id=None,
+                         fecha_desde=None, fecha_hasta=None) -> int:
+    where, params = _filtros_transacciones(
+        descripcion, tipo, categoria_id, fecha_desde, fecha_hasta
+    )
+
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute(f"SELECT COUNT(*) FROM transacciones t {where}", params)
+    total = cur.fetchone()[0]
+    conn.close()
+    return total
+
+
+def iterar_lotes_transacciones(descripcion=None, tipo=None, categoria_id=None,
+                               fecha_desde=None, fecha_hasta=None, tamano_lote: int = 2000):
+    """
+    Recorre el historial (más reciente primero) sin cargarlo entero en memoria.
+    Produce listas de hasta `tamano_lote` tuplas
+    (fecha, tipo, monto, categoria, descripcion); pensado para los exportadores.
+    """
+    where, params = _filtros_transacciones(
+        descripcion, tipo, categoria_id, fecha_desde, fecha_hasta
+    )
+
+    conn = get_conn()
+    # Tuplas simples: evita crear un sqlite3.Row por cada fila
+    conn.row_factory = None
+    try:
+        cur = conn.cursor()
+        cur.arraysize = tamano_lote
+        cur.execute(
+            f"""
+            SELECT t.fecha, t.tipo, t.monto, c.nombre, t.descripcion
+            FROM transacciones t
+            LEFT JOIN categorias c ON t.categoria_id = c.id
+            {where}
+            ORDER BY t.fecha DESC, t.id DESC
+            """,
+            params,
+        )
+        while True:
+            lote = cur.fetchmany()
+            if not lote:
+                break
+            yield lote
+    finally:
+        conn.close()
+
+
+def iterar_transacciones(**filtros):
+    """Igual que iterar_lotes_transacciones, pero fila a fila."""
+    for lote in iterar_lotes_transacciones(**filtros):
+        yield from lote
+
+
+def totales_por_tipo(fecha_desde=None, fecha_hasta=None):
+    """Devuelve (total_ingresos, total_gastos) calculados por SQLite."""
+    where, params = _filtros_transacciones(fecha_desde=fecha_desde, fecha_hasta=fecha_hasta)
+
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT
+            COALESCE(SUM(CASE WHEN t.tipo = 'ingreso' THEN t.monto END), 0),
+            COALESCE(SUM(CASE WHEN t.tipo = 'gasto' THEN t.monto END), 0)
+        FROM transacciones t
+        {where}
+        """,
+        params,
+    )
+    ingresos, gastos = cur.fetchone()
+    conn.close()
+    return ingresos, gastos
+
+
+def buscar_similares(descripcion: str, fecha: Optional[str] = None,
+                     monto: Optional[float] = None, limite: int = 5) -> List[Transaccion]:
+    """
+    Transacciones cuya descripción coincide con `descripcion`, ordenadas por
+    relevancia (bm25 de FTS5). Opcionalmente restringe a la misma fecha y monto.
+    Pensado para detectar duplicados al importar movimientos en lote.
+    """
+    consulta = _consulta_fts(descripcion)
+    if not consulta:
+        return []
+
+    condiciones = ["transacciones_fts MATCH ?"]
+    params = [consulta]
+    if fecha:
+        condiciones.append("t.fecha = ?")
+        params.append(fecha)
+    if monto is not None:
+        condiciones.append("t.monto = ?")
+        params.append(monto)
+
+    conn = get_conn()
+    cur = conn.cursor()
+
+    cur.execute(
+        f"""
+        SELECT
+            t.id,
+            t.tipo,
+            t.monto,
+            t.fecha,
+            t.descripcion,
+            t.categoria_id,
+            c.nombre AS categoria
+        FROM transacciones_fts f
+        JOIN transacciones t ON t.id = f.rowid
+        LEFT JOIN categorias c ON t.categoria_id = c.id
+        WHERE {' AND '.join(condiciones)}
+        ORDER BY f.rank
+        LIMIT ?
+        """,
+        params + [limite],
+    )
+
+    rows = cur.fetchall()
+    conn.close()
+    return [Transaccion.from_row(row) for row in rows]
+
+
+# Expresión SQL que agrupa la fecha (YYYY-MM-DD) en cada granularidad
+_PERIODOS_SALDO = {
+    "dia": "fecha",
+    # Lunes de la semana: '%Y-%W' partía en dos las semanas que cruzan el año
+    "semana": "date(fecha, 'weekday 0', '-6 days')",
+    "mes": "substr(fecha, 1, 7)",
+}
+
+
+def saldo_acumulado(granularidad: str = "mes", desde: Optional[str] = None, hasta: Optional[str] = None):
+    """
+    Serie de saldo acumulado calculada por SQLite con SUM(...) OVER (ORDER BY ...).
+    Devuelve tres listas paralelas: (periodos, neto_por_periodo, saldo_acumulado).
+    Las transacciones anteriores a `desde` se suman como saldo inicial.
+    """
+    if granularidad not in _PERIODOS_SALDO:
+        raise ValueError(f"Granularidad no soportada: {granularidad}")
+
+    periodo = _PERIODOS_SALDO[granularidad]
+
+    condiciones = []
+    params = []
+    if desde:
+        condiciones.append("fecha >= ?")
+        params.append(desde)
+    if hasta:
+        condiciones.append("fecha <= ?")
+        params.append(hasta)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+    conn = get_conn()
+    cur = conn.cursor()
+
+    cur.execute(
+        f"""
+        SELECT
+            periodo,
+            neto,
+            (
+                SELECT COALESCE(SUM(CASE WHEN tipo = 'ingreso' THEN monto ELSE -monto END), 0)
+                FROM transacciones
+                WHERE fecha < ?
+            ) + SUM(neto) OVER (ORDER BY periodo) AS acumulado
+        FROM (
+            SELECT
+                {periodo} AS periodo,
+                SUM(CASE WHEN tipo = 'ingreso' THEN monto ELSE -monto END) AS neto
+            FROM transacciones
+            {where}
+            GROUP BY periodo
+        )
+        ORDER BY periodo
+        """,
+        [desde or ""] + params,
+    )
+
+    rows = cur.fetchall()
+    conn.close()
+
+    periodos = [row["periodo"] for row in rows]
+    netos = [row["neto"] for row in rows]
+    acumulados = [row["acumulado"] for row in rows]
+    return periodos, netos, acumulados
+
+
+def obtener_transaccion(trans_id: int, conn=None) -> Optional[Transaccion]:
+    propia = conn is None
+    if propia:
+        conn = get_conn()
+    cur = conn.cursor()
+
+    cur.execute(
+        """
+        SELECT
+            t.id,
+            t.tipo,
+            t.monto,
+            t.fecha,
+            t.descripcion,
+            t.categoria_id,
+            c.nombre AS categoria
+        FROM transacciones t
+        LEFT JOIN categorias c ON t.categoria_id = c.id
+        WHERE t.id = ?
+        """,
+        (trans_id,),
+    )
+
+    row = cur.fetchone()
+    if propia:
+        conn.close()
+    return Transaccion.from_row(row) if row else None
+
+
+def crear_transaccion(tipo: str, monto: Optional[float] = None, fecha=None, descripcion: str = "",
+                      categoria_id=None, centavos: Optional[int] = None) -> Transaccion:
+    """
+    Inserta la transacción, evalúa las alertas del mes y devuelve la fila
+    creada (con id y nombre de categoría) para que la UI la pinte sin recargar.
+    Acepta los valores de validators.normalizar_transaccion tal cual
+    (`centavos` y `fecha` como date) o el monto y la fecha ya en texto.
+    """
+    if centavos is not None:
+        monto = centavos / 100
+    if isinstance(fecha, date):
+        fecha = fecha.isoformat()
+
     conn = get_conn()
     cur = conn.cursor()
 
@@ -240,11 +621,173 @@ def crear_transaccion(tipo: str, monto: float, fecha: str, descripcion: str, cat
         (tipo, monto, fecha, descripcion, categoria_id),
     )
     conn.commit()
+    creada = obtener_transaccion(cur.lastrowid, conn)
 
-    # --------------------------------------------------------
-    #   LÓGICA DE ALERTAS
-    # --------------------------------------------------------
-    mes = _mes_desde_fecha(fecha)
+    gastos_nuevos = {}
+    if tipo == "gasto" and categoria_id is not None:
+        gastos_nuevos[categoria_id] = {monto}
+
+    _evaluar_alertas_mes(cur, _mes_desde_fecha(fecha), gastos_nuevos, fecha)
+
+    conn.close()
+    return creada
+
+
+def crear_transacciones_lote(filas) -> int:
+    """
+    Inserta varias transacciones en UNA sola transacción (executemany) y
+    evalúa las alertas una vez por mes y categoría afectados.
+    `filas`: iterable de (tipo, monto, fecha, descripcion, categoria_id).
+    Devuelve cuántas filas se insertaron.
+    """
+    filas = list(filas)
+    if not filas:
+        return 0
+
+    conn = get_conn()
+    cur = conn.cursor()
+
+    with conn:
+        cur.executemany(
+            """
+            INSERT INTO transacciones (tipo, monto, fecha, descripcion, categoria_id)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            filas,
+        )
+
+    # Agrupar lo insertado: mes -> {categoria_id: {montos}} y última fecha del mes
+    meses = {}
+    for tipo, monto, fecha, _, categoria_id in filas:
+        mes = _mes_desde_fecha(fecha)
+        gastos_nuevos, ultima = meses.get(mes, ({}, fecha))
+        if tipo == "gasto" and categoria_id is not None:
+            gastos_nuevos.setdefault(categoria_id, set()).add(monto)
+        meses[mes] = (gastos_nuevos, max(ultima, fecha))
+
+    for mes, (gastos_nuevos, fecha) in meses.items():
+        _evaluar_alertas_mes(cur, mes, gastos_nuevos, fecha)
+
+    conn.close()
+    return len(filas)
+
+
+def recalcular_alertas(fecha_desde=None, fecha_hasta=None) -> int:
+    """
+    Vuelve a evaluar las reglas de alerta de cada mes con movimientos
+    (p. ej. tras una importación masiva o un cambio de presupuestos).
+    Las alertas ya registradas no se duplican. Devuelve los meses revisados.
+    """
+    where, params = _filtros_transacciones(fecha_desde=fecha_desde, fecha_hasta=fecha_hasta)
+
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT substr(t.fecha, 1, 7) AS mes, t.categoria_id, t.monto, t.tipo,
+               MAX(t.fecha) AS ultima
+        FROM transacciones t
+        {where}
+        GROUP BY mes, t.categoria_id, t.monto, t.tipo
+        """,
+        params,
+    )
+
+    meses = {}
+    for row in cur.fetchall():
+        gastos, ultima = meses.get(row["mes"], ({}, row["ultima"]))
+        if row["tipo"] == "gasto" and row["categoria_id"] is not None:
+            gastos.setdefault(row["categoria_id"], set()).add(row["monto"])
+        meses[row["mes"]] = (gastos, max(ultima, row["ultima"]))
+
+    for mes in sorted(meses):
+        gastos, ultima = meses[mes]
+        _evaluar_alertas_mes(cur, mes, gastos, ultima)
+
+    conn.close()
+    return len(meses)
+
+
+def importar_transacciones(lotes):
+    """
+    Inserta lotes de (tipo, monto, fecha, descripcion, categoria, import_hash)
+    en UNA sola transacción, consumiendo `lotes` a medida que llegan.
+    `categoria` es el nombre (se crea si no existe). Las filas cuyo
+    import_hash ya está en la base se omiten.
+    Devuelve (insertadas, duplicadas).
+    """
+    conn = get_conn()
+    cur = conn.cursor()
+
+    insertadas = duplicadas = 0
+    meses = {}
+
+    with conn:
+        # BEGIN explícito: el DROP TRIGGER también debe deshacerse si algo falla.
+        # IMMEDIATE toma el bloqueo de escritura antes de leer MAX(id): nadie
+        # puede insertar entre esa lectura y el indexado en bloque
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("SELECT nombre, id FROM categorias")
+        ids = {row["nombre"]: row["id"] for row in cur.fetchall()}
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM transacciones")
+        max_id_previo = cur.fetchone()[0]
+
+        cur.execute("DROP TRIGGER IF EXISTS transacciones_fts_ai")
+
+        for lote in lotes:
+            filas = []
+            for tipo, monto, fecha, descripcion, categoria, import_hash in lote:
+                categoria_id = None
+                if categoria:
+                    categoria_id = ids.get(categoria)
+                    if categoria_id is None:
+                        cur.execute("INSERT INTO categorias (nombre) VALUES (?)", (categoria,))
+                        categoria_id = ids[categoria] = cur.lastrowid
+                filas.append((tipo, monto, fecha, descripcion, categoria_id, import_hash))
+
+                mes = _mes_desde_fecha(fecha)
+                gastos_nuevos, ultima = meses.get(mes, ({}, fecha))
+                if tipo == "gasto" and categoria_id is not None:
+                    gastos_nuevos.setdefault(categoria_id, set()).add(monto)
+                meses[mes] = (gastos_nuevos, max(ultima, fecha))
+
+            cur.executemany(
+                """
+                INSERT OR IGNORE INTO transacciones
+                    (tipo, monto, fecha, descripcion, categoria_id, import_hash)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                filas,
+            )
+            insertadas += cur.rowcount
+            duplicadas += len(filas) - cur.rowcount
+
+        # Indexar en bloque las descripciones nuevas y restaurar el trigger
+        cur.execute(
+            """
+            INSERT INTO transacciones_fts (rowid, descripcion)
+            SELECT id, descripcion FROM transacciones WHERE id > ?
+            """,
+            (max_id_previo,),
+        )
+        cur.execute(SQL_TRIGGER_FTS_INSERT)
+
+    # Alertas una vez por mes afectado, con todo ya insertado
+    for mes, (gastos_nuevos, fecha) in meses.items():
+        _evaluar_alertas_mes(cur, mes, gastos_nuevos, fecha)
+
+    conn.close()
+    return insertadas, duplicadas
+
+
+def _evaluar_alertas_mes(cur, mes: str, gastos_nuevos: dict, fecha: str):
+    """
+    Evalúa las reglas de alerta de un mes tras insertar movimientos.
+    `gastos_nuevos`: {categoria_id: {montos}} de los gastos recién creados;
+    las reglas por categoría solo se revisan para esas categorías.
+    """
+    # Rango del mes: permite usar el índice por fecha
+    desde, hasta = f"{mes}-01", f"{mes}-31"
 
     # 1) Cargar presupuestos en memoria
     cur.execute("SELECT * FROM presupuestos")
@@ -256,10 +799,10 @@ def crear_transaccion(tipo: str, monto: float, fecha: str, descripcion: str, cat
         """
         SELECT categoria_id, SUM(monto) AS total
         FROM transacciones
-        WHERE tipo = 'gasto' AND substr(fecha, 1, 7) = ?
+        WHERE tipo = 'gasto' AND fecha BETWEEN ? AND ?
         GROUP BY categoria_id
         """,
-        (mes,),
+        (desde, hasta),
     )
     gastos_mes_por_cat = {row["categoria_id"]: row["total"] for row in cur.fetchall()}
 
@@ -270,36 +813,19 @@ def crear_transaccion(tipo: str, monto: float, fecha: str, descripcion: str, cat
             SUM(CASE WHEN tipo = 'ingreso' THEN monto ELSE 0 END) AS total_ingresos,
             SUM(CASE WHEN tipo = 'gasto' THEN monto ELSE 0 END) AS total_gastos
         FROM transacciones
-        WHERE substr(fecha, 1, 7) = ?
+        WHERE fecha BETWEEN ? AND ?
         """,
-        (mes,),
+        (desde, hasta),
     )
     row_totales = cur.fetchone()
     total_ingresos_mes = row_totales["total_ingresos"] or 0
     total_gastos_mes = row_totales["total_gastos"] or 0
     saldo_mes = total_ingresos_mes - total_gastos_mes
 
-    # 4) Gasto repetitivo (mismo monto, misma categoría, mismo mes)
-    if tipo == "gasto" and categoria_id is not None:
-        cur.execute(
-            """
-            SELECT COUNT(*) AS total
-            FROM transacciones
-            WHERE tipo = 'gasto'
-              AND categoria_id = ?
-              AND monto = ?
-              AND substr(fecha, 1, 7) = ?
-            """,
-            (categoria_id, monto, mes),
-        )
-        rep_count = cur.fetchone()["total"]
-    else:
-        rep_count = 0
-
     # --------------------------------------------------------
-    #   4.1) Alertas por presupuesto (por categoría)
+    #   Alertas por categoría (presupuesto y gasto repetitivo)
     # --------------------------------------------------------
-    if tipo == "gasto" and categoria_id is not None:
+    for categoria_id, montos in gastos_nuevos.items():
         total_gastado_cat = gastos_mes_por_cat.get(categoria_id, 0)
         presupuesto_cat = presupuestos.get(categoria_id)
 
@@ -308,50 +834,69 @@ def crear_transaccion(tipo: str, monto: float, fecha: str, descripcion: str, cat
 
             # Supera presupuesto
             if total_gastado_cat > maximo:
-                tipo_alerta = "presupuesto_superado"
-                if not _existe_alerta_en_mes(tipo_alerta, mes, categoria_id):
-                    mensaje = f"Has superado el presupuesto mensual de la categoría."
-                    crear_alerta(categoria_id, tipo_alerta, mensaje, fecha)
+                _registrar_alerta(
+                    "presupuesto_superado",
+                    "Has superado el presupuesto mensual de la categoría.",
+                    mes, categoria_id, fecha,
+                )
 
             # Llega al 90% del presupuesto
             elif total_gastado_cat >= 0.9 * maximo:
-                tipo_alerta = "presupuesto_cercano"
-                if not _existe_alerta_en_mes(tipo_alerta, mes, categoria_id):
-                    mensaje = f"Estás por alcanzar el presupuesto de la categoría (90%)."
-                    crear_alerta(categoria_id, tipo_alerta, mensaje, fecha)
+                _registrar_alerta(
+                    "presupuesto_cercano",
+                    "Estás por alcanzar el presupuesto de la categoría (90%).",
+                    mes, categoria_id, fecha,
+                )
         else:
             # Categoría sin presupuesto definido
-            tipo_alerta = "categoria_sin_presupuesto"
-            if not _existe_alerta_en_mes(tipo_alerta, mes, categoria_id):
-                mensaje = "Esta categoría no tiene presupuesto asignado."
-                crear_alerta(categoria_id, tipo_alerta, mensaje, fecha)
+            _registrar_alerta(
+                "categoria_sin_presupuesto",
+                "Esta categoría no tiene presupuesto asignado.",
+                mes, categoria_id, fecha,
+            )
+
+        # Gasto repetitivo (3 o más veces mismo monto y categoría en el mes)
+        marcas = ", ".join("?" for _ in montos)
+        cur.execute(
+            f"""
+            SELECT 1
+            FROM transacciones
+            WHERE tipo = 'gasto'
+              AND categoria_id = ?
+              AND monto IN ({marcas})
+              AND fecha BETWEEN ? AND ?
+            GROUP BY monto
+            HAVING COUNT(*) >= 3
+            LIMIT 1
+            """,
+            (categoria_id, *montos, desde, hasta),
+        )
+        if cur.fetchone():
+            _registrar_alerta(
+                "gasto_repetitivo",
+                "Se han detectado gastos repetitivos en esta categoría este mes.",
+                mes, categoria_id, fecha,
+            )
 
     # --------------------------------------------------------
-    #   4.2) Alertas globales (mes completo)
+    #   Alertas globales (mes completo)
     # --------------------------------------------------------
 
     # Gastos del mes > ingresos del mes
     if total_gastos_mes > total_ingresos_mes:
-        tipo_alerta = "gastos_mayores_ingresos"
-        if not _existe_alerta_en_mes(tipo_alerta, mes, None):
-            mensaje = "En este mes, los gastos totales superan a los ingresos."
-            crear_alerta(None, tipo_alerta, mensaje, fecha)
+        _registrar_alerta(
+            "gastos_mayores_ingresos",
+            "En este mes, los gastos totales superan a los ingresos.",
+            mes, None, fecha,
+        )
 
     # Saldo del mes negativo
     if saldo_mes < 0:
-        tipo_alerta = "saldo_negativo"
-        if not _existe_alerta_en_mes(tipo_alerta, mes, None):
-            mensaje = "El saldo de este mes es negativo."
-            crear_alerta(None, tipo_alerta, mensaje, fecha)
-
-    # Gasto repetitivo (3 o más veces mismo monto y categoría en el mes)
-    if rep_count >= 3:
-        tipo_alerta = "gasto_repetitivo"
-        if not _existe_alerta_en_mes(tipo_alerta, mes, categoria_id):
-            mensaje = "Se han detectado gastos repetitivos en esta categoría este mes."
-            crear_alerta(categoria_id, tipo_alerta, mensaje, fecha)
-
-    conn.close()
+        _registrar_alerta(
+            "saldo_negativo",
+            "El saldo de este mes es negativo.",
+            mes, None, fecha,
+        )
 
 
 def eliminar_transaccion(trans_id: int):
@@ -362,6 +907,296 @@ def eliminar_transaccion(trans_id: int):
     conn.close()
 
 
+# ============================================================
+#   OPERACIONES MASIVAS
+# ============================================================
+
+def _seleccion_transacciones(ids=None, filtros=None, todas=False):
+    """
+    WHERE de una operación masiva: una lista de ids (pasada como un único
+    parámetro JSON, sin límite de variables) o los filtros del historial.
+    Unos filtros vacíos abarcan toda la tabla: solo se aceptan con todas=True.
+    """
+    if ids is not None:
+        return (
+            "WHERE t.id IN (SELECT value FROM json_each(?))",
+            [json.dumps([int(i) for i in ids])],
+        )
+    if filtros is None:
+        raise ValueError("Indique ids o filtros para la operación masiva.")
+
+    where, params = _filtros_transacciones(**filtros)
+    if not where and not todas:
+        raise ValueError("Los filtros están vacíos: use todas=True para afectar a todas las transacciones.")
+    return where, params
+
+
+def eliminar_transacciones(ids=None, filtros=None, todas=False) -> int:
+    """
+    Elimina en una sola sentencia las transacciones seleccionadas
+    (por ids o por los filtros del historial). Devuelve cuántas borró.
+    """
+    where, params = _seleccion_transacciones(ids, filtros, todas)
+
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute(f"DELETE FROM transacciones AS t {where}", params)
+    borradas = cur.rowcount
+    conn.commit()
+    conn.close()
+    return borradas
+
+
+def recategorizar_transacciones(categoria_id: int, ids=None, filtros=None, todas=False) -> int:
+    """
+    Asigna `categoria_id` a todas las transacciones seleccionadas con un
+    único UPDATE y reevalúa las alertas una vez por mes afectado.
+    Devuelve cuántas filas cambió.
+    """
+    where, params = _seleccion_transacciones(ids, filtros, todas)
+
+    conn = get_conn()
+    cur = conn.cursor()
+
+    # Gastos que van a pasar a la categoría (antes del UPDATE, porque un
+    # filtro por la categoría anterior dejaría de coincidir después)
+    condicion = f"{where} AND t.tipo = 'gasto'" if where else "WHERE t.tipo = 'gasto'"
+    cur.execute(
+        f"""
+        SELECT substr(t.fecha, 1, 7) AS mes, t.monto, MAX(t.fecha) AS ultima
+        FROM transacciones t
+        {condicion}
+        GROUP BY mes, t.monto
+        """,
+        params,
+    )
+    meses = {}
+    for row in cur.fetchall():
+        montos, ultima = meses.get(row["mes"], (set(), row["ultima"]))
+        montos.add(row["monto"])
+        meses[row["mes"]] = (montos, max(ultima, row["ultima"]))
+
+    with conn:
+        cur.execute(
+            f"UPDATE transacciones AS t SET categoria_id = ? {where}",
+            [categoria_id] + params,
+        )
+        cambiadas = cur.rowcount
+
+    for mes, (montos, ultima) in meses.items():
+        _evaluar_alertas_mes(cur, mes, {categoria_id: montos}, ultima)
+
+    conn.close()
+    return cambiadas
+
+
+# ============================================================
+#   ANÁLISIS (AGREGADOS CALCULADOS EN SQL)
+# ============================================================
+
+def _consulta_agregada(sql: str, params) -> list:
+    conn = get_conn()
+    conn.row_factory = None
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    filas = cur.fetchall()
+    conn.close()
+    return filas
+
+
+def gastos_por_mes_categoria(fecha_desde=None, fecha_hasta=None) -> list:
+    """Lista de (mes, categoria, total_gastado) agrupada por SQLite."""
+    where, params = _filtros_transacciones(
+        tipo="gasto", fecha_desde=fecha_desde, fecha_hasta=fecha_hasta
+    )
+    return _consulta_agregada(
+        f"""
+        SELECT substr(t.fecha, 1, 7) AS mes,
+               COALESCE(c.nombre, 'Sin categoría') AS categoria,
+               SUM(t.monto)
+        FROM transacciones t
+        LEFT JOIN categorias c ON t.categoria_id = c.id
+        {where}
+        GROUP BY mes, categoria
+        ORDER BY mes, categoria
+        """,
+        params,
+    )
+
+
+def totales_por_anio(fecha_desde=None, fecha_hasta=None) -> list:
+    """Lista de (año, ingresos, gastos, cantidad_de_movimientos)."""
+    where, params = _filtros_transacciones(fecha_desde=fecha_desde, fecha_hasta=fecha_hasta)
+    return _consulta_agregada(
+        f"""
+        SELECT substr(t.fecha, 1, 4) AS anio,
+               COALESCE(SUM(CASE WHEN t.tipo = 'ingreso' THEN t.monto END), 0),
+               COALESCE(SUM(CASE WHEN t.tipo = 'gasto' THEN t.monto END), 0),
+               COUNT(*)
+        FROM transacciones t
+        {where}
+        GROUP BY anio
+        ORDER BY anio
+        """,
+        params,
+    )
+
+
+def top_categorias_gasto(limite: int = 10, fecha_desde=None, fecha_hasta=None) -> list:
+    """Lista de (categoria, total, cantidad, fraccion_del_gasto_total), de mayor a menor."""
+    where, params = _filtros_transacciones(
+        tipo="gasto", fecha_desde=fecha_desde, fecha_hasta=fecha_hasta
+    )
+    return _consulta_agregada(
+        f"""
+        SELECT COALESCE(c.nombre, 'Sin categoría') AS categoria,
+               SUM(t.monto) AS total,
+               COUNT(*),
+               SUM(t.monto) / SUM(SUM(t.monto)) OVER ()
+        FROM transacciones t
+        LEFT JOIN categorias c ON t.categoria_id = c.id
+        {where}
+        GROUP BY categoria
+        ORDER BY total DESC
+        LIMIT ?
+        """,
+        params + [limite],
+    )
+
+
+def presupuesto_vs_real(fecha_desde=None, fecha_hasta=None) -> list:
+    """
+    Lista de (mes, categoria, presupuesto, gastado) para cada categoría con
+    presupuesto y cada mes con movimientos en el rango.
+    """
+    where, params = _filtros_transacciones(fecha_desde=fecha_desde, fecha_hasta=fecha_hasta)
+    where_gastos, params_gastos = _filtros_transacciones(
+        tipo="gasto", fecha_desde=fecha_desde, fecha_hasta=fecha_hasta
+    )
+    return _consulta_agregada(
+        f"""
+        WITH meses AS (
+            SELECT DISTINCT substr(t.fecha, 1, 7) AS mes
+            FROM transacciones t
+            {where}
+        ),
+        gastos AS (
+            SELECT substr(t.fecha, 1, 7) AS mes, t.categoria_id, SUM(t.monto) AS total
+            FROM transacciones t
+            {where_gastos}
+            GROUP BY mes, t.categoria_id
+        )
+        SELECT m.mes, c.nombre, p.monto_maximo, COALESCE(g.total, 0)
+        FROM meses m
+        CROSS JOIN presupuestos p
+        JOIN categorias c ON c.id = p.categoria_id
+        LEFT JOIN gastos g ON g.mes = m.mes AND g.categoria_id = p.categoria_id
+        ORDER BY m.mes, c.nombre
+        """,
+        params + params_gastos,
+    )
+
+
+# ============================================================
+#   EXPORTACIÓN INCREMENTAL
+# ============================================================
+
+def obtener_marca_exportacion(nombre: str):
+    """Devuelve (ultimo_seq, ultimo_id) de la exportación `nombre`, o None."""
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT ultimo_seq, ultimo_id FROM marcas_exportacion WHERE nombre = ?",
+        (nombre,),
+    )
+    row = cur.fetchone()
+    conn.close()
+    return (row["ultimo_seq"], row["ultimo_id"]) if row else None
+
+
+def estado_cambios_transacciones():
+    """Devuelve (último seq del registro de cambios, mayor id de transacción)."""
+    conn = get_conn()
+    cur = conn.cursor()
+    # De sqlite_sequence y no de MAX(seq): la poda puede dejar el registro vacío
+    cur.execute("""
+        SELECT
+            (SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'transacciones_cambios'),
+            (SELECT COALESCE(MAX(id), 0) FROM transacciones)
+    """)
+    seq, max_id = cur.fetchone()
+    conn.close()
+    return seq, max_id
+
+
+def iterar_cambios_transacciones(desde_seq: Optional[int], hasta_seq: int, tamano_lote: int = 2000):
+    """
+    Produce lotes de tuplas (id, fecha, tipo, monto, categoria, descripcion)
+    con el estado actual de cada transacción cambiada en (desde_seq, hasta_seq].
+    Si la transacción ya no existe, todo salvo el id es None (baja).
+    Con desde_seq=None recorre el historial completo (primera exportación).
+    """
+    if desde_seq is None:
+        sql = """
+            SELECT t.id, t.fecha, t.tipo, t.monto, c.nombre, t.descripcion
+            FROM transacciones t
+            LEFT JOIN categorias c ON t.categoria_id = c.id
+            ORDER BY t.id
+        """
+        params = ()
+    else:
+        # Varios cambios de la misma transacción cuentan una sola vez
+        sql = """
+            SELECT m.trans_id, t.fecha, t.tipo, t.monto, c.nombre, t.descripcion
+            FROM (
+                SELECT trans_id, MAX(seq) AS seq
+                FROM transacciones_cambios
+                WHERE seq > ? AND seq <= ?
+                GROUP BY trans_id
+            ) m
+            LEFT JOIN transacciones t ON t.id = m.trans_id
+            LEFT JOIN categorias c ON t.categoria_id = c.id
+            ORDER BY m.seq
+        """
+        params = (desde_seq, hasta_seq)
+
+    conn = get_conn()
+    conn.row_factory = None
+    try:
+        cur = conn.cursor()
+        cur.arraysize = tamano_lote
+        cur.execute(sql, params)
+        while True:
+            lote = cur.fetchmany()
+            if not lote:
+                break
+            yield lote
+    finally:
+        conn.close()
+
+
+def guardar_marca_exportacion(nombre: str, ultimo_seq: int, ultimo_id: int):
+    """
+    Registra hasta dónde llegó la exportación `nombre` y descarta del
+    registro los cambios que ya exportaron todas las exportaciones.
+    """
+    conn = get_conn()
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO marcas_exportacion (nombre, ultimo_seq, ultimo_id, fecha)
+            VALUES (?, ?, ?, datetime('now', 'localtime'))
+            ON CONFLICT(nombre) DO UPDATE SET
+                ultimo_seq = excluded.ultimo_seq,
+                ultimo_id = excluded.ultimo_id,
+                fecha = excluded.fecha
+            """,
+            (nombre, ultimo_seq, ultimo_id),
+        )
+        conn.execute(SQL_PODAR_CAMBIOS)
+    conn.close()
+
+
 # ============================================================
 #   ALERTAS
 # ============================================================
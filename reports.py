@@ -1,36 +1,188 @@
 # reports.py
+import calendar
+import csv
+import hashlib
+import json
 import os
-from datetime import datetime
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from functools import lru_cache
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.pdfgen import canvas
 
-from models import obtener_transacciones
+import database
+from models import (
+    contar_transacciones,
+    estado_cambios_transacciones,
+    gastos_por_mes_categoria,
+    presupuesto_vs_real,
+    top_categorias_gasto,
+    totales_por_anio,
+    guardar_marca_exportacion,
+    iterar_cambios_transacciones,
+    obtener_marca_exportacion,
+    iterar_transacciones,
+    iterar_lotes_transacciones,
+    totales_por_tipo,
+)
+
+# Parquet es opcional: solo disponible si pyarrow está instalado
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Cada cuántas filas se informa el avance a `progreso(escritas, total)`
+INTERVALO_PROGRESO = 500
+
+
+def _informar(progreso, escritas, total):
+    """Llama al callback de avance cada INTERVALO_PROGRESO filas y al final."""
+    if progreso and (escritas % INTERVALO_PROGRESO == 0 or escritas == total):
+        progreso(escritas, total)
 
 
 # ============================================================
-#   EXPORTAR HISTORIAL COMPLETO A EXCEL
+#   EXCEL EN MODO STREAMING (write_only)
 # ============================================================
 
-def exportar_historial_excel(ruta="reportes/historial.xlsx"):
-    trans = obtener_transacciones()
+# (título, ancho, formato numérico) de cada columna del historial
+COLUMNAS_HISTORIAL = [
+    ("Fecha", 12, "yyyy-mm-dd"),
+    ("Tipo", 10, None),
+    ("Monto", 14, "#,##0.00"),
+    ("Categoría", 22, None),
+    ("Descripción", 45, None),
+]
+
+
+def _libro_streaming(titulo, columnas):
+    """
+    Libro en modo write_only: cada fila se escribe al disco al agregarla,
+    así la memoria no crece con el tamaño del historial.
+    """
+    wb = Workbook(write_only=True)
+    return wb, _hoja_streaming(wb, titulo, columnas)
+
+
+def _hoja_streaming(wb, titulo, columnas):
+    ws = wb.create_sheet(titulo)
+
+    # Los anchos solo se pueden fijar antes de escribir la primera fila
+    for i, (_, ancho, _) in enumerate(columnas):
+        ws.column_dimensions[get_column_letter(i + 1)].width = ancho
+
+    encabezado = []
+    for nombre, _, _ in columnas:
+        celda = WriteOnlyCell(ws, value=nombre)
+        celda.font = Font(bold=True)
+        encabezado.append(celda)
+    ws.append(encabezado)
+
+    return ws
+
+
+def _escribir_tabla(ws, columnas, filas):
+    """
+    Escribe filas de resumen con el formato de cada columna.
+    Como en _escribir_filas, hay una celda con formato por columna que se reutiliza.
+    """
+    celdas = []
+    for _, _, formato in columnas:
+        if formato:
+            celda = WriteOnlyCell(ws)
+            celda.number_format = formato
+            celdas.append(celda)
+        else:
+            celdas.append(None)
+
+    for fila in filas:
+        valores = []
+        for celda, valor in zip(celdas, fila):
+            if celda is None or valor is None:
+                valores.append(valor)
+            else:
+                celda.value = valor
+                valores.append(celda)
+        ws.append(valores)
+
+
+def _escribir_filas(ws, columnas, filas, total, progreso=None):
+    """
+    Vuelca las filas (tuplas en el orden de `columnas`) en la hoja.
+    `columnas` son las del historial, opcionalmente precedidas de columnas
+    extra sin formato (p. ej. operación e id en la exportación incremental).
+    Las celdas con formato se crean una sola vez por columna y se reutilizan:
+    append() serializa la fila en el acto, así que basta con cambiar el valor.
+    """
+    extra = len(columnas) - len(COLUMNAS_HISTORIAL)
+    columnas = columnas[extra:]
+
+    celdas = []
+    for _, _, formato in columnas:
+        if formato:
+            celda = WriteOnlyCell(ws)
+            celda.number_format = formato
+            celdas.append(celda)
+        else:
+            celdas.append(None)
+
+    # Muchas transacciones comparten fecha: se convierte cada texto una vez
+    fechas = {}
+
+    def a_fecha(texto):
+        valor = fechas.get(texto)
+        if valor is None:
+            try:
+                valor = date.fromisoformat(texto)
+            except (TypeError, ValueError):
+                valor = texto
+            fechas[texto] = valor
+        return valor
+
+    escritas = 0
+    inicio = []
+    for fila in filas:
+        if extra:
+            inicio, fila = list(fila[:extra]), fila[extra:]
+        fecha, tipo, monto, categoria, descripcion = fila
+        celdas[0].value = a_fecha(fecha)
+        celdas[2].value = monto
+        ws.append(inicio + [celdas[0], tipo, celdas[2], categoria or "—", descripcion])
+
+        escritas += 1
+        _informar(progreso, escritas, total)
+
+    # Historial vacío: avisar igualmente que terminó
+    if escritas == 0 and progreso:
+        progreso(0, total)
 
-    os.makedirs("reportes", exist_ok=True)
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Historial"
+# ============================================================
+#   EXPORTAR HISTORIAL COMPLETO A EXCEL
+# ============================================================
 
-    ws.append(["Fecha", "Tipo", "Monto", "Categoría", "Descripción"])
+def exportar_historial_excel(ruta="reportes/historial.xlsx", progreso=None):
+    os.makedirs("reportes", exist_ok=True)
 
-    for t in trans:
-        ws.append([
-            t.fecha,
-            t.tipo,
-            t.monto,
-            t.categoria_nombre or "—",
-            t.descripcion,
-        ])
+    wb, ws = _libro_streaming("Historial", COLUMNAS_HISTORIAL)
+    _escribir_filas(
+        ws,
+        COLUMNAS_HISTORIAL,
+        iterar_transacciones(),
+        contar_transacciones(),
+        progreso,
+    )
 
     wb.save(ruta)
     return ruta
@@ -40,30 +192,21 @@ def exportar_historial_excel(ruta="reportes/historial.xlsx"):
 #   EXPORTAR INGRESOS/GASTOS POR RANGO DE FECHAS
 # ============================================================
 
-def exportar_por_rango_excel(fecha_desde, fecha_hasta, ruta="reportes/rango.xlsx"):
-    trans = obtener_transacciones()
-
-    filtradas = [
-        t for t in trans
-        if fecha_desde <= t.fecha <= fecha_hasta
-    ]
-
+def exportar_por_rango_excel(fecha_desde, fecha_hasta, ruta="reportes/rango.xlsx", progreso=None,
+                             tipo=None):
     os.makedirs("reportes", exist_ok=True)
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Rango"
+    # El rango lo filtra SQLite (índice por fecha), no Python
+    filtros = dict(fecha_desde=fecha_desde, fecha_hasta=fecha_hasta, tipo=tipo)
 
-    ws.append(["Fecha", "Tipo", "Monto", "Categoría", "Descripción"])
-
-    for t in filtradas:
-        ws.append([
-            t.fecha,
-            t.tipo,
-            t.monto,
-            t.categoria_nombre or "—",
-            t.descripcion,
-        ])
+    wb, ws = _libro_streaming("Rango", COLUMNAS_HISTORIAL)
+    _escribir_filas(
+        ws,
+        COLUMNAS_HISTORIAL,
+        iterar_transacciones(**filtros),
+        contar_transacciones(**filtros),
+        progreso,
+    )
 
     wb.save(ruta)
     return ruta
@@ -74,68 +217,519 @@ def exportar_por_rango_excel(fecha_desde, fecha_hasta, ruta="reportes/rango.xlsx
 # ============================================================
 
 def exportar_estado_cuenta_excel(ruta="reportes/estado_cuenta.xlsx"):
-    trans = obtener_transacciones()
-
-    ingresos = sum(t.monto for t in trans if t.tipo == "ingreso")
-    gastos = sum(t.monto for t in trans if t.tipo == "gasto")
+    ingresos, gastos = totales_por_tipo()
     saldo = ingresos - gastos
 
     os.makedirs("reportes", exist_ok=True)
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Estado de Cuenta"
+    columnas = [("Concepto", 20, None), ("Valor", 16, "#,##0.00")]
+    wb, ws = _libro_streaming("Estado de Cuenta", columnas)
 
-    ws.append(["Concepto", "Valor"])
-    ws.append(["Total Ingresos", ingresos])
-    ws.append(["Total Gastos", gastos])
-    ws.append(["Saldo Actual", saldo])
+    for concepto, valor in (
+        ("Total Ingresos", ingresos),
+        ("Total Gastos", gastos),
+        ("Saldo Actual", saldo),
+    ):
+        celda = WriteOnlyCell(ws, value=valor)
+        celda.number_format = "#,##0.00"
+        ws.append([concepto, celda])
 
     wb.save(ruta)
     return ruta
 
 
 # ============================================================
-#   EXPORTAR HISTORIAL A PDF (PROFESIONAL)
+#   LIBRO DE ANÁLISIS (tablas dinámicas calculadas en SQL)
 # ============================================================
 
-def exportar_historial_pdf(ruta="reportes/historial.pdf"):
-    trans = obtener_transacciones()
+FORMATO_MONTO = "#,##0.00"
+FORMATO_PORCENTAJE = "0.0%"
+
+
+def exportar_analisis_excel(ruta="reportes/analisis.xlsx", fecha_desde=None, fecha_hasta=None,
+                            top_n=10):
+    """
+    Libro con varias hojas de análisis: gastos mes × categoría, totales
+    año × tipo, categorías con más gasto y presupuesto vs real.
+    Todo se agrega con GROUP BY en SQLite; a Excel solo llegan los totales.
+    """
+    rango = dict(fecha_desde=fecha_desde, fecha_hasta=fecha_hasta)
 
     os.makedirs("reportes", exist_ok=True)
+    wb = Workbook(write_only=True)
+
+    # ---------------- Mes × Categoría (gastos) ----------------
+    por_mes = {}
+    totales_cat = {}
+    for mes, categoria, total in gastos_por_mes_categoria(**rango):
+        por_mes.setdefault(mes, {})[categoria] = total
+        totales_cat[categoria] = totales_cat.get(categoria, 0) + total
+
+    # Categorías de mayor a menor gasto, como en una tabla dinámica ordenada
+    categorias = sorted(totales_cat, key=totales_cat.get, reverse=True)
+    columnas = (
+        [("Mes", 10, None)]
+        + [(cat, max(12, len(cat) + 2), FORMATO_MONTO) for cat in categorias]
+        + [("Total", 14, FORMATO_MONTO)]
+    )
+    ws = _hoja_streaming(wb, "Mes x Categoría", columnas)
+    _escribir_tabla(ws, columnas, (
+        [mes] + [fila.get(cat) for cat in categorias] + [sum(fila.values())]
+        for mes, fila in por_mes.items()
+    ))
+    _escribir_tabla(ws, columnas, [
+        ["Total"] + [totales_cat[cat] for cat in categorias] + [sum(totales_cat.values())]
+    ])
+
+    # ---------------- Año × Tipo ----------------
+    columnas = [
+        ("Año", 8, None),
+        ("Ingresos", 16, FORMATO_MONTO),
+        ("Gastos", 16, FORMATO_MONTO),
+        ("Neto", 16, FORMATO_MONTO),
+        ("Movimientos", 13, "#,##0"),
+    ]
+    ws = _hoja_streaming(wb, "Año x Tipo", columnas)
+    _escribir_tabla(ws, columnas, (
+        (anio, ingresos, gastos, ingresos - gastos, cantidad)
+        for anio, ingresos, gastos, cantidad in totales_por_anio(**rango)
+    ))
+
+    # ---------------- Top categorías de gasto ----------------
+    columnas = [
+        ("Categoría", 24, None),
+        ("Total", 16, FORMATO_MONTO),
+        ("Movimientos", 13, "#,##0"),
+        ("% del gasto", 12, FORMATO_PORCENTAJE),
+    ]
+    ws = _hoja_streaming(wb, f"Top {top_n} categorías", columnas)
+    _escribir_tabla(ws, columnas, top_categorias_gasto(top_n, **rango))
+
+    # ---------------- Presupuesto vs real ----------------
+    columnas = [
+        ("Mes", 10, None),
+        ("Categoría", 24, None),
+        ("Presupuesto", 16, FORMATO_MONTO),
+        ("Gastado", 16, FORMATO_MONTO),
+        ("Diferencia", 16, FORMATO_MONTO),
+        ("% usado", 10, FORMATO_PORCENTAJE),
+    ]
+    ws = _hoja_streaming(wb, "Presupuesto vs Real", columnas)
+    _escribir_tabla(ws, columnas, (
+        (mes, categoria, presupuesto, gastado, presupuesto - gastado,
+         gastado / presupuesto if presupuesto else None)
+        for mes, categoria, presupuesto, gastado in presupuesto_vs_real(**rango)
+    ))
 
-    c = canvas.Canvas(ruta, pagesize=letter)
-    width, height = letter
+    wb.save(ruta)
+    return ruta
 
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(50, height - 50, "Historial de Transacciones")
 
-    c.setFont("Helvetica", 10)
-    y = height - 90
+# ============================================================
+#   EXPORTAR A CSV / PARQUET (para procesos automáticos)
+# ============================================================
 
-    c.drawString(50, y, "Fecha")
-    c.drawString(120, y, "Tipo")
-    c.drawString(180, y, "Monto")
-    c.drawString(250, y, "Categoría")
-    c.drawString(350, y, "Descripción")
+ENCABEZADO_CSV = ["fecha", "tipo", "monto", "categoria", "descripcion"]
 
-    y -= 20
+# Filas por grupo de Parquet: lotes grandes comprimen y se leen mejor
+LOTE_PARQUET = 50_000
 
-    for t in trans:
-        if y < 50:  # Nueva página
-            c.showPage()
-            c.setFont("Helvetica", 10)
-            y = height - 50
 
-        c.drawString(50, y, t.fecha)
-        c.drawString(120, y, t.tipo)
-        c.drawString(180, y, f"${t.monto:.0f}")
-        c.drawString(250, y, t.categoria_nombre or "—")
-        c.drawString(350, y, t.descripcion[:40])
+def _filtros_exportacion(fecha_desde=None, fecha_hasta=None, tipo=None):
+    return dict(fecha_desde=fecha_desde, fecha_hasta=fecha_hasta, tipo=tipo)
 
-        y -= 20
 
-    c.save()
+def exportar_transacciones_csv(ruta="reportes/transacciones.csv", fecha_desde=None,
+                               fecha_hasta=None, tipo=None, progreso=None):
+    """
+    CSV UTF-8 con fechas ISO y montos sin formato, escrito por lotes
+    directamente desde el cursor.
+    """
+    filtros = _filtros_exportacion(fecha_desde, fecha_hasta, tipo)
+    total = contar_transacciones(**filtros)
+
+    os.makedirs("reportes", exist_ok=True)
+
+    escritas = 0
+    with open(ruta, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(ENCABEZADO_CSV)
+
+        for lote in iterar_lotes_transacciones(**filtros):
+            writer.writerows(lote)
+            escritas += len(lote)
+            if progreso:
+                progreso(escritas, total)
+
+    if escritas == 0 and progreso:
+        progreso(0, total)
+
+    return ruta
+
+
+def exportar_transacciones_parquet(ruta="reportes/transacciones.parquet", fecha_desde=None,
+                                   fecha_hasta=None, tipo=None, progreso=None):
+    """
+    Parquet columnar escrito por lotes (un row group por lote).
+    Requiere pyarrow; si no está instalado lanza RuntimeError.
+    """
+    if pa is None:
+        raise RuntimeError("La exportación a Parquet requiere instalar pyarrow.")
+
+    filtros = _filtros_exportacion(fecha_desde, fecha_hasta, tipo)
+    total = contar_transacciones(**filtros)
+
+    esquema = pa.schema([
+        ("fecha", pa.date32()),
+        ("tipo", pa.dictionary(pa.int8(), pa.string())),
+        ("monto", pa.float64()),
+        ("categoria", pa.string()),
+        ("descripcion", pa.string()),
+    ])
+
+    os.makedirs("reportes", exist_ok=True)
+
+    escritas = 0
+    with pq.ParquetWriter(ruta, esquema, compression="snappy") as writer:
+        for lote in iterar_lotes_transacciones(tamano_lote=LOTE_PARQUET, **filtros):
+            fechas, tipos, montos, categorias, descripciones = zip(*lote)
+            writer.write_batch(pa.record_batch(
+                [
+                    pa.array(fechas, pa.string()).cast(pa.date32()),
+                    pa.array(tipos, pa.string()).dictionary_encode().cast(esquema.field("tipo").type),
+                    pa.array(montos, pa.float64()),
+                    pa.array(categorias, pa.string()),
+                    pa.array(descripciones, pa.string()),
+                ],
+                schema=esquema,
+            ))
+
+            escritas += len(lote)
+            if progreso:
+                progreso(escritas, total)
+
+    if escritas == 0 and progreso:
+        progreso(0, total)
+
+    return ruta
+
+
+# ============================================================
+#   EXPORTACIÓN INCREMENTAL (solo lo nuevo desde la última vez)
+# ============================================================
+
+ENCABEZADO_INCREMENTAL = ["operacion", "id", "fecha", "tipo", "monto", "categoria", "descripcion"]
+
+COLUMNAS_DELTA = [
+    ("Operación", 11, None),
+    ("Id", 9, None),
+] + COLUMNAS_HISTORIAL
+
+
+def _filas_incrementales(lotes):
+    """Antepone la operación: 'baja' si la transacción ya no existe, si no 'alta'."""
+    for lote in lotes:
+        yield [
+            ("baja", fila[0], None, None, None, None, None) if fila[1] is None
+            else ("alta",) + fila
+            for fila in lote
+        ]
+
+
+def exportar_incremental(formato="csv", nombre="nocturna", directorio="reportes/incremental",
+                         progreso=None):
+    """
+    Exporta solo las transacciones dadas de alta, modificadas o eliminadas
+    desde la última ejecución de la exportación `nombre` (la primera vez,
+    el historial completo). Cada ejecución escribe un segmento nuevo:
+    un CSV o un libro Excel con una hoja "Delta" y otra "Bajas".
+    Las modificaciones se emiten como 'alta' con el estado actual (upsert).
+    Devuelve la ruta del segmento, o None si no hubo cambios.
+    """
+    if formato not in ("csv", "xlsx"):
+        raise ValueError(f"Formato no soportado: {formato}")
+
+    marca = obtener_marca_exportacion(nombre)
+    desde_seq = marca[0] if marca else None
+    hasta_seq, ultimo_id = estado_cambios_transacciones()
+
+    if marca and hasta_seq == desde_seq:
+        return None
+
+    os.makedirs(directorio, exist_ok=True)
+    sello = datetime.now().strftime("%Y%m%d_%H%M%S")
+    ruta = os.path.join(directorio, f"{nombre}_{hasta_seq:012d}_{sello}.{formato}")
+    lotes = _filas_incrementales(iterar_cambios_transacciones(desde_seq, hasta_seq))
+
+    escritas = 0
+    if formato == "csv":
+        with open(ruta, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(ENCABEZADO_INCREMENTAL)
+            for lote in lotes:
+                writer.writerows(lote)
+                escritas += len(lote)
+                if progreso:
+                    progreso(escritas, None)
+    else:
+        wb, delta = _libro_streaming("Delta", COLUMNAS_DELTA)
+        bajas = wb.create_sheet("Bajas")
+        bajas.append(["Id"])
+        for lote in lotes:
+            altas = []
+            for fila in lote:
+                if fila[0] == "baja":
+                    bajas.append([fila[1]])
+                else:
+                    altas.append(fila)
+            _escribir_filas(delta, COLUMNAS_DELTA, altas, None)
+            escritas += len(lote)
+            if progreso:
+                progreso(escritas, None)
+        wb.save(ruta)
+
+    # La marca avanza solo cuando el segmento quedó escrito
+    guardar_marca_exportacion(nombre, hasta_seq, ultimo_id)
+    return ruta
+
+
+# ============================================================
+#   MOTOR DE PDF PAGINADO
+# ============================================================
+
+FUENTE_PDF = "Helvetica"
+FUENTE_PDF_NEGRITA = "Helvetica-Bold"
+TAM_FUENTE_PDF = 9
+ALTO_FILA_PDF = 15
+MARGEN_PDF = 40
+
+# (título, x, ancho, alineación) de cada columna de la tabla
+COLUMNAS_PDF = [
+    ("Fecha", 40, 62, "izq"),
+    ("Tipo", 102, 48, "izq"),
+    ("Monto", 150, 72, "der"),
+    ("Categoría", 232, 100, "izq"),
+    ("Descripción", 338, 234, "izq"),
+]
+
+# Estilo de la tabla, compartido por todas las páginas
+COLOR_CABECERA_PDF = colors.HexColor("#1565C0")
+COLOR_FILA_ALTERNA_PDF = colors.HexColor("#F2F5FA")
+COLOR_LINEA_PDF = colors.HexColor("#B0BEC5")
+
+
+def _dinero(valor):
+    return f"${valor:,.0f}"
+
+
+@lru_cache(maxsize=4096)
+def _recortar(texto, fuente, tam, ancho):
+    """
+    Recorta `texto` para que quepa en `ancho` puntos (con "…").
+    Las categorías y descripciones se repiten mucho: el resultado se cachea.
+    """
+    if stringWidth(texto, fuente, tam) <= ancho:
+        return texto
+
+    while texto and stringWidth(texto + "…", fuente, tam) > ancho:
+        texto = texto[:-1]
+    return texto + "…"
+
+
+class _PaginadorPDF:
+    """
+    Dibuja el historial página a página directamente sobre el canvas, sin
+    armar antes una tabla con todas las filas. Cada página terminada se
+    cierra con showPage() y queda comprimida, pero reportlab guarda todas
+    en el documento hasta save(): la memoria sigue creciendo con el número
+    de filas, solo que mucho más despacio.
+    """
+
+    def __init__(self, ruta, titulo, resumen, total_filas):
+        self.c = canvas.Canvas(ruta, pagesize=letter, pageCompression=1)
+        self.c.setTitle(titulo)
+        self.ancho, self.alto = letter
+        self.titulo = titulo
+        self.resumen = resumen
+        self.generado = datetime.now().strftime("%Y-%m-%d %H:%M")
+
+        # Filas que caben en la primera página (con resumen) y en las demás
+        self.filas_primera = self._filas_disponibles(primera=True)
+        self.filas_resto = self._filas_disponibles(primera=False)
+        resto = max(0, total_filas - self.filas_primera)
+        self.paginas = 1 + -(-resto // self.filas_resto)
+
+        self.pagina = 0
+        self._nueva_pagina()
+
+    # --------------------------------------------------------
+    def _inicio_tabla(self, primera):
+        # Título (30) + resumen (75) solo en la primera página
+        return self.alto - MARGEN_PDF - (105 if primera else 30)
+
+    def _filas_disponibles(self, primera):
+        # Cabecera de tabla arriba, subtotal y pie abajo
+        util = self._inicio_tabla(primera) - ALTO_FILA_PDF - (MARGEN_PDF + 2 * ALTO_FILA_PDF)
+        return int(util // ALTO_FILA_PDF)
+
+    def _nueva_pagina(self):
+        self.pagina += 1
+        primera = self.pagina == 1
+        c = self.c
+
+        c.setFont(FUENTE_PDF_NEGRITA, 14)
+        c.drawString(MARGEN_PDF, self.alto - MARGEN_PDF - 14, self.titulo)
+
+        if primera:
+            self._dibujar_resumen()
+
+        self.y = self._inicio_tabla(primera)
+        self._dibujar_cabecera_tabla()
+
+        # Todo el texto de las filas va en un único objeto de texto por
+        # página: mucho más barato que un drawString por celda
+        self.texto = c.beginText()
+        self.texto.setFont(FUENTE_PDF, TAM_FUENTE_PDF)
+
+        self.capacidad = self.filas_primera if primera else self.filas_resto
+        self.filas_pagina = 0
+        self.ingresos_pagina = 0.0
+        self.gastos_pagina = 0.0
+
+    def _dibujar_resumen(self):
+        c = self.c
+        y = self.alto - MARGEN_PDF - 40
+        c.setFillColor(COLOR_FILA_ALTERNA_PDF)
+        c.rect(MARGEN_PDF, y - 50, self.ancho - 2 * MARGEN_PDF, 50, stroke=0, fill=1)
+        c.setFillColor(colors.black)
+
+        x = MARGEN_PDF + 10
+        paso = (self.ancho - 2 * MARGEN_PDF) / len(self.resumen)
+        for etiqueta, valor in self.resumen:
+            c.setFont(FUENTE_PDF, 8)
+            c.drawString(x, y - 18, etiqueta)
+            c.setFont(FUENTE_PDF_NEGRITA, 12)
+            c.drawString(x, y - 36, valor)
+            x += paso
+
+    def _dibujar_cabecera_tabla(self):
+        c = self.c
+        c.setFillColor(COLOR_CABECERA_PDF)
+        c.rect(MARGEN_PDF, self.y - 4, self.ancho - 2 * MARGEN_PDF, ALTO_FILA_PDF, stroke=0, fill=1)
+        c.setFillColor(colors.white)
+        c.setFont(FUENTE_PDF_NEGRITA, TAM_FUENTE_PDF)
+        for titulo, x, ancho, alineacion in COLUMNAS_PDF:
+            self._texto(x, ancho, alineacion, titulo)
+        c.setFillColor(colors.black)
+        c.setFont(FUENTE_PDF, TAM_FUENTE_PDF)
+        self.y -= ALTO_FILA_PDF
+
+    def _texto(self, x, ancho, alineacion, texto):
+        if alineacion == "der":
+            self.c.drawRightString(x + ancho - 4, self.y, texto)
+        else:
+            self.c.drawString(x + 2, self.y, texto)
+
+    def _cerrar_pagina(self):
+        c = self.c
+        c.drawText(self.texto)
+
+        y = MARGEN_PDF + ALTO_FILA_PDF
+        c.setStrokeColor(COLOR_LINEA_PDF)
+        c.line(MARGEN_PDF, y + ALTO_FILA_PDF - 3, self.ancho - MARGEN_PDF, y + ALTO_FILA_PDF - 3)
+
+        c.setFont(FUENTE_PDF_NEGRITA, TAM_FUENTE_PDF)
+        c.drawString(
+            MARGEN_PDF + 2, y,
+            f"Subtotal de la página — Ingresos: {_dinero(self.ingresos_pagina)}"
+            f"   Gastos: {_dinero(self.gastos_pagina)}"
+            f"   Neto: {_dinero(self.ingresos_pagina - self.gastos_pagina)}",
+        )
+
+        c.setFont(FUENTE_PDF, 8)
+        c.drawString(MARGEN_PDF, MARGEN_PDF, f"Generado: {self.generado}")
+        c.drawRightString(self.ancho - MARGEN_PDF, MARGEN_PDF, f"Página {self.pagina} de {self.paginas}")
+        c.showPage()
+
+    # --------------------------------------------------------
+    def agregar(self, fecha, tipo, monto, categoria, descripcion):
+        if self.filas_pagina == self.capacidad:
+            self._cerrar_pagina()
+            self._nueva_pagina()
+
+        c = self.c
+        if self.filas_pagina % 2:
+            c.setFillColor(COLOR_FILA_ALTERNA_PDF)
+            c.rect(MARGEN_PDF, self.y - 4, self.ancho - 2 * MARGEN_PDF, ALTO_FILA_PDF, stroke=0, fill=1)
+            c.setFillColor(colors.black)
+
+        valores = (
+            fecha,
+            tipo,
+            _dinero(monto),
+            categoria or "—",
+            descripcion or "",
+        )
+        texto = self.texto
+        for (_, x, ancho, alineacion), valor in zip(COLUMNAS_PDF, valores):
+            valor = _recortar(valor, FUENTE_PDF, TAM_FUENTE_PDF, ancho - 6)
+            if alineacion == "der":
+                x = x + ancho - 4 - stringWidth(valor, FUENTE_PDF, TAM_FUENTE_PDF)
+            else:
+                x = x + 2
+            texto.setTextOrigin(x, self.y)
+            texto.textOut(valor)
+
+        if tipo == "ingreso":
+            self.ingresos_pagina += monto
+        else:
+            self.gastos_pagina += monto
+
+        self.filas_pagina += 1
+        self.y -= ALTO_FILA_PDF
+
+    def terminar(self):
+        self._cerrar_pagina()
+        self.c.save()
+
+
+# ============================================================
+#   EXPORTAR HISTORIAL A PDF (PROFESIONAL)
+# ============================================================
+
+def exportar_historial_pdf(ruta="reportes/historial.pdf", progreso=None,
+                           fecha_desde=None, fecha_hasta=None, tipo=None):
+    filtros = dict(fecha_desde=fecha_desde, fecha_hasta=fecha_hasta, tipo=tipo)
+    total = contar_transacciones(**filtros)
+    ingresos, gastos = totales_por_tipo(fecha_desde, fecha_hasta)
+    if tipo == "ingreso":
+        gastos = 0
+    elif tipo == "gasto":
+        ingresos = 0
+
+    os.makedirs("reportes", exist_ok=True)
+
+    resumen = [
+        ("Transacciones", f"{total:,}"),
+        ("Total ingresos", _dinero(ingresos)),
+        ("Total gastos", _dinero(gastos)),
+        ("Saldo", _dinero(ingresos - gastos)),
+    ]
+    pdf = _PaginadorPDF(ruta, "Historial de Transacciones", resumen, total)
+
+    escritas = 0
+    for lote in iterar_lotes_transacciones(**filtros):
+        for fila in lote:
+            pdf.agregar(*fila)
+        escritas += len(lote)
+        if progreso:
+            progreso(escritas, total)
+
+    pdf.terminar()
+
+    if escritas == 0 and progreso:
+        progreso(0, total)
+
     return ruta
 
 
@@ -144,10 +738,7 @@ def exportar_historial_pdf(ruta="reportes/historial.pdf"):
 # ============================================================
 
 def exportar_estado_cuenta_pdf(ruta="reportes/estado_cuenta.pdf"):
-    trans = obtener_transacciones()
-
-    ingresos = sum(t.monto for t in trans if t.tipo == "ingreso")
-    gastos = sum(t.monto for t in trans if t.tipo == "gasto")
+    ingresos, gastos = totales_por_tipo()
     saldo = ingresos - gastos
 
     os.makedirs("reportes", exist_ok=True)
@@ -171,15 +762,219 @@ def exportar_estado_cuenta_pdf(ruta="reportes/estado_cuenta.pdf"):
     return ruta
 
 
+# ============================================================
+#   CACHÉ DE REPORTES
+# ============================================================
+
+DIRECTORIO_CACHE = os.path.join("reportes", "cache")
+CACHE_MAX_BYTES = 500 * 1024 * 1024
+
+
+def _version_reportes():
+    """
+    Identifica el estado de los datos que aparecen en los reportes.
+    Además de los contadores de cambios se incluye el mayor id, por si
+    la base se recreó y los contadores volvieron a empezar.
+    """
+    conn = database.get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM transacciones")
+    max_id = cur.fetchone()[0]
+    conn.close()
+
+    return [
+        database.version_datos("transacciones"),
+        database.version_datos("categorias"),
+        # El análisis muestra presupuesto vs real
+        database.version_datos("presupuestos"),
+        max_id,
+    ]
+
+
+def _clave_reporte(tipo, params, version):
+    contenido = json.dumps([tipo, params, version], sort_keys=True, default=str)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def _copiar_a(origen, destino):
+    carpeta = os.path.dirname(destino)
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+    # Copia, no enlace: lo que el usuario haga con su archivo no toca la caché
+    shutil.copyfile(origen, destino)
+
+
+def _podar_cache(max_bytes=CACHE_MAX_BYTES):
+    """Borra los reportes usados hace más tiempo hasta quedar bajo `max_bytes`."""
+    if not os.path.isdir(DIRECTORIO_CACHE):
+        return
+
+    archivos = []
+    for nombre in os.listdir(DIRECTORIO_CACHE):
+        ruta = os.path.join(DIRECTORIO_CACHE, nombre)
+        if os.path.isfile(ruta) and not nombre.endswith(".tmp"):
+            info = os.stat(ruta)
+            archivos.append((info.st_mtime, info.st_size, ruta))
+
+    total = sum(tam for _, tam, _ in archivos)
+    for _, tam, ruta in sorted(archivos):
+        if total <= max_bytes:
+            break
+        os.remove(ruta)
+        total -= tam
+
+
+def exportar_en_cache(exportador, ruta, progreso=None, **params):
+    """
+    Igual que llamar a `exportador(ruta, progreso=..., **params)`, pero si
+    los datos no cambiaron desde una exportación idéntica copia el archivo
+    ya generado en lugar de volver a construirlo.
+    """
+    version = _version_reportes()
+    extension = os.path.splitext(ruta)[1]
+    clave = _clave_reporte(exportador.__name__, params, version)
+    en_cache = os.path.join(DIRECTORIO_CACHE, clave + extension)
+
+    if os.path.exists(en_cache):
+        # Marca de uso para el LRU
+        os.utime(en_cache)
+        _copiar_a(en_cache, ruta)
+        if progreso:
+            progreso(1, 1)
+        return ruta
+
+    os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+    temporal = f"{en_cache}.{os.getpid()}.tmp"
+    try:
+        exportador(temporal, progreso=progreso, **params)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+    # Si los datos cambiaron mientras se generaba, el archivo no se guarda
+    if _version_reportes() == version:
+        os.replace(temporal, en_cache)
+        _copiar_a(en_cache, ruta)
+        _podar_cache()
+    else:
+        _copiar_a(temporal, ruta)
+        os.remove(temporal)
+
+    return ruta
+
+
 # ============================================================
 #   FUNCIONES QUE FALTABAN PARA INGRESOSSCREEN
 # ============================================================
 
-def exportar_transacciones_excel(ruta):
+def exportar_transacciones_excel(ruta, progreso=None):
     """Exporta TODAS las transacciones a Excel (compatibilidad con IngresosScreen)."""
-    return exportar_historial_excel(ruta)
+    return exportar_historial_excel(ruta, progreso=progreso)
 
 
-def exportar_transacciones_pdf(ruta):
+def exportar_transacciones_pdf(ruta, progreso=None):
     """Exporta TODAS las transacciones a PDF (compatibilidad con IngresosScreen)."""
-    return exportar_historial_pdf(ruta)
+    return exportar_historial_pdf(ruta, progreso=progreso)
+
+
+# ============================================================
+#   GENERACIÓN DE REPORTES POR PERIODO (EN PARALELO)
+# ============================================================
+
+# formato -> (extensión, función(ruta, desde, hasta))
+_GENERADORES_PERIODO = {
+    "xlsx": ("xlsx", lambda ruta, desde, hasta: exportar_por_rango_excel(desde, hasta, ruta)),
+    "pdf": ("pdf", lambda ruta, desde, hasta: exportar_historial_pdf(ruta, fecha_desde=desde, fecha_hasta=hasta)),
+    "csv": ("csv", lambda ruta, desde, hasta: exportar_transacciones_csv(ruta, desde, hasta)),
+    "parquet": ("parquet", lambda ruta, desde, hasta: exportar_transacciones_parquet(ruta, desde, hasta)),
+}
+
+
+def _rango_periodo(periodo):
+    """
+    "2024" -> año completo, "2024-03" -> mes completo,
+    o una tupla (etiqueta, desde, hasta) ya resuelta.
+    """
+    if isinstance(periodo, (tuple, list)):
+        etiqueta, desde, hasta = periodo
+        return etiqueta, desde, hasta
+
+    partes = periodo.split("-")
+    anio = int(partes[0])
+    if len(partes) == 1:
+        return periodo, f"{anio:04d}-01-01", f"{anio:04d}-12-31"
+
+    mes = int(partes[1])
+    ultimo = calendar.monthrange(anio, mes)[1]
+    return periodo, f"{anio:04d}-{mes:02d}-01", f"{anio:04d}-{mes:02d}-{ultimo:02d}"
+
+
+def _iniciar_proceso_reportes(db_path):
+    # Cada proceso hereda la ruta de la base y solo la lee
+    database.DB_PATH = db_path
+    database.SOLO_LECTURA = True
+
+
+def _generar_reporte(formato, etiqueta, desde, hasta, ruta):
+    inicio = time.perf_counter()
+    entrada = {
+        "periodo": etiqueta,
+        "desde": desde,
+        "hasta": hasta,
+        "formato": formato,
+        "ruta": ruta,
+    }
+    try:
+        _GENERADORES_PERIODO[formato][1](ruta, desde, hasta)
+        entrada["bytes"] = os.path.getsize(ruta)
+        entrada["error"] = None
+    except Exception as ex:
+        entrada["error"] = f"{type(ex).__name__}: {ex}"
+
+    entrada["segundos"] = round(time.perf_counter() - inicio, 3)
+    return entrada
+
+
+def generar_reportes(periodos, formatos=("xlsx", "pdf"), directorio="reportes/periodos",
+                     max_procesos=None):
+    """
+    Genera un reporte por cada (periodo, formato) repartiendo el trabajo
+    entre varios procesos; cada uno abre su propia conexión de solo lectura
+    y escribe su propio archivo.
+    Devuelve el manifiesto (también guardado como manifiesto.json).
+    """
+    for formato in formatos:
+        if formato not in _GENERADORES_PERIODO:
+            raise ValueError(f"Formato no soportado: {formato}")
+
+    os.makedirs(directorio, exist_ok=True)
+
+    tareas = []
+    for periodo in periodos:
+        etiqueta, desde, hasta = _rango_periodo(periodo)
+        for formato in formatos:
+            extension = _GENERADORES_PERIODO[formato][0]
+            ruta = os.path.join(directorio, f"transacciones_{etiqueta}.{extension}")
+            tareas.append((formato, etiqueta, desde, hasta, ruta))
+
+    reportes = []
+    with ProcessPoolExecutor(
+        max_workers=max_procesos,
+        initializer=_iniciar_proceso_reportes,
+        initargs=(database.DB_PATH,),
+    ) as pool:
+        futuros = [pool.submit(_generar_reporte, *tarea) for tarea in tareas]
+        for futuro in as_completed(futuros):
+            reportes.append(futuro.result())
+
+    reportes.sort(key=lambda r: (r["periodo"], r["formato"]))
+    manifiesto = {
+        "generado": datetime.now().isoformat(timespec="seconds"),
+        "reportes": reportes,
+    }
+
+    with open(os.path.join(directorio, "manifiesto.json"), "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+
+    return manifiesto
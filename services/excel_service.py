@@ -1,29 +1,203 @@
+import atexit
+import csv
+import glob
+import io
+import os
+import uuid
+import weakref
+
 import openpyxl
 from openpyxl import Workbook
 
+# Gastos acumulados en el diario antes de pasarlos al .xlsx
+COMPACT_EVERY = 500
+
+# La columna Id identifica cada fila aunque se muevan o borren otras
+ENCABEZADO = ["Fecha", "Descripción", "Monto", "Id"]
+
+# Un servicio vivo por diario; se compactan al salir sin retener instancias
+_servicios = weakref.WeakValueDictionary()
+
+
+@atexit.register
+def _compactar_al_salir():
+    for servicio in list(_servicios.values()):
+        servicio.compact()
+
+
 class ExcelService:
-    def __init__(self):
-        self.file_path = "data/gastos.xlsx"
+    """
+    Gastos en data/gastos.xlsx. Los gastos nuevos no reescriben el libro:
+    se agregan a un diario CSV (coste constante por gasto) y se pasan al
+    .xlsx por lotes con compact(), cada COMPACT_EVERY gastos y al salir.
+    """
+
+    def __init__(self, file_path="data/gastos.xlsx", compact_every=COMPACT_EVERY):
+        self.file_path = file_path
+        self.journal_path = os.path.splitext(file_path)[0] + ".journal.csv"
+        self.compact_every = compact_every
         self._ensure_excel_exists()
 
+        # Un compact() interrumpido deja su segmento renombrado: terminarlo
+        for segment in glob.glob(self.journal_path + ".*.compacting"):
+            self._compact_segment(segment)
+
+        self._pending = self._count_journal()
+        _servicios[os.path.abspath(self.journal_path)] = self
+
     def _ensure_excel_exists(self):
-        try:
-            openpyxl.load_workbook(self.file_path)
-        except:
-            wb = Workbook()
+        # Solo se comprueba que exista: abrir el libro costaría O(tamaño)
+        if os.path.exists(self.file_path):
+            return
+
+        carpeta = os.path.dirname(self.file_path)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Gastos"
+        ws.append(ENCABEZADO)
+        wb.save(self.file_path)
+
+    # ---------------------------------------------------------
+    # Diario
+    # ---------------------------------------------------------
+    def _count_journal(self):
+        if not os.path.exists(self.journal_path):
+            return 0
+        with open(self.journal_path, newline="", encoding="utf-8") as f:
+            return sum(1 for _ in f)
+
+    @staticmethod
+    def _journal_rows(reader):
+        # Diarios anteriores a la columna Id tienen 3 campos
+        return [
+            (fila[0], fila[1], float(fila[2]), fila[3] if len(fila) > 3 and fila[3] else None)
+            for fila in reader
+        ]
+
+    @classmethod
+    def _read_journal(cls, path):
+        if not os.path.exists(path):
+            return []
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls._journal_rows(csv.reader(f))
+
+    def journal_size(self):
+        return os.path.getsize(self.journal_path) if os.path.exists(self.journal_path) else 0
+
+    def read_journal_from(self, offset):
+        """Gastos agregados al diario a partir del byte `offset` (para sincronizar)."""
+        if not os.path.exists(self.journal_path):
+            return []
+        with open(self.journal_path, "rb") as f:
+            f.seek(offset)
+            texto = f.read().decode("utf-8")
+        return self._journal_rows(csv.reader(io.StringIO(texto, newline="")))
+
+    def add_expense(self, fecha, descripcion, monto, row_id=None):
+        """Agrega el gasto al diario y devuelve el Id de su fila."""
+        row_id = row_id or uuid.uuid4().hex
+        with open(self.journal_path, "a", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerow([fecha, descripcion, float(monto), row_id])
+
+        self._pending += 1
+        if self._pending >= self.compact_every:
+            self.compact()
+        return row_id
+
+    # ---------------------------------------------------------
+    # Compactación
+    # ---------------------------------------------------------
+    def compact(self):
+        """Pasa los gastos del diario al .xlsx en una sola carga y guardado."""
+        if not os.path.exists(self.journal_path):
+            self._pending = 0
+            return
+
+        # Renombrar primero: lo que llegue mientras tanto va a un diario nuevo
+        segment = f"{self.journal_path}.{uuid.uuid4().hex}.compacting"
+        os.replace(self.journal_path, segment)
+        self._pending = 0
+        self._compact_segment(segment)
+
+    def _segment_id(self, segment):
+        return os.path.basename(segment).rsplit(".", 2)[-2]
+
+    def _compact_segment(self, segment):
+        segment_id = self._segment_id(segment)
+        wb = openpyxl.load_workbook(self.file_path)
+
+        # El libro guarda el id del último segmento aplicado: si ya está,
+        # el corte fue después de guardar y solo falta borrar el segmento
+        if wb.properties.identifier != segment_id:
             ws = wb.active
-            ws.title = "Gastos"
-            ws.append(["Fecha", "Descripción", "Monto"])
-            wb.save(self.file_path)
+            for row in self._read_journal(segment):
+                ws.append(list(row))
+            wb.properties.identifier = segment_id
+            self._save(wb)
 
-    def add_expense(self, fecha, descripcion, monto):
+        os.remove(segment)
+
+    def remove_expenses(self, positions):
+        """
+        Borra los gastos en las posiciones dadas (índices de get_expenses())
+        con una sola carga y un solo guardado del libro.
+        """
+        positions = set(positions)
+        if not positions:
+            return
+
+        self.compact()
         wb = openpyxl.load_workbook(self.file_path)
         ws = wb.active
-        ws.append([fecha, descripcion, float(monto)])
-        wb.save(self.file_path)
 
-    def get_expenses(self):
+        # De abajo hacia arriba para no desplazar las filas pendientes
+        for position in sorted(positions, reverse=True):
+            ws.delete_rows(position + 2)
+
+        self._save(wb)
+
+    def set_ids(self, ids):
+        """
+        Escribe el Id de las filas que no lo tienen (p. ej. escritas a mano):
+        `ids` es {posición en get_expenses(): id}. Una carga y un guardado.
+        """
+        if not ids:
+            return
+
+        self.compact()
         wb = openpyxl.load_workbook(self.file_path)
         ws = wb.active
-        rows = list(ws.iter_rows(values_only=True))
-        return rows[1:]
+
+        columna = len(ENCABEZADO)
+        if not ws.cell(row=1, column=columna).value:
+            ws.cell(row=1, column=columna, value=ENCABEZADO[-1])
+        for position, row_id in ids.items():
+            ws.cell(row=position + 2, column=columna, value=row_id)
+
+        self._save(wb)
+
+    def _save(self, wb):
+        temporal = self.file_path + ".tmp"
+        wb.save(temporal)
+        os.replace(temporal, self.file_path)
+
+    # ---------------------------------------------------------
+    # Lectura
+    # ---------------------------------------------------------
+    def get_expenses(self):
+        wb = openpyxl.load_workbook(self.file_path, read_only=True)
+        ws = wb.active
+        rows = list(ws.iter_rows(min_row=2, values_only=True))
+        applied = wb.properties.identifier
+        wb.close()
+
+        # Segmentos a medio compactar que el libro todavía no tiene
+        for segment in glob.glob(self.journal_path + ".*.compacting"):
+            if self._segment_id(segment) != applied:
+                rows.extend(self._read_journal(segment))
+
+        rows.extend(self._read_journal(self.journal_path))
+        return rows
@@ -0,0 +1,110 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from reports import exportar_en_cache
+
+# Flet sirve esta carpeta como assets (ver main.py): lo que se deje en
+# assets/descargas/<id>/ se descarga desde /descargas/<id>/<archivo>
+RAIZ_PROYECTO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRECTORIO_ASSETS = os.path.join(RAIZ_PROYECTO, "assets")
+SUBDIRECTORIO_DESCARGAS = "descargas"
+
+# Mínimo de segundos entre dos avisos de progreso a la UI
+INTERVALO_AVISOS = 0.2
+
+
+class ExportacionCancelada(Exception):
+    pass
+
+
+class ExportJob:
+    """Una exportación en curso: permite cancelarla y consultar su estado."""
+
+    def __init__(self, job_id: str, ruta: str, url: str):
+        self.id = job_id
+        self.ruta = ruta
+        self.url = url
+        self.estado = "en_curso"  # en_curso | terminado | cancelado | error
+        self.error = None
+        self._cancelar = threading.Event()
+        self.future = None
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    @property
+    def cancelado(self) -> bool:
+        return self._cancelar.is_set()
+
+
+class ExportService:
+    """
+    Ejecuta los exportadores de reports.py en un hilo aparte.
+    Cada exportador recibe `progreso(escritas, total)`; desde ahí se avisa
+    a la UI y se comprueba la cancelación, así el bucle de Flet nunca espera.
+    """
+
+    # Compartido entre pantallas: no se crean hilos nuevos por cada una
+    _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="exportacion")
+
+    def iniciar(self, exportador, nombre_archivo, on_progreso=None, on_terminado=None,
+                on_cancelado=None, on_error=None, **params) -> ExportJob:
+        job_id = uuid.uuid4().hex
+        carpeta = os.path.join(DIRECTORIO_ASSETS, SUBDIRECTORIO_DESCARGAS, job_id)
+        ruta = os.path.join(carpeta, nombre_archivo)
+        url = f"/{SUBDIRECTORIO_DESCARGAS}/{job_id}/{nombre_archivo}"
+
+        job = ExportJob(job_id, ruta, url)
+        ultimo_aviso = [0.0]
+
+        def progreso(escritas, total):
+            if job.cancelado:
+                raise ExportacionCancelada()
+
+            ahora = time.monotonic()
+            if on_progreso and (escritas == total or ahora - ultimo_aviso[0] >= INTERVALO_AVISOS):
+                ultimo_aviso[0] = ahora
+                on_progreso(escritas, total)
+
+        def tarea():
+            os.makedirs(carpeta, exist_ok=True)
+            try:
+                # Si los datos no cambiaron se reutiliza el último archivo igual
+                exportar_en_cache(exportador, ruta, progreso=progreso, **params)
+            except ExportacionCancelada:
+                job.estado = "cancelado"
+                shutil.rmtree(carpeta, ignore_errors=True)
+                if on_cancelado:
+                    on_cancelado(job)
+                return
+            except Exception as ex:
+                job.estado = "error"
+                job.error = ex
+                shutil.rmtree(carpeta, ignore_errors=True)
+                if on_error:
+                    on_error(job)
+                return
+
+            job.estado = "terminado"
+            if on_terminado:
+                on_terminado(job)
+
+        job.future = self._executor.submit(tarea)
+        return job
+
+    @staticmethod
+    def limpiar_descargas(max_horas=24):
+        """Borra las descargas generadas hace más de `max_horas`."""
+        base = os.path.join(DIRECTORIO_ASSETS, SUBDIRECTORIO_DESCARGAS)
+        if not os.path.isdir(base):
+            return
+
+        limite = time.time() - max_horas * 3600
+        for nombre in os.listdir(base):
+            carpeta = os.path.join(base, nombre)
+            if os.path.isdir(carpeta) and os.path.getmtime(carpeta) < limite:
+                shutil.rmtree(carpeta, ignore_errors=True)
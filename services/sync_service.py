@@ -0,0 +1,426 @@
+import hashlib
+import json
+import os
+import uuid
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+from database import get_conn
+from importers import _fecha_celda, _monto_celda
+from models import (
+    eliminar_transacciones,
+    estado_cambios_transacciones,
+    guardar_marca_exportacion,
+    importar_transacciones,
+    obtener_marca_exportacion,
+    recalcular_alertas,
+)
+from services.excel_service import ExcelService
+from validators import validar_fecha
+
+# Marca en marcas_exportacion hasta la que ya se revisaron cambios de la base
+MARCA_SYNC = "sync_excel"
+
+# Las filas del libro entran como gastos de esta categoría
+CATEGORIA_EXCEL = "Excel"
+
+# Prefijo del import_hash (y de la clave en sync_excel) de las filas enlazadas
+PREFIJO = "xlsx:"
+
+
+@dataclass
+class ResultadoSync:
+    modo: str = "sin_cambios"  # sin_cambios | diario | completo | rechazado
+    excel_a_db: int = 0
+    actualizadas_en_db: int = 0
+    borradas_en_db: int = 0
+    db_a_excel: int = 0
+    borradas_en_excel: int = 0
+    # (posición en el libro, mensaje)
+    errores: List[Tuple[int, str]] = field(default_factory=list)
+
+
+class SyncService:
+    """
+    Sincroniza en los dos sentidos data/gastos.xlsx (ExcelService) y la base.
+
+    Cada fila del libro tiene un Id propio (columna Id; las escritas a mano
+    lo reciben en la primera pasada). sync_excel guarda, por Id, la
+    transacción enlazada y la huella del contenido sincronizado. Con eso:
+
+    - si el libro y su diario no cambiaron (mtime/tamaño) no se lee nada;
+    - si solo creció el diario, se leen solo los bytes nuevos;
+    - si cambió el libro, se comparan sus Ids y huellas con sync_excel y
+      solo se tocan en la base las filas nuevas, editadas o desaparecidas.
+
+    Lo que cambió en la base (gastos nuevos o bajas de filas enlazadas) se
+    escribe al libro en una sola compactación.
+    """
+
+    def __init__(self, excel_service: ExcelService = None):
+        self.excel = excel_service or ExcelService()
+
+    # ---------------------------------------------------------
+    # Filas del libro
+    # ---------------------------------------------------------
+    @staticmethod
+    def _huella(fecha, descripcion, monto):
+        contenido = f"{fecha}|{monto!r}|{descripcion}".encode("utf-8")
+        return PREFIJO + hashlib.blake2b(contenido, digest_size=16).hexdigest()
+
+    @staticmethod
+    def _normalizar(fila):
+        fecha, descripcion, monto, row_id = (list(fila) + [None] * 4)[:4]
+        descripcion = str(descripcion).strip() if descripcion is not None else ""
+        return (_fecha_celda(fecha), descripcion, _monto_celda(monto)), row_id or None
+
+    def _leer_libro(self):
+        """
+        Devuelve ({clave: (posición, valores, huella)}, [(posición, valores, huella)])
+        con las filas que tienen Id y las que todavía no.
+        """
+        con_id, sin_id = {}, []
+        for posicion, fila in enumerate(self.excel.get_expenses()):
+            valores, row_id = self._normalizar(fila)
+            entrada = (posicion, valores, self._huella(*valores))
+            if row_id:
+                con_id[PREFIJO + str(row_id)] = entrada
+            else:
+                sin_id.append(entrada)
+        return con_id, sin_id
+
+    # ---------------------------------------------------------
+    # Estado
+    # ---------------------------------------------------------
+    def _firma(self):
+        st = os.stat(self.excel.file_path)
+        return st.st_mtime_ns, st.st_size, self.excel.journal_size()
+
+    def _firma_guardada(self):
+        conn = get_conn()
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT mtime_ns, tamano, tamano_diario FROM sync_excel_archivo WHERE ruta = ?",
+            (os.path.abspath(self.excel.file_path),),
+        )
+        row = cur.fetchone()
+        conn.close()
+        return tuple(row) if row else None
+
+    def _guardar_firma(self):
+        mtime_ns, tamano, tamano_diario = self._firma()
+        conn = get_conn()
+        with conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO sync_excel_archivo (ruta, mtime_ns, tamano, tamano_diario)
+                VALUES (?, ?, ?, ?)
+                """,
+                (os.path.abspath(self.excel.file_path), mtime_ns, tamano, tamano_diario),
+            )
+        conn.close()
+
+    @staticmethod
+    def _estado():
+        """{clave: (trans_id, huella)} de la última pasada."""
+        conn = get_conn()
+        cur = conn.cursor()
+        cur.execute("SELECT clave, trans_id, huella FROM sync_excel")
+        estado = {row[0]: (row[1], row[2]) for row in cur.fetchall()}
+        conn.close()
+        return estado
+
+    @staticmethod
+    def _olvidar(claves):
+        conn = get_conn()
+        with conn:
+            conn.execute(
+                "DELETE FROM sync_excel WHERE clave IN (SELECT value FROM json_each(?))",
+                (json.dumps(list(claves)),),
+            )
+        conn.close()
+
+    def _asignar_ids(self, sin_id, con_id, estado):
+        """
+        Da un Id nuevo a las filas que no lo tienen y lo escribe al libro.
+        Las que ya estaban enlazadas con la clave anterior (huella + nº de
+        aparición) conservan su transacción, y con ella su categoría.
+        """
+        if not sin_id:
+            return
+
+        ids, renombres, apariciones = {}, [], {}
+        for posicion, valores, huella in sin_id:
+            n = apariciones.get(huella, 0)
+            apariciones[huella] = n + 1
+            clave_anterior = f"{huella}-{n}"
+
+            row_id = uuid.uuid4().hex
+            clave = PREFIJO + row_id
+            ids[posicion] = row_id
+            con_id[clave] = (posicion, valores, huella)
+
+            if clave_anterior in estado:
+                trans_id, _ = estado.pop(clave_anterior)
+                estado[clave] = (trans_id, huella)
+                renombres.append((clave, huella, clave_anterior))
+
+        if renombres:
+            conn = get_conn()
+            with conn:
+                conn.executemany(
+                    "UPDATE sync_excel SET clave = ?, huella = ? WHERE clave = ?", renombres
+                )
+                conn.executemany(
+                    "UPDATE transacciones SET import_hash = ? WHERE import_hash = ?",
+                    [(clave, anterior) for clave, _, anterior in renombres],
+                )
+            conn.close()
+
+        self.excel.set_ids(ids)
+
+    # ---------------------------------------------------------
+    # Libro -> base
+    # ---------------------------------------------------------
+    @staticmethod
+    def _validas(filas, resultado):
+        """Filtra (posición, clave, valores, huella) con fecha y monto correctos."""
+        validas = []
+        for posicion, clave, (fecha, descripcion, monto), huella in filas:
+            ok, msg = validar_fecha(fecha)
+            if not ok:
+                resultado.errores.append((posicion, msg))
+            elif monto is None or monto <= 0:
+                resultado.errores.append((posicion, "El monto debe ser un número mayor a 0."))
+            else:
+                validas.append((posicion, clave, (fecha, descripcion, monto), huella))
+        return validas
+
+    def _insertar_en_db(self, nuevas, resultado):
+        nuevas = self._validas(nuevas, resultado)
+        if not nuevas:
+            return
+
+        # INSERT OR IGNORE sobre import_hash: repetir una pasada cortada no duplica
+        insertadas, _ = importar_transacciones([[
+            ("gasto", monto, fecha, descripcion, CATEGORIA_EXCEL, clave)
+            for _, clave, (fecha, descripcion, monto), _ in nuevas
+        ]])
+        resultado.excel_a_db += insertadas
+
+        conn = get_conn()
+        with conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO sync_excel (clave, trans_id, huella)
+                SELECT t.import_hash, t.id, json_extract(j.value, '$[1]')
+                FROM json_each(?) j
+                JOIN transacciones t ON t.import_hash = json_extract(j.value, '$[0]')
+                """,
+                (json.dumps([[clave, huella] for _, clave, _, huella in nuevas]),),
+            )
+        conn.close()
+
+    def _actualizar_en_db(self, cambiadas, estado, resultado):
+        """Filas editadas en el libro: se actualiza la misma transacción (conserva su categoría)."""
+        cambiadas = self._validas(cambiadas, resultado)
+        if not cambiadas:
+            return
+
+        ids = [estado[clave][0] for _, clave, _, _ in cambiadas]
+        conn = get_conn()
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT MIN(fecha), MAX(fecha) FROM transacciones WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(ids),),
+        )
+        desde, hasta = cur.fetchone()
+
+        with conn:
+            cur.executemany(
+                "UPDATE transacciones SET fecha = ?, descripcion = ?, monto = ? WHERE id = ?",
+                [
+                    (fecha, descripcion, monto, estado[clave][0])
+                    for _, clave, (fecha, descripcion, monto), _ in cambiadas
+                ],
+            )
+            cur.executemany(
+                "UPDATE sync_excel SET huella = ? WHERE clave = ?",
+                [(huella, clave) for _, clave, _, huella in cambiadas],
+            )
+        conn.close()
+        resultado.actualizadas_en_db += len(cambiadas)
+
+        # Alertas de los meses de antes y de después de la edición
+        fechas = [f for f in (desde, hasta) if f] + [v[0] for _, _, v, _ in cambiadas]
+        recalcular_alertas(min(fechas), max(fechas))
+
+    def _borrar_en_db(self, claves, estado, resultado):
+        if not claves:
+            return
+        resultado.borradas_en_db += eliminar_transacciones(ids=[estado[c][0] for c in claves])
+        self._olvidar(claves)
+
+    def _pasada_completa(self, resultado, permitir_vaciar):
+        """El libro cambió: comparar sus Ids y huellas con los de la última pasada."""
+        estado = self._estado()
+        con_id, sin_id = self._leer_libro()
+
+        # Un libro vacío o recreado borraría todos los gastos enlazados
+        if not con_id and not sin_id and estado and not permitir_vaciar:
+            resultado.modo = "rechazado"
+            resultado.errores.append((
+                0,
+                f"El libro no tiene filas pero hay {len(estado)} gastos enlazados; "
+                "no se borran (use permitir_vaciar=True si es intencional).",
+            ))
+            return None
+
+        self._asignar_ids(sin_id, con_id, estado)
+
+        nuevas, cambiadas = [], []
+        for clave, (posicion, valores, huella) in con_id.items():
+            if clave not in estado:
+                nuevas.append((posicion, clave, valores, huella))
+            elif estado[clave][1] != huella:
+                cambiadas.append((posicion, clave, valores, huella))
+        borradas = [c for c in estado if c not in con_id]
+
+        self._borrar_en_db(borradas, estado, resultado)
+        self._actualizar_en_db(cambiadas, estado, resultado)
+        self._insertar_en_db(nuevas, resultado)
+        return con_id
+
+    def _pasada_diario(self, desde_byte, resultado):
+        """Solo creció el diario: las filas nuevas son las de su final."""
+        filas = self.excel.read_journal_from(desde_byte)
+        nuevas = []
+        for fila in filas:
+            valores, row_id = self._normalizar(fila)
+            if not row_id:
+                return False  # diario anterior a la columna Id: hace falta la pasada completa
+            nuevas.append((None, PREFIJO + row_id, valores, self._huella(*valores)))
+        self._insertar_en_db(nuevas, resultado)
+        return True
+
+    # ---------------------------------------------------------
+    # Base -> libro
+    # ---------------------------------------------------------
+    @staticmethod
+    def _cambios_db(marca, hasta_seq):
+        """(gastos creados desde la marca y sin enlazar, claves cuya transacción ya no existe)."""
+        desde_seq, ultimo_id = marca
+        conn = get_conn()
+        cur = conn.cursor()
+        # Solo altas: editar un gasto manual antiguo no lo vuelve a llevar al libro
+        cur.execute(
+            """
+            SELECT t.id, t.fecha, t.descripcion, t.monto
+            FROM transacciones t
+            WHERE t.id > ? AND t.tipo = 'gasto' AND t.import_hash IS NULL
+              AND NOT EXISTS (SELECT 1 FROM sync_excel s WHERE s.trans_id = t.id)
+            ORDER BY t.id
+            """,
+            (ultimo_id,),
+        )
+        nuevos = cur.fetchall()
+        cur.execute(
+            """
+            SELECT s.clave FROM sync_excel s
+            WHERE s.trans_id IN (
+                SELECT trans_id FROM transacciones_cambios WHERE seq > ? AND seq <= ?
+            )
+              AND NOT EXISTS (SELECT 1 FROM transacciones t WHERE t.id = s.trans_id)
+            """,
+            (desde_seq, hasta_seq),
+        )
+        bajas = {row[0] for row in cur.fetchall()}
+        conn.close()
+        return nuevos, bajas
+
+    @staticmethod
+    def _bajas_perdidas():
+        """Claves enlazadas cuya transacción ya no existe (aunque el registro esté podado)."""
+        conn = get_conn()
+        cur = conn.execute("""
+            SELECT s.clave FROM sync_excel s
+            WHERE NOT EXISTS (SELECT 1 FROM transacciones t WHERE t.id = s.trans_id)
+        """)
+        bajas = {row[0] for row in cur.fetchall()}
+        conn.close()
+        return bajas
+
+    def _escribir_en_excel(self, nuevos, bajas, libro, resultado):
+        if bajas:
+            if libro is None:
+                libro, _ = self._leer_libro()
+            posiciones = [libro[c][0] for c in bajas if c in libro]
+            self.excel.remove_expenses(posiciones)
+            resultado.borradas_en_excel += len(posiciones)
+            self._olvidar(bajas)
+
+        if not nuevos:
+            return
+
+        enlaces = []
+        for trans_id, fecha, descripcion, monto in nuevos:
+            valores, _ = self._normalizar((fecha, descripcion, monto))
+            row_id = self.excel.add_expense(*valores)
+            enlaces.append((PREFIJO + row_id, trans_id, self._huella(*valores)))
+
+        conn = get_conn()
+        with conn:
+            conn.executemany(
+                "UPDATE transacciones SET import_hash = ? WHERE id = ?",
+                [(clave, trans_id) for clave, trans_id, _ in enlaces],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO sync_excel (clave, trans_id, huella) VALUES (?, ?, ?)", enlaces
+            )
+        conn.close()
+
+        # Todo lo agregado pasa al .xlsx en una sola carga y guardado
+        self.excel.compact()
+        resultado.db_a_excel += len(enlaces)
+
+    # ---------------------------------------------------------
+    # Sincronización
+    # ---------------------------------------------------------
+    def sincronizar(self, permitir_vaciar=False) -> ResultadoSync:
+        """
+        permitir_vaciar: aceptar un libro sin filas aunque la última pasada
+        tuviera gastos enlazados (por defecto se rechaza y no se toca nada).
+        """
+        resultado = ResultadoSync()
+
+        # Libro -> base
+        guardada = self._firma_guardada()
+        mtime_ns, tamano, tamano_diario = self._firma()
+        libro = None
+        completa = guardada is None or guardada[:2] != (mtime_ns, tamano) or tamano_diario < guardada[2]
+        if not completa and tamano_diario > guardada[2]:
+            resultado.modo = "diario"
+            completa = not self._pasada_diario(guardada[2], resultado)
+        if completa:
+            resultado.modo = "completo"
+            libro = self._pasada_completa(resultado, permitir_vaciar)
+            if libro is None:
+                return resultado
+
+        # Base -> libro. La primera vez solo se fija la marca: el historial
+        # previo de la base no se vuelca al libro.
+        marca = obtener_marca_exportacion(MARCA_SYNC)
+        hasta_seq, max_id = estado_cambios_transacciones()
+        if marca is not None:
+            nuevos, bajas = self._cambios_db(marca, hasta_seq)
+            if libro is not None:
+                # En una pasada completa también se ven las bajas ya podadas del registro
+                bajas |= self._bajas_perdidas()
+            self._escribir_en_excel(nuevos, bajas, libro, resultado)
+
+        # Los enlaces recién escritos también dejan cambios: la marca va
+        # después de ellos para no volver a verlos (un solo escritor)
+        hasta_seq, max_id = estado_cambios_transacciones()
+        guardar_marca_exportacion(MARCA_SYNC, hasta_seq, max_id)
+        self._guardar_firma()
+        return resultado
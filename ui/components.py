@@ -3,6 +3,7 @@ from validators import (
     validar_monto,
     validar_fecha,
     validar_texto,
+    normalizar_transaccion,
 )
 from datetime import date, datetime
 
@@ -64,10 +65,11 @@ class NumberField(ft.Column):
 # ============================================================
 
 class DateField(ft.Column):
-    def __init__(self, label="Fecha", width=300, value=None, page=None):
+    def __init__(self, label="Fecha", width=300, value=None, page=None, on_change=None):
         super().__init__()
 
         self.page = page
+        self.on_change = on_change
 
         if value is None:
             value = str(date.today())
@@ -107,6 +109,8 @@ class DateField(ft.Column):
             self.field.value = self.datepicker.value.strftime("%Y-%m-%d")
             self.field.error_text = None
             self.update()
+            if self.on_change:
+                self.on_change(e)
 
     # Validación del texto escrito manualmente
     def validar_manual(self, e):
@@ -115,6 +119,8 @@ class DateField(ft.Column):
         if texto == "":
             self.field.error_text = None
             self.update()
+            if self.on_change:
+                self.on_change(e)
             return
 
         try:
@@ -131,10 +137,19 @@ class DateField(ft.Column):
             self.field.error_text = "Formato inválido. Use AAAA-MM-DD."
 
         self.update()
+        if self.on_change:
+            self.on_change(e)
 
     def get_value(self):
         return self.field.value
 
+    def get_fecha(self):
+        """Fecha ya validada al escribirla o elegirla (None si está vacía o es inválida)."""
+        texto = (self.field.value or "").strip()
+        if not texto or self.field.error_text:
+            return None
+        return texto
+
     def validate(self):
         ok, msg = validar_fecha(self.field.value)
         return ok, msg
@@ -166,6 +181,125 @@ class ConfirmDialog(ft.AlertDialog):
         self.open = False
 
 
+# ============================================================
+#   CARGA RÁPIDA DE VARIAS FILAS
+# ============================================================
+
+class QuickEntryGrid(ft.Column):
+    """
+    Rejilla para preparar varios movimientos y guardarlos de una vez.
+    Cada campo se valida al editarlo; filas_validas() devuelve las filas
+    listas para models.crear_transacciones_lote o los errores por fila.
+    """
+
+    def __init__(self, tipo: str, filas_iniciales=3):
+        super().__init__(spacing=8)
+        self.tipo = tipo
+        self.filas_iniciales = filas_iniciales
+        self.opciones_categoria = []
+
+        self.filas = ft.Column(spacing=8)
+        self.controls = [
+            self.filas,
+            ft.TextButton("Agregar fila", icon=ft.icons.ADD, on_click=self.agregar_fila),
+        ]
+
+        for _ in range(self.filas_iniciales):
+            self.agregar_fila()
+
+    def set_categorias(self, categorias):
+        self.opciones_categoria = [(str(c.id), c.nombre) for c in categorias]
+        for fila in self.filas.controls:
+            fila.data["categoria"].options = self._opciones()
+
+    def _opciones(self):
+        return [ft.dropdown.Option(clave, texto) for clave, texto in self.opciones_categoria]
+
+    def agregar_fila(self, e=None):
+        campos = {
+            "fecha": ft.TextField(
+                value=str(date.today()), hint_text="AAAA-MM-DD", width=140,
+                data=validar_fecha, on_change=self._validar_campo,
+            ),
+            "descripcion": ft.TextField(
+                hint_text="Descripción", width=260,
+                data=validar_texto, on_change=self._validar_campo,
+            ),
+            "monto": ft.TextField(
+                hint_text="Monto", width=140, keyboard_type=ft.KeyboardType.NUMBER,
+                data=validar_monto, on_change=self._validar_campo,
+            ),
+            "categoria": ft.Dropdown(hint_text="Categoría", width=200, options=self._opciones()),
+        }
+
+        fila = ft.Row(spacing=8, data=campos)
+        fila.controls = [
+            *campos.values(),
+            ft.IconButton(
+                icon=ft.icons.CLOSE,
+                tooltip="Quitar fila",
+                on_click=lambda e: self._quitar_fila(fila),
+            ),
+        ]
+        self.filas.controls.append(fila)
+        if e is not None:
+            self.update()
+
+    def _quitar_fila(self, fila):
+        self.filas.controls.remove(fila)
+        self.update()
+
+    # Validación en línea del campo editado
+    def _validar_campo(self, e):
+        campo = e.control
+        if campo.value:
+            ok, msg = campo.data(campo.value)
+            campo.error_text = None if ok else msg
+        else:
+            campo.error_text = None
+        campo.update()
+
+    def filas_validas(self):
+        """
+        Devuelve (filas, errores). Las filas totalmente vacías se ignoran.
+        filas: [(tipo, monto, fecha, descripcion, categoria_id)]
+        errores: [(numero_de_fila, mensaje)]
+        """
+        filas = []
+        errores = []
+
+        for n, fila in enumerate(self.filas.controls, start=1):
+            c = fila.data
+            fecha = c["fecha"].value
+            descripcion = c["descripcion"].value
+            monto = c["monto"].value
+            categoria_id = c["categoria"].value
+
+            if not (descripcion or monto):
+                continue
+
+            datos, msg = normalizar_transaccion(fecha, descripcion, monto, self.tipo, categoria_id)
+            if datos is None:
+                errores.append((n, msg))
+                continue
+
+            filas.append((
+                datos.tipo,
+                datos.monto,
+                datos.fecha.isoformat(),
+                datos.descripcion,
+                datos.categoria_id,
+            ))
+
+        return filas, errores
+
+    def limpiar(self):
+        self.filas.controls = []
+        for _ in range(self.filas_iniciales):
+            self.agregar_fila()
+        self.update()
+
+
 # ============================================================
 #   TARJETA DE RESUMEN PROFESIONAL (Dashboard)
 # ============================================================
@@ -194,3 +328,322 @@ class SummaryCard(ft.Container):
     def set_value(self, nuevo_valor: str):
         self.content.controls[2].value = nuevo_valor
         self.update()
+
+
+# ============================================================
+#   FILAS INDEXADAS POR CLAVE (reconciliación mínima)
+# ============================================================
+
+class KeyedRows:
+    """
+    Mantiene un mapa {clave: (item, fila)} para reutilizar los controles.
+    Flet compara las listas de hijos por identidad de control, así que si
+    las filas que no cambiaron son los mismos objetos, un único update()
+    solo envía al cliente las filas insertadas, borradas o modificadas.
+    """
+
+    def __init__(self, construir, clave=lambda item: item.id):
+        self.construir = construir
+        self.clave = clave
+        self._filas = {}
+
+    def reconciliar(self, items):
+        """Devuelve las filas para `items`, reutilizando las que no cambiaron."""
+        nuevas = {}
+        filas = []
+        for item in items:
+            clave = self.clave(item)
+            previa = self._filas.get(clave)
+            if previa is not None and previa[0] == item:
+                fila = previa[1]
+            else:
+                fila = self.construir(item)
+            nuevas[clave] = (item, fila)
+            filas.append(fila)
+        self._filas = nuevas
+        return filas
+
+    def olvidar(self):
+        """Descarta todas las filas guardadas: la próxima reconciliación las reconstruye."""
+        self._filas = {}
+
+    def quitar(self, clave):
+        """Olvida la fila de `clave` y la devuelve (None si no estaba)."""
+        previa = self._filas.pop(clave, None)
+        return previa[1] if previa else None
+
+
+class KeyedDataTable(ft.DataTable):
+    """
+    DataTable que no reconstruye todas sus filas en cada cambio:
+    sincronizar() reconcilia por clave y quitar() borra una sola fila,
+    ambos con una única actualización al cliente.
+
+    - construir_fila(item) -> ft.DataRow
+    - clave(item) -> identificador estable (por defecto item.id)
+    """
+
+    def __init__(self, construir_fila, clave=lambda item: item.id, **kwargs):
+        super().__init__(rows=[], **kwargs)
+        self._indice = KeyedRows(construir_fila, clave)
+
+    def sincronizar(self, items):
+        self.rows = self._indice.reconciliar(items)
+        self.update()
+
+    def quitar(self, *claves):
+        for clave in claves:
+            fila = self._indice.quitar(clave)
+            if fila is not None:
+                self.rows.remove(fila)
+        self.update()
+
+
+# ============================================================
+#   TABLA VIRTUALIZADA (ListView con alto de fila fijo)
+# ============================================================
+
+class VirtualTable(ft.Column):
+    """
+    Tabla para historiales grandes. Usa un ft.ListView con item_extent fijo
+    y pide los datos por páginas a medida que se hace scroll.
+    Solo mantiene una ventana de `max_paginas` páginas en el cliente:
+    al avanzar se descarta la primera, al retroceder la última.
+
+    - columnas: lista de (titulo, ancho)
+    - obtener_pagina(offset, limite) -> (items, total)
+    - construir_celdas(item) -> lista de controles, uno por columna
+    - on_sort(indice_columna, ascendente) opcional
+    - clave(item) -> identificador estable para reutilizar filas
+    """
+
+    def __init__(
+        self,
+        columnas,
+        obtener_pagina,
+        construir_celdas,
+        alto=420,
+        alto_fila=44,
+        tam_pagina=50,
+        max_paginas=3,
+        on_sort=None,
+        color_cabecera=ft.colors.BLUE_100,
+        clave=lambda item: item.id,
+    ):
+        super().__init__(spacing=0)
+        self.columnas = columnas
+        self.obtener_pagina = obtener_pagina
+        self.construir_celdas = construir_celdas
+        self.alto_fila = alto_fila
+        self.tam_pagina = tam_pagina
+        self.max_paginas = max_paginas
+        self.on_sort = on_sort
+
+        # Ventana cargada: items[0] corresponde a la posición `inicio`
+        self._filas = KeyedRows(self._construir_fila, clave)
+        self.items = []
+        self.inicio = 0
+        self.total = 0
+        self._cargando = False
+
+        # Orden actual (índice de columna, ascendente)
+        self.orden_columna = None
+        self.orden_ascendente = False
+
+        self.cabecera = ft.Container(
+            bgcolor=ft.colors.with_opacity(0.1, color_cabecera),
+            border_radius=ft.border_radius.only(top_left=8, top_right=8),
+            padding=ft.padding.symmetric(horizontal=10),
+            height=alto_fila,
+            content=ft.Row(spacing=0),
+        )
+
+        self.lista = ft.ListView(
+            height=alto,
+            item_extent=alto_fila,
+            on_scroll_interval=100,
+            on_scroll=self._on_scroll,
+        )
+
+        self.texto_total = ft.Text("", size=14, color=ft.colors.GREY_700)
+
+        self.controls = [
+            ft.Container(
+                border=ft.border.all(1, ft.colors.GREY_300),
+                border_radius=8,
+                content=ft.Column([self.cabecera, self.lista], spacing=0),
+            ),
+            ft.Container(padding=ft.padding.only(top=8), content=self.texto_total),
+        ]
+        self._construir_cabecera()
+
+    # ---------------------------------------------------------
+    # Cabecera (clic para ordenar)
+    # ---------------------------------------------------------
+    def _construir_cabecera(self):
+        celdas = []
+        for i, (titulo, ancho) in enumerate(self.columnas):
+            etiqueta = [ft.Text(titulo, weight="bold")]
+            if i == self.orden_columna:
+                etiqueta.append(
+                    ft.Icon(
+                        ft.icons.ARROW_UPWARD if self.orden_ascendente else ft.icons.ARROW_DOWNWARD,
+                        size=16,
+                    )
+                )
+            celdas.append(
+                ft.Container(
+                    width=ancho,
+                    data=i,
+                    on_click=self._ordenar if self.on_sort and titulo else None,
+                    content=ft.Row(etiqueta, spacing=4),
+                )
+            )
+        self.cabecera.content.controls = celdas
+
+    def _ordenar(self, e):
+        indice = e.control.data
+        if indice == self.orden_columna:
+            self.orden_ascendente = not self.orden_ascendente
+        else:
+            self.orden_columna = indice
+            self.orden_ascendente = True
+        self._construir_cabecera()
+        self.on_sort(indice, self.orden_ascendente)
+
+    def set_orden(self, indice, ascendente):
+        self.orden_columna = indice
+        self.orden_ascendente = ascendente
+        self._construir_cabecera()
+
+    # ---------------------------------------------------------
+    # Filas
+    # ---------------------------------------------------------
+    def _construir_fila(self, item):
+        celdas = self.construir_celdas(item)
+        return ft.Container(
+            padding=ft.padding.symmetric(horizontal=10),
+            border=ft.border.only(bottom=ft.BorderSide(1, ft.colors.GREY_200)),
+            content=ft.Row(
+                [
+                    ft.Container(width=ancho, content=celda)
+                    for (_, ancho), celda in zip(self.columnas, celdas)
+                ],
+                spacing=0,
+            ),
+        )
+
+    def _pintar(self):
+        self.lista.controls = self._filas.reconciliar(self.items)
+        self.texto_total.value = f"{self.total:,} resultados"
+
+    def repintar(self):
+        """Reconstruye las filas visibles (p. ej. si cambió un estado que muestran)."""
+        self._filas.olvidar()
+        self._pintar()
+        self.update()
+
+    def insertar(self, item, clave_orden, descendente=False):
+        """
+        Coloca un item recién creado en su posición ordenada de la ventana.
+        Si cae antes de la ventana solo desplaza `inicio`; si cae después
+        de la última fila cargada, aparecerá cuando se haga scroll.
+        """
+        clave = clave_orden(item)
+        if descendente:
+            pos = next((i for i, x in enumerate(self.items) if clave > clave_orden(x)), len(self.items))
+        else:
+            pos = next((i for i, x in enumerate(self.items) if clave < clave_orden(x)), len(self.items))
+
+        hay_mas = self.inicio + len(self.items) < self.total
+        self.total += 1
+
+        if pos == 0 and self.inicio > 0:
+            self.inicio += 1
+        elif pos < len(self.items) or not hay_mas:
+            self.items.insert(pos, item)
+
+        self._pintar()
+        self.update()
+
+    def quitar(self, *claves):
+        """Quita filas ya borradas en la BD sin volver a consultar la ventana."""
+        claves = set(claves)
+        restantes = [item for item in self.items if self._filas.clave(item) not in claves]
+        self.total -= len(self.items) - len(restantes)
+        self.items = restantes
+        self._pintar()
+        self.update()
+
+    # ---------------------------------------------------------
+    # Carga de datos
+    # ---------------------------------------------------------
+    def recargar(self):
+        """Vuelve al principio y pide la primera página."""
+        items, total = self.obtener_pagina(0, self.tam_pagina)
+        self.mostrar(items, total)
+
+    def mostrar(self, items, total):
+        """Muestra una primera página ya consultada (p. ej. en segundo plano)."""
+        self.items, self.total = items, total
+        self.inicio = 0
+        self._pintar()
+        self.update()
+        self.lista.scroll_to(offset=0, duration=0)
+
+    def refrescar(self):
+        """Vuelve a pedir la ventana actual sin mover el scroll."""
+        limite = max(len(self.items), self.tam_pagina)
+        self.items, self.total = self.obtener_pagina(self.inicio, limite)
+        if not self.items and self.inicio > 0:
+            self.recargar()
+            return
+        self._pintar()
+        self.update()
+
+    def _on_scroll(self, e):
+        if self._cargando or e.max_scroll_extent is None:
+            return
+
+        umbral = self.alto_fila * 5
+        fin = self.inicio + len(self.items)
+
+        self._cargando = True
+        try:
+            if e.pixels >= e.max_scroll_extent - umbral and fin < self.total:
+                self._cargar_siguiente(e.pixels)
+            elif e.pixels <= umbral and self.inicio > 0:
+                self._cargar_anterior(e.pixels)
+        finally:
+            self._cargando = False
+
+    def _cargar_siguiente(self, pixels):
+        fin = self.inicio + len(self.items)
+        nuevos, self.total = self.obtener_pagina(fin, self.tam_pagina)
+        if not nuevos:
+            return
+
+        self.items += nuevos
+        descartados = max(0, len(self.items) - self.max_paginas * self.tam_pagina)
+        if descartados:
+            self.items = self.items[descartados:]
+            self.inicio += descartados
+
+        self._pintar()
+        self.update()
+        if descartados:
+            self.lista.scroll_to(offset=pixels - descartados * self.alto_fila, duration=0)
+
+    def _cargar_anterior(self, pixels):
+        nuevo_inicio = max(0, self.inicio - self.tam_pagina)
+        nuevos, self.total = self.obtener_pagina(nuevo_inicio, self.inicio - nuevo_inicio)
+        if not nuevos:
+            return
+
+        self.items = nuevos + self.items
+        self.inicio = nuevo_inicio
+        self.items = self.items[: self.max_paginas * self.tam_pagina]
+
+        self._pintar()
+        self.update()
+        self.lista.scroll_to(offset=pixels + len(nuevos) * self.alto_fila, duration=0)
@@ -12,11 +12,13 @@ from models import (
 from ui.components import (
     NumberField,
     SectionTitle,
+    KeyedDataTable,
 )
-from validators import validar_monto
+from ui.screens.cache import PantallaEnCache
+from validators import parsear_monto
 
 
-class AlertasScreen(ft.Column):
+class AlertasScreen(ft.Column, PantallaEnCache):
     """
     Pantalla de alertas y presupuestos:
     - Definir presupuesto por categoría
@@ -36,7 +38,10 @@ class AlertasScreen(ft.Column):
         self.campo_presupuesto = NumberField("Presupuesto máximo para la categoría")
 
         # Tabla de presupuestos y consumo
-        self.tabla_presupuestos = ft.DataTable(
+        # Filas: (categoria_id, nombre, presupuesto, gastado, porcentaje, estado, color)
+        self.tabla_presupuestos = KeyedDataTable(
+            construir_fila=self._fila_presupuesto,
+            clave=lambda fila: fila[0],
             columns=[
                 ft.DataColumn(ft.Text("Categoría")),
                 ft.DataColumn(ft.Text("Presupuesto")),
@@ -44,18 +49,19 @@ class AlertasScreen(ft.Column):
                 ft.DataColumn(ft.Text("Porcentaje")),
                 ft.DataColumn(ft.Text("Estado")),
             ],
-            rows=[],
         )
 
         # Tabla de historial de alertas
-        self.tabla_alertas = ft.DataTable(
+        # Filas: (alerta, nombre_categoria)
+        self.tabla_alertas = KeyedDataTable(
+            construir_fila=self._fila_alerta,
+            clave=lambda fila: fila[0].id,
             columns=[
                 ft.DataColumn(ft.Text("Fecha")),
                 ft.DataColumn(ft.Text("Categoría")),
                 ft.DataColumn(ft.Text("Tipo")),
                 ft.DataColumn(ft.Text("Mensaje")),
             ],
-            rows=[],
         )
 
         # Layout principal
@@ -82,7 +88,10 @@ class AlertasScreen(ft.Column):
             self.tabla_alertas,
         ]
 
-        # Cargar datos iniciales
+    def did_mount(self):
+        # Pantalla reutilizada desde la caché: sin cambios, nada que consultar
+        if self.datos_vigentes():
+            return
         self.cargar_categorias()
         self.cargar_presupuestos()
         self.cargar_alertas()
@@ -111,14 +120,14 @@ class AlertasScreen(ft.Column):
             self.page.update()
             return
 
-        ok, msg = validar_monto(monto)
-        if not ok:
+        centavos, msg = parsear_monto(monto)
+        if centavos is None:
             self.page.snack_bar = ft.SnackBar(ft.Text(msg), bgcolor="red")
             self.page.snack_bar.open = True
             self.page.update()
             return
 
-        guardar_presupuesto(int(categoria_id), float(monto))
+        guardar_presupuesto(int(categoria_id), centavos / 100)
 
         self.page.snack_bar = ft.SnackBar(ft.Text("Presupuesto guardado."), bgcolor="green")
         self.page.snack_bar.open = True
@@ -141,7 +150,7 @@ class AlertasScreen(ft.Column):
                 gastos_por_categoria.setdefault(t.categoria_id, 0)
                 gastos_por_categoria[t.categoria_id] += t.monto
 
-        self.tabla_presupuestos.rows = []
+        filas = []
 
         for p in presupuestos:
             gastado = gastos_por_categoria.get(p.categoria_id, 0.0)
@@ -171,43 +180,49 @@ class AlertasScreen(ft.Column):
                     fecha=fecha,
                 )
 
-            self.tabla_presupuestos.rows.append(
-                ft.DataRow(
-                    cells=[
-                        ft.DataCell(ft.Text(categorias.get(p.categoria_id, "Desconocida"))),
-                        ft.DataCell(ft.Text(f"${p.monto_maximo:.0f}")),
-                        ft.DataCell(ft.Text(f"${gastado:.0f}")),
-                        ft.DataCell(ft.Text(f"{porcentaje:.0f}%")),
-                        ft.DataCell(ft.Text(estado, color=color)),
-                    ]
-                )
-            )
-
-        self.tabla_presupuestos.update()
+            filas.append((
+                p.categoria_id,
+                categorias.get(p.categoria_id, "Desconocida"),
+                p.monto_maximo,
+                gastado,
+                porcentaje,
+                estado,
+                color,
+            ))
+
+        self.tabla_presupuestos.sincronizar(filas)
         self.cargar_alertas()
 
+    def _fila_presupuesto(self, fila):
+        _, nombre, maximo, gastado, porcentaje, estado, color = fila
+        return ft.DataRow(
+            cells=[
+                ft.DataCell(ft.Text(nombre)),
+                ft.DataCell(ft.Text(f"${maximo:.0f}")),
+                ft.DataCell(ft.Text(f"${gastado:.0f}")),
+                ft.DataCell(ft.Text(f"{porcentaje:.0f}%")),
+                ft.DataCell(ft.Text(estado, color=color)),
+            ]
+        )
+
     # ---------------------------------------------------------
     # Cargar historial de alertas
     # ---------------------------------------------------------
     def cargar_alertas(self):
-        alertas = obtener_alertas()
         categorias = {c.id: c.nombre for c in obtener_categorias()}
+        self.tabla_alertas.sincronizar(
+            [(a, categorias.get(a.categoria_id, "General")) for a in obtener_alertas()]
+        )
 
-        self.tabla_alertas.rows = []
-
-        for a in alertas:
-            nombre_cat = categorias.get(a.categoria_id, "General")
-            color = "orange" if a.tipo == "warning" else "red"
-
-            self.tabla_alertas.rows.append(
-                ft.DataRow(
-                    cells=[
-                        ft.DataCell(ft.Text(a.fecha)),
-                        ft.DataCell(ft.Text(nombre_cat)),
-                        ft.DataCell(ft.Text(a.tipo, color=color)),
-                        ft.DataCell(ft.Text(a.mensaje)),
-                    ]
-                )
-            )
-
-        self.tabla_alertas.update()
+    def _fila_alerta(self, fila):
+        a, nombre_cat = fila
+        color = "orange" if a.tipo == "warning" else "red"
+
+        return ft.DataRow(
+            cells=[
+                ft.DataCell(ft.Text(a.fecha)),
+                ft.DataCell(ft.Text(nombre_cat)),
+                ft.DataCell(ft.Text(a.tipo, color=color)),
+                ft.DataCell(ft.Text(a.mensaje)),
+            ]
+        )
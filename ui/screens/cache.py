@@ -0,0 +1,93 @@
+from collections import OrderedDict
+
+from database import version_datos
+
+# Pantallas construidas que se mantienen vivas entre visitas
+MAX_PANTALLAS = 4
+
+# Tope de memoria, medido en controles vivos entre todas las pantallas
+MAX_CONTROLES = 20000
+
+
+def contar_controles(control) -> int:
+    """Controles del árbol de `control` (él incluido)."""
+    total = 0
+    pendientes = [control]
+    while pendientes:
+        c = pendientes.pop()
+        total += 1
+        pendientes.extend(c._get_children())
+    return total
+
+
+# ============================================================
+#   PANTALLA CON DATOS VERSIONADOS
+# ============================================================
+
+class PantallaEnCache:
+    """
+    Para las pantallas que se reutilizan: did_mount vuelve a consultar la
+    base solo si version_datos() cambió desde la última vez que se pintaron.
+    """
+
+    _version_mostrada = None
+
+    def datos_vigentes(self) -> bool:
+        version = version_datos()
+        if version == self._version_mostrada:
+            return True
+        self._version_mostrada = version
+        return False
+
+
+# ============================================================
+#   CACHÉ LRU DE PANTALLAS
+# ============================================================
+
+class CachePantallas:
+    """
+    Registro de pantallas por nombre. obtener() devuelve la instancia ya
+    construida si sigue en caché; si no, la crea con su fábrica. Se descartan
+    las menos usadas cuando hay más de `max_pantallas` o sus controles
+    superan `max_controles` (la pantalla actual nunca se descarta).
+    """
+
+    def __init__(self, fabricas: dict, max_pantallas=MAX_PANTALLAS, max_controles=MAX_CONTROLES):
+        self.fabricas = fabricas
+        self.max_pantallas = max_pantallas
+        self.max_controles = max_controles
+        self._pantallas = OrderedDict()
+        self._controles = {}
+
+    def obtener(self, nombre: str):
+        # La pantalla que se deja ya cargó sus datos: medirla ahora
+        if self._pantallas:
+            anterior = next(reversed(self._pantallas))
+            self._controles[anterior] = contar_controles(self._pantallas[anterior])
+
+        pantalla = self._pantallas.get(nombre)
+        if pantalla is None:
+            pantalla = self.fabricas[nombre]()
+            self._pantallas[nombre] = pantalla
+            self._controles[nombre] = 0
+        self._pantallas.move_to_end(nombre)
+
+        self._podar()
+        return pantalla
+
+    def _podar(self):
+        while len(self._pantallas) > 1 and (
+            len(self._pantallas) > self.max_pantallas
+            or sum(self._controles.values()) > self.max_controles
+        ):
+            nombre, _ = self._pantallas.popitem(last=False)
+            del self._controles[nombre]
+
+    def invalidar(self, nombre: str = None):
+        """Descarta una pantalla (o todas) para que se vuelva a construir."""
+        if nombre is None:
+            self._pantallas.clear()
+            self._controles.clear()
+        else:
+            self._pantallas.pop(nombre, None)
+            self._controles.pop(nombre, None)
@@ -9,11 +9,13 @@ from ui.components import (
     InputField,
     SectionTitle,
     ConfirmDialog,
+    KeyedDataTable,
 )
+from ui.screens.cache import PantallaEnCache
 from validators import validar_texto
 
 
-class CategoriasScreen(ft.Column):
+class CategoriasScreen(ft.Column, PantallaEnCache):
     def __init__(self, page: ft.Page):
         print(">>> CategoriasScreen se está creando")
         super().__init__(scroll=ft.ScrollMode.AUTO, expand=True)
@@ -49,14 +51,14 @@ class CategoriasScreen(ft.Column):
         # -----------------------------
         # TABLA PROFESIONAL
         # -----------------------------
-        self.tabla = ft.DataTable(
+        self.tabla = KeyedDataTable(
+            construir_fila=self._construir_fila,
             columns=[
                 ft.DataColumn(ft.Text("ID")),
                 ft.DataColumn(ft.Text("Nombre")),
                 ft.DataColumn(ft.Text("Editar")),
                 ft.DataColumn(ft.Text("Eliminar")),
             ],
-            rows=[],
             heading_row_color=ft.colors.with_opacity(0.1, ft.colors.BLUE_100),
             border=ft.border.all(1, ft.colors.GREY_300),
             border_radius=8,
@@ -98,6 +100,9 @@ class CategoriasScreen(ft.Column):
     # Se ejecuta cuando el control YA está en la página
     # ---------------------------------------------------------
     def did_mount(self):
+        # Pantalla reutilizada desde la caché: sin cambios, nada que consultar
+        if self.datos_vigentes():
+            return
         self.cargar_tabla()
 
     # ---------------------------------------------------------
@@ -129,38 +134,34 @@ class CategoriasScreen(ft.Column):
     # Cargar tabla
     # ---------------------------------------------------------
     def cargar_tabla(self):
-        categorias = obtener_categorias()
-        self.tabla.rows = []
-
-        for c in categorias:
-            btn_editar = ft.IconButton(
-                icon=ft.icons.EDIT,
-                tooltip="Editar",
-                icon_color=ft.colors.BLUE,
-                data=c,
-                on_click=self.iniciar_edicion,
-            )
-
-            btn_eliminar = ft.IconButton(
-                icon=ft.icons.DELETE,
-                tooltip="Eliminar",
-                icon_color=ft.colors.RED,
-                data=c.id,
-                on_click=self.confirmar_eliminar,
-            )
-
-            self.tabla.rows.append(
-                ft.DataRow(
-                    cells=[
-                        ft.DataCell(ft.Text(str(c.id))),
-                        ft.DataCell(ft.Text(c.nombre)),
-                        ft.DataCell(btn_editar),
-                        ft.DataCell(btn_eliminar),
-                    ]
-                )
-            )
-
-        self.tabla.update()
+        # Solo viajan al cliente las filas nuevas, borradas o renombradas
+        self.tabla.sincronizar(obtener_categorias())
+
+    def _construir_fila(self, c):
+        btn_editar = ft.IconButton(
+            icon=ft.icons.EDIT,
+            tooltip="Editar",
+            icon_color=ft.colors.BLUE,
+            data=c,
+            on_click=self.iniciar_edicion,
+        )
+
+        btn_eliminar = ft.IconButton(
+            icon=ft.icons.DELETE,
+            tooltip="Eliminar",
+            icon_color=ft.colors.RED,
+            data=c.id,
+            on_click=self.confirmar_eliminar,
+        )
+
+        return ft.DataRow(
+            cells=[
+                ft.DataCell(ft.Text(str(c.id))),
+                ft.DataCell(ft.Text(c.nombre)),
+                ft.DataCell(btn_editar),
+                ft.DataCell(btn_eliminar),
+            ]
+        )
 
     # ---------------------------------------------------------
     # Iniciar edición
@@ -211,11 +212,10 @@ class CategoriasScreen(ft.Column):
 
         if ok:
             self._snackbar("Categoría eliminada.", "orange")
+            self.tabla.quitar(cat_id)
         else:
             self._snackbar("No se puede eliminar: categoría en uso.", "red")
 
-        self.cargar_tabla()
-
     # ---------------------------------------------------------
     # Snackbar profesional
     # ---------------------------------------------------------
@@ -1,9 +1,10 @@
 import flet as ft
-from models import obtener_transacciones, obtener_alertas, obtener_categorias
+from models import obtener_transacciones, obtener_alertas, obtener_categorias, saldo_acumulado
 from ui.components import SectionTitle, SummaryCard
+from ui.screens.cache import PantallaEnCache
 
 
-class DashboardScreen(ft.Column):
+class DashboardScreen(ft.Column, PantallaEnCache):
     def __init__(self, page: ft.Page):
         super().__init__(scroll=ft.ScrollMode.AUTO, expand=True)
         self.page = page
@@ -30,6 +31,15 @@ class DashboardScreen(ft.Column):
             height=250,
         )
 
+        self.chart_acumulado = ft.LineChart(
+            data_series=[],
+            border=ft.border.all(1, ft.colors.GREY_400),
+            left_axis=ft.ChartAxis(labels_size=40, title=ft.Text("Saldo")),
+            bottom_axis=ft.ChartAxis(labels_size=40),
+            expand=True,
+            height=250,
+        )
+
         self.piechart = ft.PieChart(
             sections=[],
             sections_space=2,
@@ -53,6 +63,9 @@ class DashboardScreen(ft.Column):
             ft.Text("Saldo mensual", size=18, weight="bold"),
             self.chart_saldo,
             ft.Divider(),
+            ft.Text("Saldo acumulado", size=18, weight="bold"),
+            self.chart_acumulado,
+            ft.Divider(),
             ft.Text("Distribución de gastos por categoría", size=18, weight="bold"),
             self.piechart,
             self.piechart_mensaje,
@@ -65,12 +78,16 @@ class DashboardScreen(ft.Column):
         ]
 
     def did_mount(self):
+        # Pantalla reutilizada desde la caché: sin cambios, nada que consultar
+        if self.datos_vigentes():
+            return
         self.page.run_task(self._inicializar)
 
     async def _inicializar(self):
         self.actualizar_resumen()
         self.actualizar_grafico()
         self.actualizar_grafico_saldo()
+        self.actualizar_grafico_acumulado()
         self.actualizar_piechart()
         self.cargar_transacciones()
         self.cargar_alertas()
@@ -148,6 +165,25 @@ class DashboardScreen(ft.Column):
         )
         self.chart_saldo.update()
 
+    def actualizar_grafico_acumulado(self):
+        # Una sola consulta con función de ventana, sin recorrer el historial en Python
+        meses, _, acumulados = saldo_acumulado("mes")
+
+        self.chart_acumulado.data_series = [
+            ft.LineChartData(
+                data_points=[
+                    ft.LineChartDataPoint(i, saldo) for i, saldo in enumerate(acumulados)
+                ],
+                color=ft.colors.BLUE,
+                stroke_width=3,
+                curved=True,
+            )
+        ]
+        self.chart_acumulado.bottom_axis = ft.ChartAxis(
+            labels=[ft.ChartAxisLabel(value=i, label=ft.Text(mes)) for i, mes in enumerate(meses)]
+        )
+        self.chart_acumulado.update()
+
     def actualizar_piechart(self):
         trans = obtener_transacciones()
         gastos = [t for t in trans if t.tipo == "gasto"]
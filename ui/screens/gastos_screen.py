@@ -1,10 +1,12 @@
 
 import flet as ft
+from database import version_datos
 from models import (
     obtener_categorias,
     crear_transaccion,
+    crear_transacciones_lote,
     eliminar_transaccion,
-    obtener_transacciones,
+    buscar_transacciones,
 )
 from ui.components import (
     DateField,
@@ -12,15 +14,21 @@ from ui.components import (
     InputField,
     SectionTitle,
     ConfirmDialog,
+    VirtualTable,
+    QuickEntryGrid,
 )
-from validators import validar_transaccion
+from ui.screens.cache import PantallaEnCache
+from validators import normalizar_transaccion
 
 
-class GastosScreen(ft.UserControl):
+class GastosScreen(ft.UserControl, PantallaEnCache):
     def __init__(self, page: ft.Page):
         super().__init__()
         self.page = page
 
+        # Versión de las transacciones que refleja la tabla
+        self.version_vista = None
+
         # -----------------------------
         # FORMULARIO PROFESIONAL
         # -----------------------------
@@ -45,21 +53,28 @@ class GastosScreen(ft.UserControl):
             on_click=self.confirmar_guardar,
         )
 
+        # Carga rápida: varias filas guardadas en una sola transacción
+        self.carga_rapida = QuickEntryGrid("gasto")
+        self.btn_guardar_lote = ft.ElevatedButton(
+            text="Guardar todas",
+            icon=ft.icons.PLAYLIST_ADD_CHECK,
+            on_click=self.confirmar_guardar_lote,
+        )
+
         # -----------------------------
         # TABLA PROFESIONAL
         # -----------------------------
-        self.tabla = ft.DataTable(
-            columns=[
-                ft.DataColumn(ft.Text("Fecha")),
-                ft.DataColumn(ft.Text("Descripción")),
-                ft.DataColumn(ft.Text("Monto")),
-                ft.DataColumn(ft.Text("Categoría")),
-                ft.DataColumn(ft.Text("Eliminar")),
+        self.tabla = VirtualTable(
+            columnas=[
+                ("Fecha", 110),
+                ("Descripción", 300),
+                ("Monto", 120),
+                ("Categoría", 150),
+                ("", 70),
             ],
-            rows=[],
-            heading_row_color=ft.colors.with_opacity(0.1, ft.colors.RED_100),
-            border=ft.border.all(1, ft.colors.GREY_300),
-            border_radius=8,
+            obtener_pagina=self._obtener_pagina,
+            construir_celdas=self._construir_celdas,
+            color_cabecera=ft.colors.RED_100,
         )
 
     # ---------------------------------------------------------
@@ -89,6 +104,20 @@ class GastosScreen(ft.UserControl):
                     ),
                 ),
 
+                ft.Container(
+                    padding=20,
+                    bgcolor=ft.colors.with_opacity(0.05, ft.colors.RED_100),
+                    border_radius=12,
+                    content=ft.Column(
+                        [
+                            ft.Text("Carga rápida de varios gastos", size=18, weight="bold"),
+                            self.carga_rapida,
+                            self.btn_guardar_lote,
+                        ],
+                        spacing=15,
+                    ),
+                ),
+
                 ft.Divider(),
 
                 ft.Text("Historial de gastos", size=18, weight="bold"),
@@ -100,6 +129,9 @@ class GastosScreen(ft.UserControl):
     # Se ejecuta cuando el control YA está en la página
     # ---------------------------------------------------------
     def did_mount(self):
+        # Pantalla reutilizada desde la caché: sin cambios, nada que consultar
+        if self.datos_vigentes():
+            return
         self.cargar_categorias()
         self.cargar_tabla()
 
@@ -115,6 +147,8 @@ class GastosScreen(ft.UserControl):
         if categorias:
             self.dropdown_categoria.value = str(categorias[0].id)
 
+        self.carga_rapida.set_categorias(categorias)
+
         self.update()
 
     # ---------------------------------------------------------
@@ -139,52 +173,77 @@ class GastosScreen(ft.UserControl):
         tipo = "gasto"
         categoria_id = self.dropdown_categoria.value
 
-        ok, msg = validar_transaccion(fecha, descripcion, monto, tipo, categoria_id)
-        if not ok:
+        # Se convierte una sola vez: el monto "1.200.000" llega como centavos
+        datos, msg = normalizar_transaccion(fecha, descripcion, monto, tipo, categoria_id)
+        if datos is None:
             self._mostrar_snackbar(msg, "red")
             return
 
-        crear_transaccion(
-            tipo=tipo,
-            monto=float(monto),
-            fecha=fecha,
-            descripcion=descripcion,
-            categoria_id=int(categoria_id) if categoria_id else None,
-        )
+        version_previa = self.version_vista
+        nueva = crear_transaccion(**datos._asdict())
 
         self._mostrar_snackbar("Gasto registrado.", "green")
+
+        # Si nadie más tocó las transacciones, basta con colocar la nueva fila
+        if version_datos("transacciones") == version_previa + 1:
+            self.version_vista += 1
+            self.tabla.insertar(nueva, clave_orden=lambda t: (t.fecha, t.id), descendente=True)
+        else:
+            self.cargar_tabla()
+
+    # ---------------------------------------------------------
+    # Carga rápida: un solo diálogo y un solo commit
+    # ---------------------------------------------------------
+    def confirmar_guardar_lote(self, e):
+        filas, errores = self.carga_rapida.filas_validas()
+
+        if errores:
+            n, msg = errores[0]
+            self._mostrar_snackbar(f"Fila {n}: {msg}", "red")
+            return
+
+        if not filas:
+            self._mostrar_snackbar("No hay filas para guardar.", "red")
+            return
+
+        dialogo = ConfirmDialog(
+            mensaje=f"¿Desea registrar {len(filas)} gastos?",
+            on_confirm=lambda: self.guardar_lote(filas),
+        )
+        self.page.dialog = dialogo
+        dialogo.open = True
+        self.page.update()
+
+    def guardar_lote(self, filas):
+        total = crear_transacciones_lote(filas)
+        self.carga_rapida.limpiar()
+        self._mostrar_snackbar(f"{total} gastos registrados.", "green")
         self.cargar_tabla()
 
     # ---------------------------------------------------------
     # Cargar tabla de gastos
     # ---------------------------------------------------------
     def cargar_tabla(self):
-        gastos = [t for t in obtener_transacciones() if t.tipo == "gasto"]
+        self.version_vista = version_datos("transacciones")
+        self.tabla.recargar()
 
-        self.tabla.rows = []
+    def _obtener_pagina(self, offset: int, limite: int):
+        return buscar_transacciones(tipo="gasto", limite=limite, offset=offset)
 
-        for t in gastos:
-            btn_eliminar = ft.IconButton(
+    def _construir_celdas(self, t):
+        return [
+            ft.Text(t.fecha),
+            ft.Text(t.descripcion, no_wrap=True, overflow=ft.TextOverflow.ELLIPSIS),
+            ft.Text(f"${t.monto:,.0f}"),
+            ft.Text(t.categoria_nombre or "—"),
+            ft.IconButton(
                 icon=ft.icons.DELETE,
                 tooltip="Eliminar",
                 icon_color="red",
                 data=t.id,
                 on_click=self.confirmar_eliminar,
-            )
-
-            self.tabla.rows.append(
-                ft.DataRow(
-                    cells=[
-                        ft.DataCell(ft.Text(t.fecha)),
-                        ft.DataCell(ft.Text(t.descripcion)),
-                        ft.DataCell(ft.Text(f"${t.monto:,.0f}")),
-                        ft.DataCell(ft.Text(t.categoria_nombre or "—")),
-                        ft.DataCell(btn_eliminar),
-                    ]
-                )
-            )
-
-        self.update()
+            ),
+        ]
 
     # ---------------------------------------------------------
     # Confirmar eliminación
@@ -200,9 +259,15 @@ class GastosScreen(ft.UserControl):
         self.page.update()
 
     def eliminar(self, trans_id: int):
+        version_previa = self.version_vista
         eliminar_transaccion(trans_id)
         self._mostrar_snackbar("Gasto eliminado.", "orange")
-        self.cargar_tabla()
+
+        if version_datos("transacciones") == version_previa + 1:
+            self.version_vista += 1
+            self.tabla.quitar(trans_id)
+        else:
+            self.cargar_tabla()
 
     # ---------------------------------------------------------
     # Snackbar profesional
@@ -1,9 +1,11 @@
 import flet as ft
+from database import version_datos
 from models import (
     obtener_categorias,
     crear_transaccion,
+    crear_transacciones_lote,
     eliminar_transaccion,
-    obtener_transacciones,
+    buscar_transacciones,
 )
 from ui.components import (
     DateField,
@@ -11,18 +13,23 @@ from ui.components import (
     InputField,
     SectionTitle,
     ConfirmDialog,
+    VirtualTable,
+    QuickEntryGrid,
 )
-from validators import validar_transaccion
+from ui.screens.cache import PantallaEnCache
+from validators import normalizar_transaccion
 from reports import exportar_transacciones_excel, exportar_transacciones_pdf
-import tempfile
-import os
+from services.export_service import ExportService
 
 
-class IngresosScreen(ft.UserControl):
+class IngresosScreen(ft.UserControl, PantallaEnCache):
     def __init__(self, page: ft.Page):
         super().__init__()
         self.page = page
 
+        # Versión de las transacciones que refleja la tabla
+        self.version_vista = None
+
         # FORMULARIO
         self.fecha = DateField("Fecha del ingreso", page=self.page)
         self.descripcion = InputField("Descripción")
@@ -45,6 +52,14 @@ class IngresosScreen(ft.UserControl):
             on_click=self.confirmar_guardar,
         )
 
+        # Carga rápida: varias filas guardadas en una sola transacción
+        self.carga_rapida = QuickEntryGrid("ingreso")
+        self.btn_guardar_lote = ft.ElevatedButton(
+            text="Guardar todas",
+            icon=ft.icons.PLAYLIST_ADD_CHECK,
+            on_click=self.confirmar_guardar_lote,
+        )
+
         # EXPORTACIÓN
         self.btn_exportar_excel = ft.ElevatedButton(
             text="Exportar Excel",
@@ -70,25 +85,47 @@ class IngresosScreen(ft.UserControl):
             on_click=self.exportar_pdf,
         )
 
+        # PROGRESO DE LA EXPORTACIÓN (se ejecuta fuera del hilo de la UI)
+        self.exportaciones = ExportService()
+        self.trabajo_exportacion = None
+        self.barra_exportacion = ft.ProgressBar(width=300, value=0)
+        self.texto_exportacion = ft.Text("", size=14)
+        self.btn_cancelar_exportacion = ft.TextButton(
+            "Cancelar",
+            icon=ft.icons.CANCEL,
+            on_click=self.cancelar_exportacion,
+        )
+        self.fila_exportacion = ft.Row(
+            [
+                self.barra_exportacion,
+                self.texto_exportacion,
+                self.btn_cancelar_exportacion,
+            ],
+            spacing=10,
+            visible=False,
+        )
+
         # TABLA
-        self.tabla = ft.DataTable(
-            columns=[
-                ft.DataColumn(ft.Text("Fecha")),
-                ft.DataColumn(ft.Text("Descripción")),
-                ft.DataColumn(ft.Text("Monto")),
-                ft.DataColumn(ft.Text("Categoría")),
-                ft.DataColumn(ft.Text("Eliminar")),
+        self.tabla = VirtualTable(
+            columnas=[
+                ("Fecha", 110),
+                ("Descripción", 300),
+                ("Monto", 120),
+                ("Categoría", 150),
+                ("", 70),
             ],
-            rows=[],
-            heading_row_color=ft.colors.with_opacity(0.1, ft.colors.BLUE_100),
-            border=ft.border.all(1, ft.colors.GREY_300),
-            border_radius=8,
+            obtener_pagina=self._obtener_pagina,
+            construir_celdas=self._construir_celdas,
+            color_cabecera=ft.colors.BLUE_100,
         )
 
     # ---------------------------------------------------------
     # SE EJECUTA AUTOMÁTICAMENTE AL MONTAR EL CONTROL
     # ---------------------------------------------------------
     def did_mount(self):
+        # Pantalla reutilizada desde la caché: sin cambios, nada que consultar
+        if self.datos_vigentes():
+            return
         self.cargar_categorias()
         self.cargar_tabla()
 
@@ -119,6 +156,20 @@ class IngresosScreen(ft.UserControl):
                     ),
                 ),
 
+                ft.Container(
+                    padding=20,
+                    bgcolor=ft.colors.with_opacity(0.05, ft.colors.BLUE_100),
+                    border_radius=12,
+                    content=ft.Column(
+                        [
+                            ft.Text("Carga rápida de varios ingresos", size=18, weight="bold"),
+                            self.carga_rapida,
+                            self.btn_guardar_lote,
+                        ],
+                        spacing=15,
+                    ),
+                ),
+
                 ft.Divider(),
 
                 ft.Text("Historial de ingresos", size=18, weight="bold"),
@@ -131,6 +182,7 @@ class IngresosScreen(ft.UserControl):
                     ],
                     spacing=20,
                 ),
+                self.fila_exportacion,
             ],
         )
 
@@ -146,6 +198,8 @@ class IngresosScreen(ft.UserControl):
         if categorias:
             self.dropdown_categoria.value = str(categorias[0].id)
 
+        self.carga_rapida.set_categorias(categorias)
+
         self.update()
 
     # ---------------------------------------------------------
@@ -170,52 +224,77 @@ class IngresosScreen(ft.UserControl):
         tipo = "ingreso"
         categoria_id = self.dropdown_categoria.value
 
-        ok, msg = validar_transaccion(fecha, descripcion, monto, tipo, categoria_id)
-        if not ok:
+        # Se convierte una sola vez: el monto "1.200.000" llega como centavos
+        datos, msg = normalizar_transaccion(fecha, descripcion, monto, tipo, categoria_id)
+        if datos is None:
             self._snack(msg, "red")
             return
 
-        crear_transaccion(
-            tipo=tipo,
-            monto=float(monto),
-            fecha=fecha,
-            descripcion=descripcion,
-            categoria_id=int(categoria_id),
-        )
+        version_previa = self.version_vista
+        nueva = crear_transaccion(**datos._asdict())
 
         self._snack("Ingreso registrado.", "green")
+
+        # Si nadie más tocó las transacciones, basta con colocar la nueva fila
+        if version_datos("transacciones") == version_previa + 1:
+            self.version_vista += 1
+            self.tabla.insertar(nueva, clave_orden=lambda t: (t.fecha, t.id), descendente=True)
+        else:
+            self.cargar_tabla()
+
+    # ---------------------------------------------------------
+    # Carga rápida: un solo diálogo y un solo commit
+    # ---------------------------------------------------------
+    def confirmar_guardar_lote(self, e):
+        filas, errores = self.carga_rapida.filas_validas()
+
+        if errores:
+            n, msg = errores[0]
+            self._snack(f"Fila {n}: {msg}", "red")
+            return
+
+        if not filas:
+            self._snack("No hay filas para guardar.", "red")
+            return
+
+        dialogo = ConfirmDialog(
+            mensaje=f"¿Desea registrar {len(filas)} ingresos?",
+            on_confirm=lambda: self.guardar_lote(filas),
+        )
+        self.page.dialog = dialogo
+        dialogo.open = True
+        self.page.update()
+
+    def guardar_lote(self, filas):
+        total = crear_transacciones_lote(filas)
+        self.carga_rapida.limpiar()
+        self._snack(f"{total} ingresos registrados.", "green")
         self.cargar_tabla()
 
     # ---------------------------------------------------------
     # Cargar tabla
     # ---------------------------------------------------------
     def cargar_tabla(self):
-        ingresos = [t for t in obtener_transacciones() if t.tipo == "ingreso"]
-
-        self.tabla.rows = []
-
-        for t in ingresos:
-            btn_eliminar = ft.IconButton(
+        self.version_vista = version_datos("transacciones")
+        self.tabla.recargar()
+
+    def _obtener_pagina(self, offset: int, limite: int):
+        return buscar_transacciones(tipo="ingreso", limite=limite, offset=offset)
+
+    def _construir_celdas(self, t):
+        return [
+            ft.Text(t.fecha),
+            ft.Text(t.descripcion, no_wrap=True, overflow=ft.TextOverflow.ELLIPSIS),
+            ft.Text(f"${t.monto:,.0f}"),
+            ft.Text(t.categoria_nombre or "—"),
+            ft.IconButton(
                 icon=ft.icons.DELETE,
                 tooltip="Eliminar",
                 icon_color="red",
                 data=t.id,
                 on_click=self.confirmar_eliminar,
-            )
-
-            self.tabla.rows.append(
-                ft.DataRow(
-                    cells=[
-                        ft.DataCell(ft.Text(t.fecha)),
-                        ft.DataCell(ft.Text(t.descripcion)),
-                        ft.DataCell(ft.Text(f"${t.monto:,.0f}")),
-                        ft.DataCell(ft.Text(t.categoria_nombre or "—")),
-                        ft.DataCell(btn_eliminar),
-                    ]
-                )
-            )
-
-        self.update()
+            ),
+        ]
 
     # ---------------------------------------------------------
     # Confirmar eliminación
@@ -232,25 +311,67 @@ class IngresosScreen(ft.UserControl):
         self.page.update()
 
     def eliminar(self, trans_id: int):
+        version_previa = self.version_vista
         eliminar_transaccion(trans_id)
         self._snack("Ingreso eliminado.", "orange")
-        self.cargar_tabla()
+
+        if version_datos("transacciones") == version_previa + 1:
+            self.version_vista += 1
+            self.tabla.quitar(trans_id)
+        else:
+            self.cargar_tabla()
 
     # ---------------------------------------------------------
     # Exportar Excel
     # ---------------------------------------------------------
     def exportar_excel(self, e):
-        ruta = os.path.join(tempfile.gettempdir(), "ingresos.xlsx")
-        exportar_transacciones_excel(ruta)
-        self.page.launch_url(ruta)
+        self._iniciar_exportacion(exportar_transacciones_excel, "ingresos.xlsx")
 
     # ---------------------------------------------------------
     # Exportar PDF
     # ---------------------------------------------------------
     def exportar_pdf(self, e):
-        ruta = os.path.join(tempfile.gettempdir(), "ingresos.pdf")
-        exportar_transacciones_pdf(ruta)
-        self.page.launch_url(ruta)
+        self._iniciar_exportacion(exportar_transacciones_pdf, "ingresos.pdf")
+
+    # ---------------------------------------------------------
+    # Exportación en segundo plano con progreso
+    # ---------------------------------------------------------
+    def _iniciar_exportacion(self, exportador, nombre_archivo):
+        if self.trabajo_exportacion and self.trabajo_exportacion.estado == "en_curso":
+            self._snack("Ya hay una exportación en curso.", "orange")
+            return
+
+        self._mostrar_exportacion(True, "Preparando…", None)
+        self.trabajo_exportacion = self.exportaciones.iniciar(
+            exportador,
+            nombre_archivo,
+            on_progreso=self._progreso_exportacion,
+            on_terminado=self._exportacion_terminada,
+            on_cancelado=lambda job: self._fin_exportacion("Exportación cancelada.", "orange"),
+            on_error=lambda job: self._fin_exportacion(f"Error al exportar: {job.error}", "red"),
+        )
+
+    def _progreso_exportacion(self, escritas, total):
+        valor = escritas / total if total else None
+        self._mostrar_exportacion(True, f"{escritas:,} / {total:,} filas", valor)
+
+    def _exportacion_terminada(self, job):
+        self._fin_exportacion("Exportación lista.", "green")
+        self.page.launch_url(job.url)
+
+    def cancelar_exportacion(self, e):
+        if self.trabajo_exportacion:
+            self.trabajo_exportacion.cancelar()
+
+    def _fin_exportacion(self, mensaje, color):
+        self._mostrar_exportacion(False, "", 0)
+        self._snack(mensaje, color)
+
+    def _mostrar_exportacion(self, visible, texto, valor):
+        self.fila_exportacion.visible = visible
+        self.texto_exportacion.value = texto
+        self.barra_exportacion.value = valor
+        self.update()
 
     # ---------------------------------------------------------
     # Snackbar
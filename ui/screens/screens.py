@@ -5,6 +5,7 @@ from ui.screens.ingresos_screen import IngresosScreen
 from ui.screens.gastos_screen import GastosScreen
 from ui.screens.categorias_screen import CategoriasScreen
 from ui.screens.alertas_screen import AlertasScreen
+from ui.screens.cache import CachePantallas
 
 
 class Screens(ft.Column):
@@ -20,6 +21,15 @@ class Screens(ft.Column):
         # Contenedor donde se cargan las pantallas
         self.content = ft.Container(expand=True)
 
+        # Pantallas visitadas que se reutilizan (LRU)
+        self.pantallas = CachePantallas({
+            "Dashboard": lambda: DashboardScreen(self.page),
+            "Ingresos": lambda: IngresosScreen(self.page),
+            "Gastos": lambda: GastosScreen(self.page),
+            "Categorías": lambda: CategoriasScreen(self.page),
+            "Alertas": lambda: AlertasScreen(self.page),
+        })
+
         # Drawer de navegación
         self.drawer = ft.NavigationDrawer(
             controls=[
@@ -120,19 +130,5 @@ class Screens(ft.Column):
     # Cargar pantallas por nombre
     # ---------------------------------------------------------
     def _cargar_pantalla(self, nombre: str):
-        if nombre == "Dashboard":
-            self.content.content = DashboardScreen(self.page)
-
-        elif nombre == "Ingresos":
-            self.content.content = IngresosScreen(self.page)
-
-        elif nombre == "Gastos":
-            self.content.content = GastosScreen(self.page)
-
-        elif nombre == "Categorías":
-            self.content.content = CategoriasScreen(self.page)
-
-        elif nombre == "Alertas":
-            self.content.content = AlertasScreen(self.page)
-
+        self.content.content = self.pantallas.obtener(nombre)
         self.page.update()
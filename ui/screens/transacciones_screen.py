@@ -1,32 +1,61 @@
+import asyncio
+import sqlite3
+
 import flet as ft
+from database import ConsultaCancelable
 from models import (
-    obtener_transacciones,
+    buscar_transacciones,
     obtener_categorias,
     eliminar_transaccion,
+    eliminar_transacciones,
+    recategorizar_transacciones,
 )
 from ui.components import (
     DateField,
     InputField,
     SectionTitle,
     ConfirmDialog,
+    VirtualTable,
 )
-from validators import validar_fecha
+from ui.screens.cache import PantallaEnCache
+
+
+# Columnas ordenables de la tabla (índice de columna -> columna en models)
+COLUMNAS_ORDEN = [None, "fecha", "tipo", "monto", "categoria", "descripcion"]
 
+# Espera tras la última tecla antes de lanzar la búsqueda en vivo
+DEBOUNCE_SEGUNDOS = 0.2
 
-class TransaccionesScreen(ft.Column):
+
+class TransaccionesScreen(ft.Column, PantallaEnCache):
     def __init__(self, page: ft.Page):
         print(">>> TransaccionesScreen se está creando")
         super().__init__(scroll=ft.ScrollMode.AUTO, expand=True)
         self.page = page
 
+        # Estado de la consulta: filtros activos y orden
+        self.filtros = {}
+        self.orden = "fecha"
+        self.ascendente = False
+
+        # Búsqueda en vivo: tarea pendiente y consulta SQLite en curso
+        self._tarea_busqueda = None
+        self._consulta = None
+
+        # Selección múltiple: ids marcados o "todos los del filtro"
+        self.seleccion = set()
+        self.todos_filtro = False
+
         # -----------------------------
         # FILTROS PROFESIONALES
         # -----------------------------
         self.filtro_descripcion = InputField("Buscar descripción")
+        self.filtro_descripcion.field.on_change = self.filtros_cambiados
         self.filtro_categoria = ft.Dropdown(
             label="Categoría",
             width=250,
             border_radius=8,
+            on_change=self.filtros_cambiados,
         )
         self.filtro_tipo = ft.Dropdown(
             label="Tipo",
@@ -36,10 +65,12 @@ class TransaccionesScreen(ft.Column):
                 ft.dropdown.Option("ingreso"),
                 ft.dropdown.Option("gasto"),
             ],
+            on_change=self.filtros_cambiados,
         )
 
-        self.filtro_fecha_desde = DateField("Fecha desde")
-        self.filtro_fecha_hasta = DateField("Fecha hasta")
+        # Vacías: el historial arranca sin rango de fechas
+        self.filtro_fecha_desde = DateField("Fecha desde", value="", on_change=self.filtros_cambiados)
+        self.filtro_fecha_hasta = DateField("Fecha hasta", value="", on_change=self.filtros_cambiados)
 
         self.btn_filtrar = ft.ElevatedButton(
             "Aplicar filtros",
@@ -54,22 +85,48 @@ class TransaccionesScreen(ft.Column):
         )
 
         # -----------------------------
-        # TABLA PROFESIONAL
+        # TABLA VIRTUALIZADA
         # -----------------------------
-        self.tabla = ft.DataTable(
-            columns=[
-                ft.DataColumn(ft.Text("Fecha")),
-                ft.DataColumn(ft.Text("Tipo")),
-                ft.DataColumn(ft.Text("Monto")),
-                ft.DataColumn(ft.Text("Categoría")),
-                ft.DataColumn(ft.Text("Descripción")),
-                ft.DataColumn(ft.Text("Eliminar")),
+        self.tabla = VirtualTable(
+            columnas=[
+                ("", 50),
+                ("Fecha", 110),
+                ("Tipo", 90),
+                ("Monto", 120),
+                ("Categoría", 150),
+                ("Descripción", 300),
+                ("", 70),
             ],
-            rows=[],
-            heading_row_color=ft.colors.with_opacity(0.1, ft.colors.BLUE_100),
-            border=ft.border.all(1, ft.colors.GREY_300),
+            obtener_pagina=self._obtener_pagina,
+            construir_celdas=self._construir_celdas,
+            on_sort=self.ordenar,
+        )
+        self.tabla.set_orden(1, False)
+
+        # -----------------------------
+        # ACCIONES MASIVAS
+        # -----------------------------
+        self.chk_todos = ft.Checkbox(
+            label="Seleccionar todos los resultados del filtro",
+            on_change=self.marcar_todos,
+        )
+        self.texto_seleccion = ft.Text("", size=14, color=ft.colors.GREY_700)
+        self.dropdown_recategorizar = ft.Dropdown(
+            label="Nueva categoría",
+            width=220,
             border_radius=8,
         )
+        self.btn_eliminar_seleccion = ft.ElevatedButton(
+            "Eliminar seleccionadas",
+            icon=ft.icons.DELETE_SWEEP,
+            style=ft.ButtonStyle(bgcolor=ft.colors.RED, color=ft.colors.WHITE),
+            on_click=self.confirmar_eliminar_seleccion,
+        )
+        self.btn_recategorizar = ft.ElevatedButton(
+            "Cambiar categoría",
+            icon=ft.icons.CATEGORY,
+            on_click=self.confirmar_recategorizar,
+        )
 
         # -----------------------------
         # LAYOUT PRINCIPAL
@@ -117,6 +174,21 @@ class TransaccionesScreen(ft.Column):
             ft.Divider(),
 
             ft.Text("Resultados", size=18, weight="bold"),
+            ft.Row(
+                [
+                    self.chk_todos,
+                    self.texto_seleccion,
+                ],
+                spacing=20,
+            ),
+            ft.Row(
+                [
+                    self.btn_eliminar_seleccion,
+                    self.dropdown_recategorizar,
+                    self.btn_recategorizar,
+                ],
+                spacing=10,
+            ),
             self.tabla,
         ]
 
@@ -124,6 +196,9 @@ class TransaccionesScreen(ft.Column):
     # Se ejecuta cuando el control YA está en la página
     # ---------------------------------------------------------
     def did_mount(self):
+        # Pantalla reutilizada desde la caché: sin cambios, nada que consultar
+        if self.datos_vigentes():
+            return
         self.cargar_categorias()
         self.cargar_tabla()
 
@@ -138,78 +213,247 @@ class TransaccionesScreen(ft.Column):
         self.filtro_categoria.options.insert(0, ft.dropdown.Option("", "Todas"))
         self.filtro_categoria.update()
 
+        self.dropdown_recategorizar.options = [
+            ft.dropdown.Option(str(c.id), c.nombre) for c in categorias
+        ]
+        self.dropdown_recategorizar.update()
+
     # ---------------------------------------------------------
-    # Cargar tabla sin filtros
+    # Cargar tabla con los filtros visibles
     # ---------------------------------------------------------
     def cargar_tabla(self):
-        trans = obtener_transacciones()
-        self._poblar_tabla(trans)
+        # Una pantalla reutilizada conserva sus campos de filtro: la tabla y
+        # el alcance de "seleccionar todos" deben seguir coincidiendo con ellos
+        self.filtros = self._leer_filtros()
+        self._limpiar_seleccion()
+        self.tabla.recargar()
+        self._actualizar_seleccion()
+        self.update()
 
     # ---------------------------------------------------------
-    # Aplicar filtros
+    # Leer filtros (se resuelven en SQLite, no en Python)
     # ---------------------------------------------------------
-    def aplicar_filtros(self, e):
-        trans = obtener_transacciones()
-
-        # Filtro descripción
-        desc = self.filtro_descripcion.get_value()
-        if desc:
-            trans = [t for t in trans if desc.lower() in t.descripcion.lower()]
-
-        # Filtro tipo
-        if self.filtro_tipo.value:
-            trans = [t for t in trans if t.tipo == self.filtro_tipo.value]
-
-        # Filtro categoría
-        if self.filtro_categoria.value:
-            cat_id = int(self.filtro_categoria.value)
-            trans = [t for t in trans if t.categoria_id == cat_id]
+    def _leer_filtros(self):
+        return {
+            "descripcion": self.filtro_descripcion.get_value() or None,
+            "tipo": self.filtro_tipo.value or None,
+            "categoria_id": self.filtro_categoria.value or None,
+            # DateField ya validó el texto al escribirlo
+            "fecha_desde": self.filtro_fecha_desde.get_fecha(),
+            "fecha_hasta": self.filtro_fecha_hasta.get_fecha(),
+        }
 
-        # Filtro fecha desde
-        fecha_desde = self.filtro_fecha_desde.get_value()
-        if fecha_desde:
-            ok, _ = validar_fecha(fecha_desde)
-            if ok:
-                trans = [t for t in trans if t.fecha >= fecha_desde]
+    # ---------------------------------------------------------
+    # Aplicar filtros (botón): sin esperar el debounce
+    # ---------------------------------------------------------
+    def aplicar_filtros(self, e):
+        self._programar_busqueda(espera=0)
 
-        # Filtro fecha hasta
-        fecha_hasta = self.filtro_fecha_hasta.get_value()
-        if fecha_hasta:
-            ok, _ = validar_fecha(fecha_hasta)
-            if ok:
-                trans = [t for t in trans if t.fecha <= fecha_hasta]
+    # ---------------------------------------------------------
+    # Búsqueda en vivo mientras se escribe
+    # ---------------------------------------------------------
+    def filtros_cambiados(self, e):
+        self._programar_busqueda(espera=DEBOUNCE_SEGUNDOS)
+
+    def _programar_busqueda(self, espera: float):
+        # Una entrada nueva deja obsoleta la búsqueda anterior:
+        # se cancela la tarea y, si ya está en SQLite, se interrumpe.
+        if self._tarea_busqueda is not None:
+            self._tarea_busqueda.cancel()
+        if self._consulta is not None:
+            self._consulta.cancelar()
+
+        self._tarea_busqueda = self.page.run_task(self._buscar, espera)
+
+    async def _buscar(self, espera: float):
+        await asyncio.sleep(espera)
+
+        filtros = self._leer_filtros()
+        consulta = ConsultaCancelable()
+        self._consulta = consulta
+
+        try:
+            items, total = await asyncio.to_thread(self._consultar_primera_pagina, filtros, consulta)
+        except sqlite3.OperationalError:
+            if consulta.cancelada:
+                return
+            raise
+
+        if consulta.cancelada:
+            return
+
+        self._consulta = None
+        self.filtros = filtros
+        self.todos_filtro = False
+        self.chk_todos.value = False
+        self.tabla.mostrar(items, total)
+        self._actualizar_seleccion()
+
+    def _consultar_primera_pagina(self, filtros, consulta):
+        conn = consulta.conectar()
+        try:
+            return buscar_transacciones(
+                **filtros,
+                orden=self.orden,
+                ascendente=self.ascendente,
+                limite=self.tabla.tam_pagina,
+                conn=conn,
+            )
+        finally:
+            conn.close()
 
-        self._poblar_tabla(trans)
+    # ---------------------------------------------------------
+    # Ordenar al pulsar la cabecera de una columna
+    # ---------------------------------------------------------
+    def ordenar(self, indice: int, ascendente: bool):
+        if COLUMNAS_ORDEN[indice] is None:
+            return
+        self.orden = COLUMNAS_ORDEN[indice]
+        self.ascendente = ascendente
+        self.tabla.recargar()
 
     # ---------------------------------------------------------
-    # Poblar tabla
+    # Consultar SOLO las filas que pide la tabla virtualizada
     # ---------------------------------------------------------
-    def _poblar_tabla(self, trans):
-        self.tabla.rows = []
+    def _obtener_pagina(self, offset: int, limite: int):
+        return buscar_transacciones(
+            **self.filtros,
+            orden=self.orden,
+            ascendente=self.ascendente,
+            limite=limite,
+            offset=offset,
+        )
 
-        for t in trans:
-            btn_eliminar = ft.IconButton(
+    def _construir_celdas(self, t):
+        return [
+            ft.Checkbox(
+                value=self.todos_filtro or t.id in self.seleccion,
+                data=t.id,
+                on_change=self.marcar,
+            ),
+            ft.Text(t.fecha),
+            ft.Text(t.tipo),
+            ft.Text(f"${t.monto:,.0f}"),
+            ft.Text(t.categoria_nombre or "—"),
+            ft.Text(t.descripcion, no_wrap=True, overflow=ft.TextOverflow.ELLIPSIS),
+            ft.IconButton(
                 icon=ft.icons.DELETE,
                 icon_color="red",
                 tooltip="Eliminar",
                 data=t.id,
                 on_click=self.confirmar_eliminar,
-            )
+            ),
+        ]
 
-            self.tabla.rows.append(
-                ft.DataRow(
-                    cells=[
-                        ft.DataCell(ft.Text(t.fecha)),
-                        ft.DataCell(ft.Text(t.tipo)),
-                        ft.DataCell(ft.Text(f"${t.monto:,.0f}")),
-                        ft.DataCell(ft.Text(t.categoria_nombre or "—")),
-                        ft.DataCell(ft.Text(t.descripcion)),
-                        ft.DataCell(btn_eliminar),
-                    ]
-                )
-            )
+    # ---------------------------------------------------------
+    # Selección múltiple
+    # ---------------------------------------------------------
+    def marcar(self, e):
+        trans_id = e.control.data
+
+        if self.todos_filtro:
+            # Desmarcar una fila sale del modo "todos": quedan las visibles
+            self.todos_filtro = False
+            self.chk_todos.value = False
+            self.seleccion = {t.id for t in self.tabla.items}
+
+        if e.control.value:
+            self.seleccion.add(trans_id)
+        else:
+            self.seleccion.discard(trans_id)
+
+        self._actualizar_seleccion()
+        self.update()
+
+    def marcar_todos(self, e):
+        self.todos_filtro = bool(self.chk_todos.value)
+        self.seleccion.clear()
+        self.tabla.repintar()
+        self._actualizar_seleccion()
+        self.update()
+
+    def _actualizar_seleccion(self):
+        cantidad = self.tabla.total if self.todos_filtro else len(self.seleccion)
+        self.texto_seleccion.value = f"{cantidad:,} seleccionadas" if cantidad else ""
+
+    def _alcance_seleccion(self):
+        """Argumentos para las operaciones masivas de models."""
+        if self.todos_filtro:
+            # El usuario marcó "todos" sobre la vista actual, aunque no tenga filtros
+            return {"filtros": self.filtros, "todas": True}
+        return {"ids": sorted(self.seleccion)}
+
+    def _hay_seleccion(self):
+        if self.todos_filtro or self.seleccion:
+            return True
+        self._snackbar("No hay transacciones seleccionadas.", "red")
+        return False
+
+    def _limpiar_seleccion(self):
+        self.seleccion.clear()
+        self.todos_filtro = False
+        self.chk_todos.value = False
+
+    # ---------------------------------------------------------
+    # Eliminación masiva (un solo DELETE)
+    # ---------------------------------------------------------
+    def confirmar_eliminar_seleccion(self, e):
+        if not self._hay_seleccion():
+            return
+
+        dialogo = ConfirmDialog(
+            mensaje=f"¿Desea eliminar {self.texto_seleccion.value}?",
+            on_confirm=self.eliminar_seleccion,
+        )
+        self.page.dialog = dialogo
+        dialogo.open = True
+        self.page.update()
+
+    def eliminar_seleccion(self):
+        alcance = self._alcance_seleccion()
+        borradas = eliminar_transacciones(**alcance)
+        self._limpiar_seleccion()
+
+        self._snackbar(f"{borradas:,} transacciones eliminadas.", "orange")
+
+        if "ids" in alcance:
+            self.tabla.quitar(*alcance["ids"])
+        else:
+            self.tabla.recargar()
+        self._actualizar_seleccion()
+        self.update()
 
-        self.tabla.update()
+    # ---------------------------------------------------------
+    # Recategorización masiva (un solo UPDATE)
+    # ---------------------------------------------------------
+    def confirmar_recategorizar(self, e):
+        if not self._hay_seleccion():
+            return
+
+        if not self.dropdown_recategorizar.value:
+            self._snackbar("Elija la nueva categoría.", "red")
+            return
+
+        dialogo = ConfirmDialog(
+            mensaje=f"¿Cambiar la categoría de {self.texto_seleccion.value}?",
+            on_confirm=self.recategorizar,
+        )
+        self.page.dialog = dialogo
+        dialogo.open = True
+        self.page.update()
+
+    def recategorizar(self):
+        categoria_id = int(self.dropdown_recategorizar.value)
+        cambiadas = recategorizar_transacciones(categoria_id, **self._alcance_seleccion())
+        self._limpiar_seleccion()
+
+        self._snackbar(f"{cambiadas:,} transacciones recategorizadas.", "green")
+
+        # Volver a leer la ventana visible y pintarla sin casillas marcadas
+        self.tabla.refrescar()
+        self.tabla.repintar()
+        self._actualizar_seleccion()
+        self.update()
 
     # ---------------------------------------------------------
     # Confirmar eliminación
@@ -227,13 +471,20 @@ class TransaccionesScreen(ft.Column):
 
     def eliminar(self, trans_id: int):
         eliminar_transaccion(trans_id)
+        self.seleccion.discard(trans_id)
+
+        self._snackbar("Transacción eliminada.", "orange")
+
+        self.tabla.quitar(trans_id)
 
+    # ---------------------------------------------------------
+    # Snackbar
+    # ---------------------------------------------------------
+    def _snackbar(self, mensaje, color):
         self.page.snack_bar = ft.SnackBar(
-            ft.Text("Transacción eliminada."),
-            bgcolor="orange",
+            ft.Text(mensaje),
+            bgcolor=color,
             duration=2000,
         )
         self.page.snack_bar.open = True
         self.page.update()
-
-        self.cargar_tabla()
@@ -1,5 +1,20 @@
+import math
 import re
-from datetime import datetime
+from datetime import date, datetime
+from typing import NamedTuple, Optional
+
+try:
+    import numpy as np
+except ImportError:  # opcional: solo acelera el modo columnar de validar_lote
+    np = None
+
+_RE_FECHA_ISO = re.compile(r"\d{4}-\d{2}-\d{2}")
+# "1.200.000,50" / "800,5": coma decimal, puntos de miles
+_RE_MONTO_COMA = re.compile(r"([0-9]{1,3}(?:\.[0-9]{3})+|[0-9]+),([0-9]{1,2})")
+# "800.000" / "1.200.000": solo puntos de miles
+_RE_MONTO_MILES = re.compile(r"[0-9]{1,3}(?:\.[0-9]{3})+")
+# "800" / "800.50": punto decimal
+_RE_MONTO_PUNTO = re.compile(r"([0-9]+)(?:\.([0-9]{1,2}))?")
 
 # ============================================================
 #   VALIDACIÓN DE MONTOS
@@ -13,28 +28,54 @@ def validar_monto(valor: str):
     - 800.50
     - 800.000
     - 1.200.000
+    - 1.200.000,50
+    """
+    centavos, msg = parsear_monto(valor)
+    return centavos is not None, msg
+
+
+def parsear_monto(valor):
+    """
+    Convierte el monto una sola vez: (centavos, "") o (None, mensaje).
+    Con coma, la coma es el decimal y los puntos son de miles; sin coma,
+    los puntos son de miles solo si agrupan de a 3 cifras ("800.000").
     """
+    centavos, codigo = _centavos(valor)
+    return centavos, MENSAJES[codigo] if codigo else ""
 
-    if not valor or valor.strip() == "":
-        return False, "El monto no puede estar vacío."
 
-    # Quitar puntos de miles
-    valor_limpio = valor.replace(".", "")
+def _centavos(valor):
+    """(centavos, None) si el monto es válido; si no, (None, código)."""
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        if not math.isfinite(valor):
+            return None, "monto_invalido"
+        centavos = round(valor * 100)
+    elif not isinstance(valor, str):
+        return None, "monto_vacio" if valor is None else "monto_invalido"
+    else:
+        texto = valor.strip()
+        if not texto:
+            return None, "monto_vacio"
 
-    # Debe ser número
-    if not re.match(r"^[0-9]+(\,[0-9]+)?$", valor_limpio.replace(",", ".")):
-        return False, "El monto debe ser un número válido."
+        m = _RE_MONTO_COMA.fullmatch(texto)
+        if m:
+            enteros, decimales = m.group(1).replace(".", ""), m.group(2)
+        elif _RE_MONTO_MILES.fullmatch(texto):
+            enteros, decimales = texto.replace(".", ""), ""
+        else:
+            m = _RE_MONTO_PUNTO.fullmatch(texto)
+            if not m:
+                return None, "monto_invalido"
+            enteros, decimales = m.group(1), m.group(2) or ""
+        centavos = int(enteros) * 100 + int(decimales.ljust(2, "0"))
 
-    # Convertir a float
-    try:
-        monto = float(valor_limpio.replace(",", "."))
-    except:
-        return False, "El monto debe ser un número válido."
+    if centavos <= 0:
+        return None, "monto_no_positivo"
+    return centavos, None
 
-    if monto <= 0:
-        return False, "El monto debe ser mayor que 0."
 
-    return True, ""
+def _codigo_monto(valor):
+    return _centavos(valor)[1]
 
 
 # ============================================================
@@ -42,14 +83,43 @@ def validar_monto(valor: str):
 # ============================================================
 
 def validar_fecha(fecha: str):
+    valor, msg = parsear_fecha(fecha)
+    return valor is not None, msg
+
+
+def parsear_fecha(fecha):
+    """Convierte la fecha una sola vez: (date, "") o (None, mensaje)."""
+    valor, codigo = _fecha(fecha)
+    return valor, MENSAJES[codigo] if codigo else ""
+
+
+def _fecha(fecha):
+    """(date, None) si la fecha es válida; si no, (None, código)."""
+    if isinstance(fecha, datetime):
+        return fecha.date(), None
+    if isinstance(fecha, date):
+        return fecha, None
     if not fecha:
-        return False, "Debe seleccionar una fecha."
+        return None, "fecha_vacia"
+    if not isinstance(fecha, str):
+        return None, "fecha_invalida"
 
+    # Camino rápido: YYYY-MM-DD con ceros se valida con fromisoformat
+    if _RE_FECHA_ISO.fullmatch(fecha):
+        try:
+            return date.fromisoformat(fecha), None
+        except ValueError:
+            return None, "fecha_invalida"
+
+    # strptime también admite "2024-1-5"
     try:
-        datetime.strptime(fecha, "%Y-%m-%d")
-        return True, ""
+        return datetime.strptime(fecha, "%Y-%m-%d").date(), None
     except ValueError:
-        return False, "La fecha debe tener formato YYYY-MM-DD."
+        return None, "fecha_invalida"
+
+
+def _codigo_fecha(fecha):
+    return _fecha(fecha)[1]
 
 
 # ============================================================
@@ -69,6 +139,16 @@ def validar_texto(texto: str, minimo=3, maximo=200):
     return True, ""
 
 
+def _codigo_texto(texto, minimo=3, maximo=200):
+    if not texto or texto.strip() == "":
+        return "texto_vacio"
+    if len(texto) < minimo:
+        return "texto_corto"
+    if len(texto) > maximo:
+        return "texto_largo"
+    return None
+
+
 # ============================================================
 #   VALIDACIÓN DE CATEGORÍA
 # ============================================================
@@ -83,26 +163,172 @@ def validar_categoria(cat_id):
 #   VALIDACIÓN COMPLETA DE TRANSACCIÓN
 # ============================================================
 
-def validar_transaccion(fecha, descripcion, monto, tipo, categoria_id):
-    ok, msg = validar_fecha(fecha)
-    if not ok:
-        return False, msg
+class TransaccionNormalizada(NamedTuple):
+    """Valores ya convertidos, listos para models.crear_transaccion(**datos._asdict())."""
+    tipo: str
+    centavos: int
+    fecha: date
+    descripcion: str
+    categoria_id: Optional[int]
+
+    @property
+    def monto(self) -> float:
+        return self.centavos / 100
+
+
+def normalizar_transaccion(fecha, descripcion, monto, tipo, categoria_id):
+    """
+    Valida y convierte cada campo una sola vez.
+    Devuelve (TransaccionNormalizada, "") o (None, mensaje del primer error).
+    """
+    valor_fecha, msg = parsear_fecha(fecha)
+    if valor_fecha is None:
+        return None, msg
 
     ok, msg = validar_texto(descripcion)
     if not ok:
-        return False, msg
+        return None, msg
 
-    ok, msg = validar_monto(monto)
-    if not ok:
-        return False, msg
+    centavos, msg = parsear_monto(monto)
+    if centavos is None:
+        return None, msg
 
     if tipo not in ("ingreso", "gasto"):
-        return False, "Debe seleccionar un tipo válido."
+        return None, "Debe seleccionar un tipo válido."
 
     # Categoría solo obligatoria en gastos
     if tipo == "gasto":
         ok, msg = validar_categoria(categoria_id)
         if not ok:
-            return False, msg
+            return None, msg
 
-    return True, ""
+    datos = TransaccionNormalizada(
+        tipo=tipo,
+        centavos=centavos,
+        fecha=valor_fecha,
+        descripcion=descripcion.strip(),
+        categoria_id=int(categoria_id) if categoria_id else None,
+    )
+    return datos, ""
+
+
+def validar_transaccion(fecha, descripcion, monto, tipo, categoria_id):
+    datos, msg = normalizar_transaccion(fecha, descripcion, monto, tipo, categoria_id)
+    return datos is not None, msg
+
+
+# ============================================================
+#   VALIDACIÓN POR LOTES
+# ============================================================
+
+# código de error -> mensaje para el usuario
+MENSAJES = {
+    "fecha_vacia": "Debe seleccionar una fecha.",
+    "fecha_invalida": "La fecha debe tener formato YYYY-MM-DD.",
+    "texto_vacio": "El texto no puede estar vacío.",
+    "texto_corto": "El texto debe tener al menos 3 caracteres.",
+    "texto_largo": "El texto no puede superar 200 caracteres.",
+    "monto_vacio": "El monto no puede estar vacío.",
+    "monto_invalido": "El monto debe ser un número válido.",
+    "monto_no_positivo": "El monto debe ser mayor que 0.",
+    "tipo_invalido": "Debe seleccionar un tipo válido.",
+    "categoria_vacia": "Debe seleccionar una categoría.",
+}
+
+CAMPOS_LOTE = ("fecha", "descripcion", "monto", "tipo", "categoria_id")
+
+
+def validar_lote(filas, columnar=False):
+    """
+    Valida muchas transacciones de una vez, con las reglas de
+    validar_transaccion. `filas` es un iterable de tuplas
+    (fecha, descripcion, monto, tipo, categoria_id); con columnar=True, un
+    dict {campo: columna} con los nombres de CAMPOS_LOTE.
+
+    Devuelve [(índice, campo, código)] ordenado por índice; vacía si todo
+    es válido. El texto de cada código está en MENSAJES.
+    """
+    if columnar:
+        return _validar_columnas(filas)
+
+    errores = []
+    agregar = errores.append
+    codigo_fecha, codigo_texto, codigo_monto = _codigo_fecha, _codigo_texto, _codigo_monto
+
+    for i, (fecha, descripcion, monto, tipo, categoria_id) in enumerate(filas):
+        codigo = codigo_fecha(fecha)
+        if codigo:
+            agregar((i, "fecha", codigo))
+        codigo = codigo_texto(descripcion)
+        if codigo:
+            agregar((i, "descripcion", codigo))
+        codigo = codigo_monto(monto)
+        if codigo:
+            agregar((i, "monto", codigo))
+        if tipo != "ingreso" and tipo != "gasto":
+            agregar((i, "tipo", "tipo_invalido"))
+        elif tipo == "gasto" and not categoria_id:
+            agregar((i, "categoria_id", "categoria_vacia"))
+
+    return errores
+
+
+def _validar_columnas(columnas):
+    """
+    Modo columnar: con NumPy, montos numéricos, tipos y categorías se
+    comprueban sobre la columna entera; fechas y textos, elemento a elemento.
+    """
+    fechas = columnas["fecha"]
+    descripciones = columnas["descripcion"]
+    montos = columnas["monto"]
+    tipos = columnas["tipo"]
+    categorias = columnas["categoria_id"]
+
+    # Solo columnas de enteros o flotantes; textos, None y bools (que NumPy
+    # convertiría en 1.0) se validan uno a uno
+    numericos = None
+    if np is not None:
+        if isinstance(montos, np.ndarray):
+            numericos = montos
+        elif set(map(type, montos)) <= {int, float}:
+            try:
+                numericos = np.asarray(montos)
+            except (TypeError, ValueError, OverflowError):
+                numericos = None
+        if numericos is not None and (numericos.ndim != 1 or numericos.dtype.kind not in "iuf"):
+            numericos = None
+
+    if numericos is None:
+        return validar_lote(zip(fechas, descripciones, montos, tipos, categorias))
+
+    errores = []
+    for i, fecha in enumerate(fechas):
+        codigo = _codigo_fecha(fecha)
+        if codigo:
+            errores.append((i, "fecha", codigo))
+    for i, descripcion in enumerate(descripciones):
+        codigo = _codigo_texto(descripcion)
+        if codigo:
+            errores.append((i, "descripcion", codigo))
+
+    # Mismo redondeo a centavos que parsear_monto; lo que no pasa (NaN, inf,
+    # <= 0) se vuelve a validar solo para obtener el mismo código
+    with np.errstate(invalid="ignore", over="ignore"):
+        centavos = np.round(numericos.astype(np.float64) * 100)
+        montos_ok = np.isfinite(centavos) & (centavos > 0)
+    for i in np.flatnonzero(~montos_ok):
+        errores.append((int(i), "monto", _codigo_monto(numericos[i].item())))
+
+    tipos = np.asarray(tipos, dtype=object)
+    validos = (tipos == "ingreso") | (tipos == "gasto")
+    for i in np.flatnonzero(~validos):
+        errores.append((int(i), "tipo", "tipo_invalido"))
+
+    sin_categoria = np.array([not c for c in categorias], dtype=bool)
+    for i in np.flatnonzero((tipos == "gasto") & sin_categoria):
+        errores.append((int(i), "categoria_id", "categoria_vacia"))
+
+    # Mismo orden que el modo por filas
+    orden = {campo: n for n, campo in enumerate(CAMPOS_LOTE)}
+    errores.sort(key=lambda e: (e[0], orden[e[1]]))
+    return errores